@@ -1,10 +1,28 @@
 
 # Define the Dash App and it's attributes here
 
+import os
+
 import dash
 import dash_bootstrap_components as dbc
 
+# Slow gene-level callbacks run in background processes through a disk-backed
+# job queue (pip install "dash[diskcache]"). Without diskcache, or with
+# DDG_BACKGROUND=0, they run inline in the request thread instead.
+BACKGROUND_CALLBACKS = os.environ.get("DDG_BACKGROUND", "1") == "1"
+BACKGROUND_CACHE_DIR = os.environ.get("DDG_BACKGROUND_CACHE_DIR", "/tmp/ddg_background")
+
+background_callback_manager = None
+if BACKGROUND_CALLBACKS:
+    try:
+        import diskcache
+    except ImportError:
+        pass
+    else:
+        background_callback_manager = dash.DiskcacheManager(diskcache.Cache(BACKGROUND_CACHE_DIR))
+
 app = dash.Dash(__name__,
                 external_stylesheets=[dbc.themes.BOOTSTRAP],
                 meta_tags=[{"name": "viewport", "content": "width=device-width"}],
-                suppress_callback_exceptions=True)
+                suppress_callback_exceptions=True,
+                background_callback_manager=background_callback_manager)
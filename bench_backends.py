@@ -0,0 +1,76 @@
+"""
+Compare the ddg_info storage backends on on-disk size, cold-start time and
+query latency. Run from the directory holding keogh.db after building the
+stores you want to compare (`ingest.py --target duckdb`, build_parquet.py
+for parquet, build_normalized_db.py for normalized); backends whose store
+is missing are skipped.
+
+    python bench_backends.py [repeats]
+"""
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from pages import backends
+
+repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+gene_pdbs = pd.read_csv("gene_pdbs")
+genes = {
+    gene: group['pdb'].unique().tolist()
+    for gene, group in gene_pdbs.groupby('name_of_gene')
+}
+
+# Pick one real variant per sampled gene so every backend answers the same queries
+random.seed(0)
+reference = backends.SQLiteBackend()
+cursor = reference.con.cursor()
+variants = []
+for gene in random.sample(sorted(genes), len(genes)):
+    if len(variants) == repeats:
+        break
+    placeholders = ','.join('?' * len(genes[gene]))
+    cursor.execute(
+        f"SELECT pdb_residual, mut_from, mut_to FROM ddg_info WHERE pdb IN ({placeholders}) LIMIT 1",
+        genes[gene],
+    )
+    row = cursor.fetchone()
+    if row:
+        variants.append((gene, *row))
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+print(f"{'backend':<10} {'size (MB)':>10} {'cold start (s)':>15} "
+      f"{'variant p50/p95 (ms)':>22} {'gene p50/p95 (ms)':>20}")
+for name, backend_class in backends.BACKENDS.items():
+    start = time.perf_counter()
+    try:
+        backend = backend_class()
+        if variants:
+            gene, residual, mut_from, mut_to = variants[0]
+            backend.variant_ddg(gene, genes[gene], residual, mut_from, mut_to)
+    except Exception as e:
+        print(f"{name:<10} skipped: {e}")
+        continue
+    cold_start = time.perf_counter() - start
+
+    variant_times = [
+        timed(backend.variant_ddg, gene, genes[gene], residual, mut_from, mut_to)
+        for gene, residual, mut_from, mut_to in variants
+    ]
+    gene_times = [
+        timed(backend.gene_ddg, gene, genes[gene])
+        for gene, *_ in variants
+    ]
+    variant_ms = np.percentile(variant_times, [50, 95]) * 1000
+    gene_ms = np.percentile(gene_times, [50, 95]) * 1000
+    print(f"{name:<10} {backend.disk_size() / 1e6:>10.1f} {cold_start:>15.3f} "
+          f"{variant_ms[0]:>10.2f}/{variant_ms[1]:<11.2f} {gene_ms[0]:>9.2f}/{gene_ms[1]:<10.2f}")
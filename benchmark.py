@@ -0,0 +1,325 @@
+"""
+Reproducible benchmark for the page1 query and figure paths.
+
+Builds a synthetic ddg_info shaped like the real one (genes, structures
+covering windows of each gene, 19 substitutions per residue) in a scratch
+directory, runs the precompute steps, then times every page1 entry point,
+the full update_graphs_and_markdown + update_gene_graph callbacks, and a
+page1 deep link rendered with its selection resolved server-side.
+Reports p50/p95/p99 latency, rows read per call and peak RSS, plus the
+startup cost of a fresh worker (import time per module and the first
+page render), and writes them as JSON so runs can be compared:
+
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+AMINO_ACIDS = [
+    'ALA', 'ARG', 'ASN', 'ASP', 'CYS', 'GLN', 'GLU', 'GLY', 'HIS', 'ILE',
+    'LEU', 'LYS', 'MET', 'PHE', 'PRO', 'SER', 'THR', 'TRP', 'TYR', 'VAL',
+]
+EXP_METHODS = ['AF', 'X-RAY DIFFRACTION', 'ELECTRON MICROSCOPY', 'SOLUTION NMR']
+PRECOMPUTE_STEPS = ['build_gene_stats.py', 'build_dropdown_index.py']
+# Commands that build each backend's store; ingest.py reads the CSV chunks written by write_chunks
+BACKEND_STEPS = {
+    'sqlite': [],
+    'normalized': [['build_normalized_db.py']],
+    'duckdb': [['ingest.py', '--target', 'duckdb']],
+    'parquet': [['build_parquet.py']],
+    'memmap': [['build_memmap.py']],
+}
+DUCKDB_CHUNKS = 4
+# Third-party modules whose import time is reported alongside the dashboard's own
+STARTUP_MODULES = ['dash', 'plotly.express', 'plotly.graph_objects', 'pandas', 'numpy', 'flask', 'diskcache']
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.display_page('/page1')
+print(json.dumps({'import_ms': (imported - start) * 1000, 'first_layout_ms': (time.perf_counter() - imported) * 1000}))
+"""
+
+
+def build_dataset(directory, genes, pdbs_per_gene, residues, seed):
+    """Write gene_pdbs and keogh.db for a synthetic dataset; return the row count."""
+    rng = np.random.default_rng(seed)
+    structures = []
+    conn = sqlite3.connect(os.path.join(directory, 'keogh.db'))
+    conn.execute("CREATE TABLE ddg_info (pdb TEXT, pdb_residual INTEGER, mut_from TEXT, mut_to TEXT, ddg REAL)")
+    total = 0
+    for g in range(genes):
+        gene = f"GENE{g}"
+        native = rng.integers(0, len(AMINO_ACIDS), residues)
+        for p in range(pdbs_per_gene):
+            pdb = f"{g}p{p:02d}"
+            # The first structure is a full-length model, the rest cover a window
+            if p == 0:
+                first, last, method = 1, residues, 'AF'
+            else:
+                first = int(rng.integers(1, residues))
+                last = int(min(residues, first + rng.integers(20, residues // 2 + 21)))
+                method = EXP_METHODS[int(rng.integers(1, len(EXP_METHODS)))]
+            structures.append({
+                'organism': 9606, 'name_of_gene': gene, 'pdb': pdb, 'url': '',
+                'exp_method': method, 'exp_detail': 'None', 'length': residues,
+                'coverage': round((last - first + 1) / residues, 4),
+                'gene_map': f"{{{first}-{last}:A{first}-{last}}}", 'dummy': '',
+            })
+            position = np.repeat(np.arange(first, last + 1), len(AMINO_ACIDS) - 1)
+            mut_from = np.array(AMINO_ACIDS)[native[position - 1]]
+            mut_to = np.array([
+                aa for residue in range(first, last + 1)
+                for aa in AMINO_ACIDS if aa != AMINO_ACIDS[native[residue - 1]]
+            ])
+            ddg = rng.gamma(1.5, 1.2, len(position)) - 0.5
+            conn.executemany(
+                "INSERT INTO ddg_info VALUES (?, ?, ?, ?, ?)",
+                zip([pdb] * len(position), position.tolist(), mut_from.tolist(), mut_to.tolist(), ddg.tolist()),
+            )
+            total += len(position)
+    conn.execute("CREATE INDEX idx_composite ON ddg_info(pdb, pdb_residual, mut_from, mut_to)")
+    conn.commit()
+    conn.close()
+    pd.DataFrame(structures).to_csv(os.path.join(directory, 'gene_pdbs'), index=False)
+    return total
+
+
+def write_chunks(directory, n_chunks, db_path=None):
+    """Split ddg_info into `n_chunks` CSVs under directory/ddg_info/; return their relative paths."""
+    db_path = db_path or os.path.join(directory, 'keogh.db')
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    rows = pd.read_sql_query("SELECT pdb, pdb_residual, mut_from, mut_to, ddg FROM ddg_info", conn)
+    conn.close()
+    os.makedirs(os.path.join(directory, 'ddg_info'), exist_ok=True)
+    chunks = []
+    size = -(-len(rows) // n_chunks)
+    for i in range(n_chunks):
+        chunk = os.path.join('ddg_info', f"ddg_info{i + 1}.csv")
+        rows.iloc[i * size:(i + 1) * size].to_csv(os.path.join(directory, chunk), index=False)
+        chunks.append(chunk)
+    return chunks
+
+
+def summarise(timings, rows):
+    timings = np.array(timings) * 1000
+    return {
+        'calls': len(timings),
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p95_ms': float(np.percentile(timings, 95)),
+        'p99_ms': float(np.percentile(timings, 99)),
+        'rows_per_call': float(np.mean(rows)),
+    }
+
+
+def is_startup_module(name):
+    return name in ('main', 'app') or name.startswith(('pages.', 'components.')) or name in STARTUP_MODULES
+
+
+def profile_startup(workdir, runs, env):
+    """Median import and first-render times of a fresh worker, with cumulative import time per module (ms)."""
+    totals, modules = {}, {}
+    for _ in range(runs):
+        child = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            cwd=workdir, env={**env, 'PYTHONPATH': REPO_DIR}, check=True, capture_output=True, text=True,
+        )
+        for name, value in json.loads(child.stdout.strip().splitlines()[-1]).items():
+            totals.setdefault(name, []).append(value)
+        # Lines look like "import time:  self [us] | cumulative | <indent>module"
+        for line in child.stderr.splitlines():
+            fields = line.split('|')
+            if not line.startswith('import time:') or len(fields) != 3 or not fields[1].strip().isdigit():
+                continue
+            name = fields[2].strip()
+            if is_startup_module(name):
+                modules.setdefault(name, []).append(int(fields[1]) / 1000)
+    return {
+        **{name: float(np.median(values)) for name, values in totals.items()},
+        'modules_ms': {
+            name: float(np.median(values))
+            for name, values in sorted(modules.items(), key=lambda item: -np.median(item[1]))
+        },
+    }
+
+
+def run(args):
+    # page1 resolves its data files relative to the working directory
+    os.chdir(args.workdir)
+    sys.path.insert(0, REPO_DIR)
+    from pages import lookup_tables, page1
+    import main
+
+    rows_read = [0]
+
+    def counting(method):
+        def wrapper(*a):
+            values = method(*a)
+            rows_read[0] += len(values)
+            return values
+        return wrapper
+
+    page1.backend.variant_ddg = counting(page1.backend.variant_ddg)
+    page1.backend.gene_ddg = counting(page1.backend.gene_ddg)
+
+    # Every call samples a real variant
+    rng = np.random.default_rng(args.seed)
+    genes = sorted(lookup_tables.gene_names())
+    variants = []
+    while len(variants) < args.calls:
+        gene = genes[rng.integers(len(genes))]
+        residues = page1.set_dropdown_options_page1_2a(gene)
+        residue = residues[rng.integers(len(residues))]['value']
+        mut_from = page1.set_dropdown_options_page1_2b(gene, residue)[0]['value']
+        mut_tos = page1.set_dropdown_options_page1_2c(gene, residue, mut_from)
+        variants.append((gene, residue, mut_from, mut_tos[rng.integers(len(mut_tos))]['value']))
+
+    def context(variant):
+        return page1.VariantContext(*variant)
+
+    cases = {
+        'dropdown_cascade': lambda v: (
+            page1.set_dropdown_options_page1_2a(v[0]),
+            page1.set_dropdown_options_page1_2b(*v[:2]),
+            page1.set_dropdown_options_page1_2c(*v[:3]),
+        ),
+        'calculate_median': lambda v: page1.calculate_median(context(v)),
+        'calculate_percentile': lambda v: page1.calculate_percentile(context(v)),
+        'ddg_for_gene_plot': lambda v: page1.ddg_for_gene_plot(context(v)),
+        'ddg_for_variant_plot': lambda v: page1.ddg_for_variant_plot(context(v)),
+        'update_graphs_and_markdown': lambda v: (main.update_graphs_and_markdown(*v), main.update_gene_graph(*v)),
+        'deep_link_layout': lambda v: main.display_page('/page1', page1.selection_search(*v)),
+    }
+
+    results = {}
+    for name, case in cases.items():
+        timings, rows = [], []
+        for variant in variants:
+            if not args.warm:
+                page1.result_cache.clear()
+                page1.gene_stats.loaded.clear('residue_options', 'mutfrom_options', 'mutto_options')
+            rows_read[0] = 0
+            start = time.perf_counter()
+            case(variant)
+            timings.append(time.perf_counter() - start)
+            rows.append(rows_read[0])
+        results[name] = summarise(timings, rows)
+    return {'cases': results, 'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    print(f"\n{'case':<28} {'p50 (ms)':>18} {'p95 (ms)':>18}")
+    for name, current in results['cases'].items():
+        before = baseline['cases'].get(name)
+        if before is None:
+            continue
+        line = f"{name:<28}"
+        for metric in ('p50_ms', 'p95_ms'):
+            change = current[metric] / before[metric] - 1 if before[metric] else 0
+            line += f" {before[metric]:>7.2f} -> {current[metric]:<7.2f}"
+            if change > threshold:
+                regressions.append(f"{name} {metric} {change:+.0%}")
+        print(line)
+    for metric in ('import_ms', 'first_layout_ms'):
+        before, current = baseline.get('startup', {}).get(metric), results['startup'][metric]
+        if before:
+            print(f"{'startup ' + metric:<28} {before:>7.2f} -> {current:<7.2f}")
+            if current / before - 1 > threshold:
+                regressions.append(f"startup {metric} {current / before - 1:+.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--genes', type=int, default=20)
+    parser.add_argument('--pdbs-per-gene', type=int, default=10)
+    parser.add_argument('--residues', type=int, default=400)
+    parser.add_argument('--calls', type=int, default=50, help="timed calls per case")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', choices=sorted(BACKEND_STEPS), default='sqlite', help="DDG_BACKEND to benchmark")
+    parser.add_argument('--no-precompute', action='store_true', help="skip build_gene_stats.py")
+    parser.add_argument('--warm', action='store_true', help="keep result caches between calls")
+    parser.add_argument('--startup-runs', type=int, default=5, help="fresh processes timed for startup")
+    parser.add_argument('--output', help="write results JSON here")
+    parser.add_argument('--compare', help="baseline results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="regression threshold (default 10%%)")
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.workdir:
+        # Child process: the dataset is already built, just time it
+        print(json.dumps(run(args)))
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        rows = build_dataset(workdir, args.genes, args.pdbs_per_gene, args.residues, args.seed)
+        steps = PRECOMPUTE_STEPS if not args.no_precompute else PRECOMPUTE_STEPS[1:]
+        steps = [[step] for step in steps] + BACKEND_STEPS[args.backend]
+        if args.backend == 'duckdb':
+            write_chunks(workdir, DUCKDB_CHUNKS)
+        for script, *script_args in steps:
+            subprocess.run(
+                [sys.executable, os.path.join(REPO_DIR, script), *script_args],
+                cwd=workdir, check=True, stdout=subprocess.DEVNULL,
+            )
+        print(f"Built {rows:,} synthetic rows in {time.perf_counter() - start:.1f} seconds")
+
+        # Time in a fresh process so peak RSS only reflects the dashboard itself
+        # Background callbacks off, so the full-callback case always includes the gene histogram
+        # rather than depending on whether diskcache happens to be installed
+        env = {**os.environ, 'DDG_BACKEND': args.backend, 'DDG_BACKGROUND': '0'}
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--workdir', workdir, *sys.argv[1:]],
+            env=env, check=True, capture_output=True, text=True,
+        )
+        measured = json.loads(child.stdout.strip().splitlines()[-1])
+        measured['startup'] = profile_startup(workdir, args.startup_runs, env)
+
+    results = {
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'workdir')},
+        'rows': rows,
+        'python': platform.python_version(),
+        **measured,
+    }
+    cases = results['cases']
+
+    print(f"\n{'case':<28} {'p50':>8} {'p95':>8} {'p99':>8} {'rows/call':>11}")
+    for name, case in cases.items():
+        print(f"{name:<28} {case['p50_ms']:>8.2f} {case['p95_ms']:>8.2f} {case['p99_ms']:>8.2f} {case['rows_per_call']:>11,.0f}")
+    print(f"\nPeak RSS: {results['peak_rss_mb']:.0f} MB")
+
+    startup = results['startup']
+    print(f"\nStartup: import main {startup['import_ms']:.0f} ms, first page1 layout {startup['first_layout_ms']:.0f} ms")
+    for name, ms in startup['modules_ms'].items():
+        print(f"  {name:<26} {ms:>8.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("\nRegressions: " + ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
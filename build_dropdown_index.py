@@ -0,0 +1,23 @@
+"""
+Build the gene -> residue -> mut_from -> mut_to index behind the page1
+dropdowns straight from ddg_info, so the options always match the data.
+Re-run whenever keogh.db is rebuilt.
+"""
+import pandas as pd
+
+from pages import backends, dropdown_index, gene_stats
+
+gene_pdbs = pd.read_csv("gene_pdbs")
+
+print(f"Writing dropdown index to {dropdown_index.DROPDOWN_INDEX_PATH} ...")
+
+index = {}
+interned = {}
+columns = ['pdb_residual', 'mut_from', 'mut_to']
+for gene, rows in backends.scan_genes(gene_pdbs, columns, order_by=columns, distinct=True):
+    index[gene] = dropdown_index.build_gene_entry(rows.itertuples(index=False, name=None), interned)
+    print(f"[OK] {gene}: {len(index[gene]):,} residues")
+
+dropdown_index.save_index(index)
+gene_stats.mark_updated()
+print("\nDone! Dropdown index has been built.")
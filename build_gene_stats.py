@@ -0,0 +1,40 @@
+"""
+Precompute the per-gene ΔΔG histogram and sorted ddg array used by page1,
+so the gene histogram and percentile no longer scan every structure of a gene,
+plus a histogram per structure for views filtered to some of them and the
+global gene index (every gene's histogram and summary in one file) behind
+the gene comparison page.
+Re-run whenever keogh.db is rebuilt.
+"""
+import numpy as np
+import pandas as pd
+
+from pages import backends, gene_index, gene_stats
+
+gene_pdbs = pd.read_csv("gene_pdbs")
+
+print(f"Writing per-gene statistics to {gene_stats.GENE_STATS_DIR}/ ...")
+
+pdb_histograms = {}
+genes, gene_counts, summaries = [], [], []
+for gene, rows in backends.scan_genes(gene_pdbs, ['pdb', 'ddg']):
+    values = rows['ddg'].to_numpy(np.float64)
+
+    counts, sorted_ddg = gene_stats.compute_gene_stats(values)
+    gene_stats.save_gene_stats(gene, counts, sorted_ddg)
+    genes.append(gene)
+    gene_counts.append(counts)
+    summaries.append(gene_index.summarise(sorted_ddg))
+    # Structures shared between genes are counted once
+    for pdb, pdb_ddg in rows.groupby('pdb')['ddg']:
+        if pdb not in pdb_histograms:
+            pdb_histograms[pdb], _ = gene_stats.compute_gene_stats(pdb_ddg)
+    print(f"[OK] {gene}: {len(sorted_ddg):,} values")
+
+gene_stats.save_pdb_histograms(pdb_histograms)
+print(f"[OK] {len(pdb_histograms):,} structure histograms")
+gene_index.GeneIndex(genes, gene_counts, summaries).save()
+print(f"[OK] gene index of {len(genes):,} genes")
+
+gene_stats.mark_updated()
+print("\nDone! Gene statistics have been precomputed.")
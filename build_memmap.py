@@ -0,0 +1,143 @@
+"""
+Lay ddg_info out as flat, memory-mappable arrays for the memmap backend
+(DDG_BACKEND=memmap), clustered by gene, then residue, mutation and pdb:
+
+    ddg.npy              float32
+    pdb_residual.npy     int32
+    mut_from.npy         uint8 code into amino_acids.json
+    mut_to.npy           uint8 code into amino_acids.json
+    pdb.npy              int32 code into pdbs.json
+    gene_offsets.npy     int64, rows of genes.json[i] are [offsets[i], offsets[i + 1])
+    variant_keys.npy     int64 (gene, residue, mut_from, mut_to) keys, sorted
+    variant_offsets.npy  int64, rows of variant_keys[i] are [offsets[i], offsets[i + 1])
+    gene_pdbs.json       the structures included for each gene
+
+A gene's rows are one contiguous slice and every variant's rows, across
+all of the gene's structures, are one contiguous run found by binary
+search on variant_keys. Structures shared by several genes are stored
+once per gene. Only one gene's rows are held in memory at a time.
+
+Each build is written to its own memmap.<time>.<pid> directory and the
+memmap symlink is switched to it with os.replace once it is complete, so
+a worker starting mid-build maps the previous build, never a partial one.
+The previous build is kept for workers still loading it; older ones are
+removed.
+"""
+import glob
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+
+from pages import backends, gene_stats
+
+conn = backends.SQLiteBackend().con
+gene_pdbs = pd.read_csv("gene_pdbs")
+genes = {
+    gene: sorted(group['pdb'].unique().tolist())
+    for gene, group in gene_pdbs.groupby('name_of_gene')
+}
+build_dir = f"{backends.MEMMAP_DIR}.{time.strftime('%Y%m%d%H%M%S')}.{os.getpid()}"
+os.makedirs(build_dir)
+
+print(f"Writing memory-mapped arrays to {build_dir}/ ...")
+
+
+def pdb_filter(pdb_values):
+    return f"pdb IN ({','.join('?' * len(pdb_values))})"
+
+
+counts = [
+    conn.execute(f"SELECT COUNT(*) FROM ddg_info WHERE {pdb_filter(pdbs)}", pdbs).fetchone()[0]
+    for pdbs in genes.values()
+]
+total = sum(counts)
+pdbs = sorted({pdb for pdb_values in genes.values() for pdb in pdb_values})
+pdb_codes = {pdb: i for i, pdb in enumerate(pdbs)}
+amino_acids = sorted(
+    row[0] for row in conn.execute("SELECT mut_from FROM ddg_info UNION SELECT mut_to FROM ddg_info")
+)
+if len(amino_acids) > 255:
+    raise ValueError(f"{len(amino_acids)} distinct residue names do not fit in uint8 codes")
+codes = {name: code for code, name in enumerate(amino_acids)}
+
+columns = {
+    'ddg': np.float32,
+    'pdb_residual': np.int32,
+    'mut_from': np.uint8,
+    'mut_to': np.uint8,
+    'pdb': np.int32,
+}
+arrays = {
+    column: open_memmap(os.path.join(build_dir, f"{column}.npy"), mode='w+', dtype=dtype, shape=(total,))
+    for column, dtype in columns.items()
+}
+
+variant_keys = []
+variant_starts = []
+start = 0
+# scan_genes goes through the genes in the same (sorted) order as `genes`
+for gene_code, (gene, chunk) in enumerate(backends.scan_genes(gene_pdbs, backends.EXPORT_COLUMNS)):
+    residues = chunk['pdb_residual'].to_numpy(np.int32)
+    mut_from = chunk['mut_from'].map(codes).to_numpy(np.uint8)
+    mut_to = chunk['mut_to'].map(codes).to_numpy(np.uint8)
+    pdb = chunk['pdb'].map(pdb_codes).to_numpy(np.int32)
+    keys = backends.variant_key(gene_code, residues, mut_from, mut_to)
+
+    order = np.lexsort((pdb, keys))
+    keys = keys[order]
+    end = start + len(chunk)
+    arrays['ddg'][start:end] = chunk['ddg'].to_numpy()[order]
+    arrays['pdb_residual'][start:end] = residues[order]
+    arrays['mut_from'][start:end] = mut_from[order]
+    arrays['mut_to'][start:end] = mut_to[order]
+    arrays['pdb'][start:end] = pdb[order]
+
+    # First row of every distinct variant
+    firsts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=np.int64)
+    variant_keys.append(keys[firsts])
+    variant_starts.append(start + firsts)
+    start = end
+    print(f"[OK] {gene}: {len(chunk):,} rows, {len(firsts):,} variants")
+
+for array in arrays.values():
+    array.flush()
+
+gene_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+np.save(os.path.join(build_dir, "gene_offsets.npy"), gene_offsets)
+np.save(os.path.join(build_dir, "variant_keys.npy"), np.concatenate(variant_keys).astype(np.int64))
+np.save(
+    os.path.join(build_dir, "variant_offsets.npy"),
+    np.concatenate(variant_starts + [[total]]).astype(np.int64),
+)
+for name, content in (
+    ("genes.json", list(genes)),
+    ("gene_pdbs.json", genes),
+    ("pdbs.json", pdbs),
+    ("amino_acids.json", amino_acids),
+):
+    with open(os.path.join(build_dir, name), 'w') as f:
+        json.dump(content, f)
+
+# Switch the memmap symlink to the complete build in one rename
+link = f"{backends.MEMMAP_DIR}.{os.getpid()}.link"
+os.symlink(os.path.basename(build_dir), link)
+if os.path.isdir(backends.MEMMAP_DIR) and not os.path.islink(backends.MEMMAP_DIR):
+    # A directory written in place by an older build_memmap.py
+    shutil.rmtree(backends.MEMMAP_DIR)
+previous = os.path.realpath(backends.MEMMAP_DIR) if os.path.islink(backends.MEMMAP_DIR) else None
+os.replace(link, backends.MEMMAP_DIR)
+print(f"[OK] {backends.MEMMAP_DIR} -> {os.path.basename(build_dir)}")
+
+for old in glob.glob(f"{glob.escape(backends.MEMMAP_DIR)}.*"):
+    if os.path.isdir(old) and not os.path.islink(old) and os.path.realpath(old) not in (
+        os.path.realpath(build_dir), previous,
+    ):
+        shutil.rmtree(old)
+
+gene_stats.mark_updated()
+print("\nDone! Memory-mapped arrays have been written.")
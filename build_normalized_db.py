@@ -0,0 +1,90 @@
+"""
+Write an integer-encoded copy of keogh.db for the normalized backend
+(DDG_BACKEND=normalized):
+
+    genes(id, name)          gene dimension
+    pdbs(id, name)           structure dimension
+    gene_pdbs(gene, pdb)     the structures of each gene, as codes
+    amino_acids(id, name)    residue names, fewer than 256
+    ddg_info(pdb, pdb_residual, mut_from, mut_to, ddg)
+                             pdb, mut_from and mut_to as codes
+
+SQLite stores each integer in as few bytes as its value needs, so the
+structure ID and residue names shrink from repeated text to one or two
+bytes per row, in the table and again in the composite index. SQLite has
+no 4-byte float, so ddg stays REAL here; the Parquet and memmap stores
+keep it as float32.
+"""
+import os
+import sqlite3
+
+import pandas as pd
+
+from pages import backends, encoding, gene_stats
+
+CHUNK_ROWS = 500_000
+
+source = backends.SQLiteBackend().con
+gene_pdbs = pd.read_csv("gene_pdbs")
+
+genes = encoding.Codebook(gene_pdbs['name_of_gene'].unique(), encoding.CODE_DTYPES['gene'])
+pdbs = encoding.Codebook(
+    sorted(set(gene_pdbs['pdb']) | {row[0] for row in source.execute("SELECT DISTINCT pdb FROM ddg_info")}),
+    encoding.CODE_DTYPES['pdb'],
+)
+amino_acids = encoding.Codebook(
+    sorted(row[0] for row in source.execute("SELECT mut_from FROM ddg_info UNION SELECT mut_to FROM ddg_info")),
+    encoding.CODE_DTYPES['amino_acid'],
+)
+
+path = backends.NORMALIZED_SQLITE_PATH
+os.makedirs(os.path.dirname(path), exist_ok=True)
+if os.path.exists(path):
+    os.remove(path)
+conn = sqlite3.connect(path)
+conn.execute("PRAGMA journal_mode = OFF")
+conn.execute("PRAGMA synchronous = OFF")
+
+print(f"Writing normalized database to {path} ...")
+
+for table, codebook in (("genes", genes), ("pdbs", pdbs), ("amino_acids", amino_acids)):
+    conn.execute(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL)")
+    conn.executemany(f"INSERT INTO {table} VALUES (?, ?)", enumerate(codebook.names.tolist()))
+    print(f"[OK] {table}: {len(codebook):,} names")
+
+conn.execute("CREATE TABLE gene_pdbs (gene INTEGER NOT NULL, pdb INTEGER NOT NULL)")
+structures = gene_pdbs[['name_of_gene', 'pdb']].drop_duplicates()
+conn.executemany(
+    "INSERT INTO gene_pdbs VALUES (?, ?)",
+    zip(genes.encode(structures['name_of_gene']).tolist(), pdbs.encode(structures['pdb']).tolist()),
+)
+
+conn.execute(
+    "CREATE TABLE ddg_info (pdb INTEGER, pdb_residual INTEGER, mut_from INTEGER, mut_to INTEGER, ddg REAL)"
+)
+total = 0
+for chunk in pd.read_sql_query(
+    f"SELECT {', '.join(backends.EXPORT_COLUMNS)} FROM ddg_info", source, chunksize=CHUNK_ROWS,
+):
+    conn.executemany(
+        "INSERT INTO ddg_info VALUES (?, ?, ?, ?, ?)",
+        zip(
+            pdbs.encode(chunk['pdb']).tolist(),
+            chunk['pdb_residual'].tolist(),
+            amino_acids.encode(chunk['mut_from']).tolist(),
+            amino_acids.encode(chunk['mut_to']).tolist(),
+            chunk['ddg'].tolist(),
+        ),
+    )
+    total += len(chunk)
+print(f"[OK] ddg_info: {total:,} rows")
+
+conn.execute("CREATE INDEX idx_composite ON ddg_info(pdb, pdb_residual, mut_from, mut_to)")
+conn.commit()
+conn.execute("VACUUM")
+conn.close()
+
+source_size = os.path.getsize(backends.SQLITE_PATH)
+print(f"[OK] {os.path.getsize(path) / 1e6:,.1f} MB, down from {source_size / 1e6:,.1f} MB")
+gene_stats.mark_updated()
+print("\nDone! Normalized database has been written.")
@@ -0,0 +1,32 @@
+"""
+Precompute the per-gene residue x mut_to median/mean/count matrices behind
+the residue heatmap page, and the per-residue ΔΔG profiles behind the
+page1 profile track, so neither groups a gene's rows per request.
+Residues are in gene numbering, mapped through gene_pdbs.gene_map; rows of
+structures that do not map to the gene are left out.
+Re-run whenever keogh.db is rebuilt.
+"""
+import pandas as pd
+
+from pages import backends, gene_map, gene_stats, residue_matrix, residue_profile
+
+gene_pdbs = pd.read_csv("gene_pdbs")
+mappers = gene_map.mappers(gene_map.parse_gene_maps(gene_pdbs))
+
+print(f"Writing residue matrices to {residue_matrix.RESIDUE_MATRIX_DIR}/ "
+      f"and profiles to {residue_profile.RESIDUE_PROFILE_DIR}/ ...")
+
+for gene, rows in backends.scan_genes(gene_pdbs, ['pdb', 'pdb_residual', 'mut_to', 'ddg']):
+    if gene not in mappers:
+        print(f"[SKIP] {gene}: no gene_map")
+        continue
+    gene_residues = mappers[gene].to_gene(rows['pdb'].to_numpy(), rows['pdb_residual'].to_numpy())
+    rows = rows.assign(gene_residue=gene_residues).dropna(subset=['gene_residue'])
+    matrix = residue_matrix.compute_residue_matrix(rows['gene_residue'].astype('int32'), rows['mut_to'], rows['ddg'])
+    residue_matrix.save_residue_matrix(gene, matrix)
+    profile = residue_profile.compute_residue_profile(rows['gene_residue'].astype('int32'), rows['ddg'])
+    residue_profile.save_residue_profile(gene, profile)
+    print(f"[OK] {gene}: {len(matrix['residues']):,} residues, {int(matrix['count'].sum()):,} values")
+
+gene_stats.mark_updated()
+print("\nDone! Residue matrices and profiles have been precomputed.")
@@ -0,0 +1,34 @@
+"""
+Precompute the per-structure and per-gene quantile sketches used for
+percentiles over gene sets (see pages/sketches.py for the error bound).
+Re-run whenever keogh.db is rebuilt.
+"""
+import numpy as np
+import pandas as pd
+
+from pages import backends, gene_stats, sketches
+
+gene_pdbs = pd.read_csv("gene_pdbs")
+
+print(f"Writing quantile sketches to {sketches.SKETCH_DIR}/ ...")
+
+pdb_sketches = {}
+gene_sketches = {}
+for gene, rows in backends.scan_genes(gene_pdbs, ['pdb', 'ddg']):
+    gene_sketches[gene] = sketches.sketch(rows['ddg'])
+    # Structures shared between genes are sketched once
+    for pdb, values in rows.groupby('pdb')['ddg']:
+        if pdb not in pdb_sketches:
+            pdb_sketches[pdb] = sketches.sketch(values)
+    print(f"[OK] {gene}: {gene_sketches[gene][0]:,} values in {rows['pdb'].nunique()} structures")
+
+for kind, table in (('pdb', pdb_sketches), ('gene', gene_sketches)):
+    names = sorted(table)
+    sketches.SketchTable(
+        names,
+        [table[name][0] for name in names],
+        np.array([table[name][1] for name in names]).reshape(len(names), sketches.SKETCH_SIZE + 1),
+    ).save(sketches.sketch_path(kind))
+
+gene_stats.mark_updated()
+print("\nDone! Quantile sketches have been precomputed.")
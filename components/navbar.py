@@ -9,6 +9,8 @@ def Navbar():
         dbc.NavbarSimple(
             children=[
                 dbc.NavItem(dbc.NavLink("Folding Dashboard", href="/page1")),
+                dbc.NavItem(dbc.NavLink("Residue Heatmap", href="/page2")),
+                dbc.NavItem(dbc.NavLink("Compare Genes", href="/page4")),
             ] ,
             brand="Folding DashBoard",
             brand_href="/page1",
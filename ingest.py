@@ -0,0 +1,244 @@
+"""
+Load the ddg_info CSV chunks into SQLite (keogh.db) or DuckDB in one run:
+chunks are checksummed and parsed in parallel, in bounded blocks, with
+typed columns, the composite lookup index is built, and a manifest of
+chunk checksums is written next to the database. Re-running only ingests
+chunks that are not in the manifest yet. Ingested chunks that are not
+listed are left alone; if a listed chunk changed, or --prune drops
+unlisted ones, the store is rebuilt beside the old one and swapped in
+when complete. Delta runs write into the live database with its rollback
+journal, one transaction per chunk; if a run is killed, the next one
+keeps the committed chunks and rebuilds if a chunk was caught part way.
+
+    python ingest.py                              # SQLite keogh.db
+    python ingest.py --target duckdb              # ddg_info/ddg_info.db
+    python ingest.py ddg_info/ddg_info11.csv      # add one chunk
+    python ingest.py --prune ddg_info/ddg_info?.csv
+    python ingest.py --full --workers 8 ddg_info/ddg_info1.csv ...
+"""
+import argparse
+import glob
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from pages import backends
+
+# Chunks are ddg_info1.csv ... ddg_info10.csv; ddg_info.csv is the unsplit file
+DEFAULT_CHUNKS = "ddg_info/ddg_info?*.csv"
+
+COLUMN_TYPES = {
+    'pdb': ('TEXT', str),
+    'pdb_residual': ('INTEGER', 'int32'),
+    'mut_from': ('TEXT', str),
+    'mut_to': ('TEXT', str),
+    'ddg': ('REAL', 'float64'),
+}
+DUCKDB_TYPES = {'TEXT': 'VARCHAR', 'INTEGER': 'INTEGER', 'REAL': 'DOUBLE'}
+INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_composite ON ddg_info(pdb, pdb_residual, mut_from, mut_to)"
+
+# Chunks are parsed in blocks of about this many bytes, so at most `workers`
+# blocks are held in memory at once however large a chunk is
+BLOCK_BYTES = 32 << 20
+
+
+def checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def blocks(path, size=BLOCK_BYTES):
+    """(path, start, end) byte ranges of a CSV chunk after its header, each ending on a line break."""
+    ranges = []
+    with open(path, 'rb') as f:
+        f.readline()
+        start = f.tell()
+        end_of_file = os.fstat(f.fileno()).st_size
+        while start < end_of_file:
+            f.seek(min(start + size, end_of_file))
+            f.readline()
+            ranges.append((path, start, f.tell()))
+            start = f.tell()
+    return ranges
+
+
+def read_block(path, start, end):
+    dtype = {column: pandas_type for column, (_, pandas_type) in COLUMN_TYPES.items()}
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(start)
+        data = f.read(end - start)
+    return pd.read_csv(io.BytesIO(header + data), dtype=dtype)
+
+
+def column_definitions(columns):
+    return ', '.join(f"{column} {COLUMN_TYPES.get(column, ('TEXT',))[0]}" for column in columns)
+
+
+def ingest_sqlite(path, chunks, pool, workers, in_place):
+    conn = sqlite3.connect(path)
+    if in_place:
+        # Adding to the live database: keep the rollback journal and sync each
+        # chunk's commit, so a killed run loses at most the chunk in progress
+        conn.execute("PRAGMA synchronous = FULL")
+    else:
+        # A fresh file that is only swapped in once complete needs neither
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+    chunk_blocks = {chunk: blocks(chunk) for chunk in chunks}
+    queue = deque(block for chunk in chunks for block in chunk_blocks[chunk])
+    # Parse up to `workers` blocks ahead of the single SQLite writer
+    pending = deque(pool.submit(read_block, *queue.popleft()) for _ in range(min(workers, len(queue))))
+    for chunk in chunks:
+        rows = 0
+        for _ in chunk_blocks[chunk]:
+            frame = pending.popleft().result()
+            if queue:
+                pending.append(pool.submit(read_block, *queue.popleft()))
+
+            conn.execute(f"CREATE TABLE IF NOT EXISTS ddg_info ({column_definitions(frame.columns)})")
+            placeholders = ','.join('?' * len(frame.columns))
+            conn.executemany(
+                f"INSERT INTO ddg_info ({', '.join(frame.columns)}) VALUES ({placeholders})",
+                frame.itertuples(index=False, name=None),
+            )
+            rows += len(frame)
+        # One transaction per chunk, so the manifest never records part of one
+        conn.commit()
+        yield chunk, rows
+
+    print("Building composite index...")
+    conn.execute(INDEX_SQL)
+    conn.commit()
+    conn.close()
+
+
+def ingest_duckdb(path, chunks):
+    import duckdb
+
+    # DuckDB parses each CSV across all cores itself
+    conn = duckdb.connect(path)
+    for chunk in chunks:
+        header = pd.read_csv(chunk, nrows=0).columns
+        types = {column: DUCKDB_TYPES[COLUMN_TYPES.get(column, ('TEXT',))[0]] for column in header}
+        source = f"read_csv(?, header=true, columns={types!r})"
+        conn.execute(f"CREATE TABLE IF NOT EXISTS ddg_info AS SELECT * FROM {source} LIMIT 0", [chunk])
+        before = conn.execute("SELECT COUNT(*) FROM ddg_info").fetchone()[0]
+        conn.execute(f"INSERT INTO ddg_info SELECT * FROM {source}", [chunk])
+        yield chunk, conn.execute("SELECT COUNT(*) FROM ddg_info").fetchone()[0] - before
+
+    print("Building composite index...")
+    conn.execute(INDEX_SQL)
+    conn.close()
+
+
+def write_manifest(path, manifest):
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(partial, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('chunks', nargs='*', help=f"CSV chunks to ingest (default: {DEFAULT_CHUNKS})")
+    parser.add_argument('--target', choices=['sqlite', 'duckdb'], default='sqlite')
+    parser.add_argument('--db', help="database path (default: keogh.db or ddg_info/ddg_info.db)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--full', action='store_true', help="rebuild from scratch, ignoring the manifest")
+    parser.add_argument('--prune', action='store_true', help="drop ingested chunks that are not listed")
+    args = parser.parse_args()
+
+    chunks = sorted(args.chunks or glob.glob(DEFAULT_CHUNKS))
+    if not chunks:
+        parser.error(f"no CSV chunks found matching {DEFAULT_CHUNKS}")
+    db_path = args.db or (backends.SQLITE_PATH if args.target == 'sqlite' else backends.DUCKDB_PATH)
+    manifest_path = f"{db_path}.manifest.json"
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers) as pool:
+        checksums = dict(zip(chunks, pool.map(checksum, chunks)))
+
+        manifest = {}
+        if not args.full and os.path.exists(db_path):
+            if not os.path.exists(manifest_path):
+                parser.error(f"{db_path} has no manifest of ingested chunks; pass --full to rebuild it")
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+
+        # Chunks missing from the command line stay as they are unless --prune drops them
+        changed = [chunk for chunk in chunks if chunk in manifest and manifest[chunk]['sha256'] != checksums[chunk]]
+        unlisted = [chunk for chunk in manifest if chunk not in checksums]
+        # Chunks a killed run had started on may be partly in the store
+        interrupted = [chunk for chunk, entry in manifest.items() if entry['rows'] is None]
+        kept = [] if args.prune else unlisted
+        rebuild = args.full or bool(changed) or bool(interrupted) or (args.prune and bool(unlisted))
+        if rebuild and kept:
+            # Rows can't be removed per chunk, so kept chunks are re-read and must be unchanged
+            missing = [chunk for chunk in kept if not os.path.exists(chunk)]
+            if missing:
+                parser.error(f"cannot rebuild without {', '.join(missing)}; list it again or pass --prune")
+            checksums.update(zip(kept, pool.map(checksum, kept)))
+            moved = [chunk for chunk in kept if checksums[chunk] != manifest[chunk]['sha256']]
+            if moved:
+                parser.error(f"{', '.join(moved)} changed since it was ingested; list it to re-ingest it")
+
+        if rebuild:
+            if changed:
+                print(f"Chunks changed since they were ingested ({', '.join(changed)}), rebuilding...")
+            if interrupted:
+                print(f"An earlier run stopped while ingesting {', '.join(interrupted)}, rebuilding...")
+            if args.prune and unlisted:
+                print(f"Pruning chunks that were not listed ({', '.join(unlisted)}), rebuilding...")
+            # Build next to the old store and swap it in at the end, so it stays readable until then
+            target = f"{db_path}.rebuild"
+            for leftover in (target, f"{target}.wal", f"{target}.manifest.json"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            manifest = {}
+            delta = sorted(set(chunks) | set(kept))
+        else:
+            target = db_path
+            delta = [chunk for chunk in chunks if chunk not in manifest]
+        if not delta:
+            print(f"{db_path} is up to date.")
+            return
+        print(f"Ingesting {len(delta)} chunks into {db_path}...")
+        if not rebuild:
+            # Pending until committed, so a run killed mid-chunk is rebuilt rather than resumed into duplicates
+            for chunk in delta:
+                manifest[chunk] = {'sha256': checksums[chunk], 'rows': None}
+            write_manifest(manifest_path, manifest)
+
+        if args.target == 'sqlite':
+            ingested = ingest_sqlite(target, delta, pool, args.workers, in_place=not rebuild)
+        else:
+            ingested = ingest_duckdb(target, delta)
+
+        # Record each chunk as soon as it is committed so an interrupted run resumes from there
+        total = 0
+        for chunk, rows in ingested:
+            manifest[chunk] = {'sha256': checksums[chunk], 'rows': rows}
+            write_manifest(f"{target}.manifest.json", manifest)
+            total += rows
+            print(f"[OK] {chunk}: {rows:,} rows")
+
+        if rebuild:
+            os.replace(target, db_path)
+            os.replace(f"{target}.manifest.json", manifest_path)
+
+    print(f"\nDone! Ingested {total:,} rows in {time.perf_counter() - start:.1f} seconds.")
+
+
+if __name__ == '__main__':
+    main()
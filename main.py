@@ -9,48 +9,32 @@ class MockComm:
 sys.modules['comm'] = MockComm()
 
 # Import necessary libraries
-from dash import html, dcc
-from dash.dependencies import Input, Output
-import plotly.express as px
+from dash import html, dcc, no_update
+from dash.dependencies import Input, Output, State
 
 # Connect to main app.py file
-from app import app
+from app import app, background_callback_manager
 
 # Connect to your app pages
-from pages import page1
+from pages import api, metrics, page1, page2, page4, structure_filters
 
 # Connect the navbar to the index
 from components import navbar
 
-# Define default graphs so they appear consistent whether empty of with data plotted
-empty_gene_histogram = px.histogram(
-    [],
-    range_x=[-10, 100],
-    nbins=1000,
-    title=f'Histogram of ΔΔG values for selected gene',
-    template="plotly_white",
-)
-empty_gene_histogram.update_yaxes(showticklabels=False, title="Frequency")
-empty_gene_histogram.update_xaxes(showgrid=False, title="ΔΔG (kcal/mol)")
-
-empty_variant_histogram = px.histogram(
-    [],
-    range_x=[-10, 100],
-    nbins=20,
-    title='Histogram of ΔΔG values for selected variant',
-    labels={'x': 'ΔΔG (kcal/mol)', 'y': 'Frequency'},
-    template="plotly_white",
-)
-empty_variant_histogram.update_yaxes(showticklabels=False, title="Frequency")
-empty_variant_histogram.update_xaxes(showgrid=False, title="ΔΔG (kcal/mol)")
-
-
 # Define the navbar
 nav = navbar.Navbar()
 
 # expose the server for gunicorn
 server = app.server
 
+# Opt-in timing hooks and /metrics endpoint (DDG_METRICS=1)
+metrics.init_app(server)
+metrics.register_gauge("dashboard_cache_hits", "page1 result cache hits", lambda: page1.result_cache.hits)
+metrics.register_gauge("dashboard_cache_misses", "page1 result cache misses", lambda: page1.result_cache.misses)
+
+# Batch scoring (/api/batch) and raw row export (/api/export) endpoints
+api.init_app(server)
+
 # Define the index page layout
 app.layout = html.Div([
     dcc.Location(id='url', refresh=False),
@@ -90,40 +74,175 @@ def update_dropdown_page1_2c(gene_selected, residual_selected, mutfrom_selected)
     return dropdownlist
 
 
+def needs_background(selection, structure_filter):
+    """Whether the gene histogram or percentile of a complete selection would scan the gene's rows."""
+    gene_selected = selection[0]
+    return (background_callback_manager is not None and None not in selection
+            and not (page1.gene_histogram_precomputed(gene_selected, structure_filter)
+                     and page1.gene_percentile_precomputed(gene_selected, structure_filter)))
+
+
+# The figure, text and link callbacks below skip their initial call: page1.get_layout
+# has already filled in their outputs for the selection in the URL.
 @app.callback(
-    [Output(component_id = "gene_ddg", component_property = "figure"),
-     Output(component_id = "variant_ddg", component_property = "figure"),
+    [Output(component_id = "variant_ddg", component_property = "figure"),
      Output(component_id = "gene_ddg_markdown", component_property = "children")],
     [Input(component_id = "gene_selected", component_property = "value"),
      Input(component_id = "residual_selected", component_property = "value"),
      Input(component_id = "mutfrom_selected", component_property = "value"),
-     Input(component_id = "mutto_selected", component_property = "value")],
+     Input(component_id = "mutto_selected", component_property = "value"),
+     Input(component_id = "structure_method", component_property = "value"),
+     Input(component_id = "min_coverage", component_property = "value"),
+     Input(component_id = "max_resolution", component_property = "value")],
+    prevent_initial_call=True,
 )
-def update_graphs_and_markdown(gene_selected, residual_selected, mutfrom_selected, mutto_selected):
-    if None in {mutto_selected, gene_selected, residual_selected, mutfrom_selected}:
-        return [
-            empty_gene_histogram,
-            empty_variant_histogram,
-            "",
-        ]
+def update_graphs_and_markdown(gene_selected, residual_selected, mutfrom_selected, mutto_selected,
+                               structure_method='all', min_coverage=0, max_resolution=None):
+    selection = [gene_selected, residual_selected, mutfrom_selected, mutto_selected]
+    structure_filter = structure_filters.from_values(structure_method, min_coverage, max_resolution)
+    # A percentile that would scan the gene is filled in by the background job with the gene histogram
+    variant_figure, text = page1.variant_results(
+        *selection, structure_filter, include_percentile=not needs_background(selection, structure_filter),
+    )
+    return [variant_figure, text]
+
+
+# The gene histogram is drawn inline from the precomputed counts. Without them (or without
+# what the percentile needs) it means scanning every row of the gene, so that fallback is
+# handed to a background callback (when a manager is configured), which fills in the
+# histogram and the percentile in the markdown after the variant results.
+@app.callback(
+    [Output(component_id = "gene_ddg", component_property = "figure"),
+     Output(component_id = "gene_ddg_job", component_property = "data")],
+    [Input(component_id = "gene_selected", component_property = "value"),
+     Input(component_id = "residual_selected", component_property = "value"),
+     Input(component_id = "mutfrom_selected", component_property = "value"),
+     Input(component_id = "mutto_selected", component_property = "value"),
+     Input(component_id = "structure_method", component_property = "value"),
+     Input(component_id = "min_coverage", component_property = "value"),
+     Input(component_id = "max_resolution", component_property = "value")],
+    prevent_initial_call=True,
+)
+def update_gene_graph(gene_selected, residual_selected, mutfrom_selected, mutto_selected,
+                      structure_method='all', min_coverage=0, max_resolution=None):
+    selection = [gene_selected, residual_selected, mutfrom_selected, mutto_selected]
+    structure_filter = structure_filters.from_values(structure_method, min_coverage, max_resolution)
+    if needs_background(selection, structure_filter):
+        return [no_update, selection + [structure_method, min_coverage, max_resolution]]
+    return [page1.gene_result(*selection, structure_filter), no_update]
+
+
+if background_callback_manager is not None:
+    # Runs in a forked job process, where the backends open their own connections.
+    # A newer selection cancels the job still running for the old one.
+    @app.callback(
+        [Output(component_id = "gene_ddg", component_property = "figure", allow_duplicate=True),
+         Output(component_id = "gene_ddg_markdown", component_property = "children", allow_duplicate=True)],
+        Input(component_id = "gene_ddg_job", component_property = "data"),
+        background=True,
+        interval=100,
+        cancel=[Input(component_id = "gene_selected", component_property = "value"),
+                Input(component_id = "residual_selected", component_property = "value"),
+                Input(component_id = "mutfrom_selected", component_property = "value"),
+                Input(component_id = "mutto_selected", component_property = "value"),
+                Input(component_id = "structure_method", component_property = "value"),
+                Input(component_id = "min_coverage", component_property = "value"),
+                Input(component_id = "max_resolution", component_property = "value")],
+        prevent_initial_call=True,
+    )
+    def update_gene_graph_background(job):
+        gene_selected, residual_selected, mutfrom_selected, mutto_selected, *structure_values = job
+        selection = [gene_selected, residual_selected, mutfrom_selected, mutto_selected]
+        structure_filter = structure_filters.from_values(*structure_values)
+        # One scan of the gene in this process serves both the histogram and the percentile
+        _, text = page1.variant_results(*selection, structure_filter)
+        return [page1.gene_result(*selection, structure_filter), text]
 
-    gene_pdbs = page1.gene_pdbs
-    pdb_values = page1.get_pdb_values(gene_pdbs, gene_selected)
-    median_ddg = page1.calculate_median(pdb_values,residual_selected, mutfrom_selected, mutto_selected)
-    percentile = page1.calculate_percentile(pdb_values, residual_selected, mutfrom_selected, mutto_selected)
 
-    gene_figure = page1.ddg_for_gene_plot(gene_selected, pdb_values, median_ddg)
-    variant_figure = page1.ddg_for_variant_plot(pdb_values, residual_selected, mutfrom_selected, mutto_selected)
-    text = page1.gene_ddg_markdown_text(median_ddg, percentile)
+@app.callback(
+    [Output(component_id = "export_csv", component_property = "href"),
+     Output(component_id = "export_csv", component_property = "disabled"),
+     Output(component_id = "export_parquet", component_property = "href"),
+     Output(component_id = "export_parquet", component_property = "disabled")],
+    [Input(component_id = "gene_selected", component_property = "value"),
+     Input(component_id = "residual_selected", component_property = "value"),
+     Input(component_id = "mutfrom_selected", component_property = "value"),
+     Input(component_id = "mutto_selected", component_property = "value"),
+     Input(component_id = "structure_method", component_property = "value"),
+     Input(component_id = "min_coverage", component_property = "value"),
+     Input(component_id = "max_resolution", component_property = "value")],
+    prevent_initial_call=True,
+)
+def update_export_links(gene_selected, residual_selected, mutfrom_selected, mutto_selected,
+                        structure_method='all', min_coverage=0, max_resolution=None):
+    # Plain links rather than dcc.Download, so the file streams straight from /api/export
+    selection = (gene_selected, residual_selected, mutfrom_selected, mutto_selected)
+    structure_filter = structure_filters.from_values(structure_method, min_coverage, max_resolution)
+    csv_href = page1.export_href(*selection, "csv.gz", structure_filter)
+    parquet_href = page1.export_href(*selection, "parquet", structure_filter)
+    return [csv_href, csv_href is None, parquet_href, parquet_href is None]
 
-    return [gene_figure, variant_figure, text]
+
+@app.callback(
+    Output(component_id = "residue_profile", component_property = "figure"),
+    [Input(component_id = "gene_selected", component_property = "value"),
+     Input(component_id = "residual_selected", component_property = "value"),
+     Input(component_id = "profile_window", component_property = "value")],
+    prevent_initial_call=True,
+)
+def update_residue_profile(gene_selected, residual_selected, window_index):
+    return page1.residue_profile_plot(gene_selected, residual_selected, window_index)
+
+
+@app.callback(
+    Output(component_id = "residue_heatmap", component_property = "figure"),
+    [Input(component_id = "heatmap_gene_selected", component_property = "value"),
+     Input(component_id = "heatmap_metric", component_property = "value")],
+)
+def update_residue_heatmap(gene_selected, metric):
+    return page2.residue_heatmap_plot(gene_selected, metric)
+
+
+@app.callback(
+    [Output(component_id = "compare_histogram", component_property = "figure"),
+     Output(component_id = "compare_table", component_property = "children")],
+    [Input(component_id = "compare_genes", component_property = "value"),
+     Input(component_id = "compare_all", component_property = "value"),
+     Input(component_id = "compare_ddg", component_property = "value")],
+)
+def update_comparison(genes, include_all, value):
+    figure, table = page4.comparison(genes, 'all' in (include_all or []), value)
+    return [figure, table]
+
+
+# Keep the page1 selection in the URL, so it can be shared and reloaded
+@app.callback(
+    Output('url', 'search'),
+    [Input(component_id = "gene_selected", component_property = "value"),
+     Input(component_id = "residual_selected", component_property = "value"),
+     Input(component_id = "mutfrom_selected", component_property = "value"),
+     Input(component_id = "mutto_selected", component_property = "value"),
+     Input(component_id = "structure_method", component_property = "value"),
+     Input(component_id = "min_coverage", component_property = "value"),
+     Input(component_id = "max_resolution", component_property = "value")],
+    prevent_initial_call=True,
+)
+def update_url(gene_selected, residual_selected, mutfrom_selected, mutto_selected,
+               structure_method='all', min_coverage=0, max_resolution=None):
+    structure_filter = structure_filters.from_values(structure_method, min_coverage, max_resolution)
+    return page1.selection_search(gene_selected, residual_selected, mutfrom_selected, mutto_selected, structure_filter)
 
 
 @app.callback(Output('page-content', 'children'),
-              [Input('url', 'pathname')])
-def display_page(pathname):
+              [Input('url', 'pathname')],
+              [State('url', 'search')])
+def display_page(pathname, search=None):
     if pathname == '/' or pathname == '/page1':
-        return page1.layout
+        return page1.get_layout(search)
+    elif pathname == '/page2':
+        return page2.get_layout()
+    elif pathname == '/page4':
+        return page4.get_layout()
     else:  # if redirected to unknown link
         return "404 Page Error! Please choose a link"
 
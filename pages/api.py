@@ -0,0 +1,226 @@
+"""
+HTTP API for scoring many variants, gene-set percentiles and raw row export,
+without the page1 dropdowns.
+
+    POST /api/batch?format=csv|json
+
+The variants are either a JSON body, {"variants": [[gene, residue, mut_from,
+mut_to], ...]} (or objects with those keys), or a CSV with gene, residue,
+mut_from and mut_to columns, uploaded as the "file" form field or sent as a
+text/csv body. Results come from page1.calculate_batch and are streamed back
+in chunks, CSV by default.
+
+    GET /api/percentile?ddg=...[&genes=A,B,...][&exact=1]
+
+Percentile of a ΔΔG value within a set of genes (all genes by default),
+from the merged quantile sketches unless exact=1. Unknown genes are a 404;
+genes without any ΔΔG values give a null percentile and a message.
+
+    GET /api/export?gene=...[&residue=...&mut_from=...&mut_to=...]&format=csv.gz|parquet
+
+Streams the ddg_info rows behind the gene plot (or the variant plot), limited
+by the same method/min_coverage/max_resolution structure filters, as
+gzipped CSV or Parquet. Rows are read, encoded and sent one chunk at a time,
+so a whole gene is never held in memory.
+"""
+import importlib.util
+import io
+import json
+import math
+import re
+import zlib
+
+import pandas as pd
+
+from pages import lookup_tables, page1, sketches, structure_filters
+
+STREAM_CHUNK_ROWS = 10_000
+
+CSV_DTYPES = {'gene': str, 'mut_from': str, 'mut_to': str}
+
+# Characters kept from the selection when naming the download
+UNSAFE_FILENAME_CHARACTERS = re.compile(r'[^A-Za-z0-9_.-]')
+
+EXPORT_FORMATS = {'csv.gz': "application/gzip", 'parquet': "application/vnd.apache.parquet"}
+
+
+def read_variants(request):
+    """Variants from a CSV upload, CSV body or JSON body, as a DataFrame."""
+    if request.files:
+        upload = request.files.get('file') or next(iter(request.files.values()))
+        return pd.read_csv(upload, usecols=page1.BATCH_COLUMNS, dtype=CSV_DTYPES)
+    if request.mimetype == 'text/csv':
+        return pd.read_csv(io.BytesIO(request.get_data()), usecols=page1.BATCH_COLUMNS, dtype=CSV_DTYPES)
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get('variants'), list):
+        raise ValueError('expected a CSV upload or a JSON body with a "variants" list')
+    # Works for both lists of rows and lists of {"gene": ...} objects
+    return pd.DataFrame(body['variants'], columns=page1.BATCH_COLUMNS)
+
+
+def stream_csv(result):
+    yield result.iloc[:0].to_csv(index=False)
+    for start in range(0, len(result), STREAM_CHUNK_ROWS):
+        yield result.iloc[start:start + STREAM_CHUNK_ROWS].to_csv(index=False, header=False)
+
+
+def stream_json(result):
+    yield '['
+    for start in range(0, len(result), STREAM_CHUNK_ROWS):
+        records = result.iloc[start:start + STREAM_CHUNK_ROWS].to_json(orient='records')
+        yield (',' if start else '') + records[1:-1]
+    yield ']'
+
+
+def stream_csv_gzip(chunks):
+    # wbits=31 writes a gzip container rather than a bare zlib stream
+    compressor = zlib.compressobj(wbits=31)
+    yield compressor.compress((','.join(page1.EXPORT_COLUMNS) + '\n').encode())
+    for chunk in chunks:
+        data = compressor.compress(chunk.to_csv(index=False, header=False).encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _ChunkSink:
+    """Write-only file that hands whatever ParquetWriter has written so far back to a generator."""
+
+    closed = False
+
+    def __init__(self):
+        self.buffer = []
+        self.position = 0
+
+    def write(self, data):
+        self.buffer.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def stream_parquet(chunks):
+    """One row group per chunk, each sent as soon as it is written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('pdb', pa.string()),
+        ('pdb_residual', pa.int32()),
+        ('mut_from', pa.string()),
+        ('mut_to', pa.string()),
+        ('ddg', pa.float64()),
+        ('gene_residue', pa.int32()),
+    ])
+    sink = _ChunkSink()
+    with pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema, compression='zstd') as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def init_app(server):
+    """Attach the /api/batch, /api/percentile and /api/export routes to the Flask server."""
+    import flask
+
+    def bad_request(message, status=400):
+        return flask.Response(json.dumps({'error': message}), status=status, mimetype="application/json")
+
+    @server.route("/api/batch", methods=["POST"])
+    def batch_endpoint():
+        output = flask.request.args.get('format', 'csv')
+        if output not in ('csv', 'json'):
+            return bad_request(f"unknown format {output!r}")
+        try:
+            variants = read_variants(flask.request)
+        except ValueError as error:
+            return bad_request(str(error))
+
+        result = page1.calculate_batch(variants)
+        if output == 'json':
+            return flask.Response(stream_json(result), mimetype="application/json")
+        return flask.Response(
+            stream_csv(result),
+            mimetype="text/csv",
+            headers={'Content-Disposition': 'attachment; filename="ddg_batch.csv"'},
+        )
+
+    @server.route("/api/percentile")
+    def percentile_endpoint():
+        args = flask.request.args
+        ddg = args.get('ddg', type=float)
+        if ddg is None:
+            return bad_request("ddg is required")
+        if not math.isfinite(ddg):
+            return bad_request("ddg must be a finite number")
+        genes = args.get('genes')
+        genes = [gene for gene in genes.split(',') if gene] if genes else None
+        if genes is not None:
+            known = set(lookup_tables.gene_names())
+            unknown = [gene for gene in genes if gene not in known]
+            if unknown:
+                return bad_request(f"unknown genes: {', '.join(unknown)}", status=404)
+        percentile, exact = page1.calculate_gene_set_percentile(ddg, genes, exact=args.get('exact') == '1')
+        result = {
+            'ddg': ddg,
+            'genes': genes or 'all',
+            'percentile': percentile,
+            'exact': exact,
+            'error_bound': 0 if exact else 100 * sketches.ERROR_BOUND,
+        }
+        if percentile is None:
+            result['message'] = "no ΔΔG values for these genes"
+        return flask.jsonify(result)
+
+    @server.route("/api/export")
+    def export_endpoint():
+        args = flask.request.args
+        gene = args.get('gene')
+        output = args.get('format', 'csv.gz')
+        residue = args.get('residue')
+        mut_from = args.get('mut_from')
+        mut_to = args.get('mut_to')
+        if not gene:
+            return bad_request("gene is required")
+        variant = (residue, mut_from, mut_to)
+        if any(value is not None for value in variant) and None in variant:
+            return bad_request("a variant needs all of residue, mut_from and mut_to")
+        if residue is not None:
+            try:
+                residue = int(residue)
+            except ValueError:
+                return bad_request(f"residue must be an integer, not {residue!r}")
+        if output not in EXPORT_FORMATS:
+            return bad_request(f"unknown format {output!r}, expected one of {sorted(EXPORT_FORMATS)}")
+        if output == 'parquet' and importlib.util.find_spec("pyarrow") is None:
+            return bad_request("Parquet export needs pyarrow installed")
+
+        structure_filter = structure_filters.from_values(
+            args.get('method'),
+            args.get('min_coverage', type=float),
+            args.get('max_resolution', type=float),
+        )
+        chunks = page1.export_rows(gene, residue, mut_from, mut_to, structure_filter)
+        stream = stream_parquet(chunks) if output == 'parquet' else stream_csv_gzip(chunks)
+        name = '_'.join(
+            UNSAFE_FILENAME_CHARACTERS.sub('_', str(part)) for part in (gene, residue, mut_from, mut_to) if part is not None
+        )
+        return flask.Response(
+            stream,
+            mimetype=EXPORT_FORMATS[output],
+            headers={'Content-Disposition': f'attachment; filename="{name}_ddg.{output}"'},
+        )
@@ -0,0 +1,581 @@
+import json
+import os
+import sqlite3
+import threading
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from pages import cache, encoding, gene_stats, metrics
+
+# Which storage engine page1 reads ddg_info from: sqlite, normalized, duckdb, parquet or memmap
+DDG_BACKEND = os.environ.get("DDG_BACKEND", "sqlite")
+
+SQLITE_PATH = "keogh.db"
+NORMALIZED_SQLITE_PATH = os.path.join(gene_stats.PRECOMPUTED_DIR, "keogh_normalized.db")
+DUCKDB_PATH = "ddg_info/ddg_info.db"
+PARQUET_DIR = os.path.join(gene_stats.PRECOMPUTED_DIR, "parquet")
+MEMMAP_DIR = os.path.join(gene_stats.PRECOMPUTED_DIR, "memmap")
+
+# Probes per statement when resolving a batch of variants against SQLite
+BATCH_CHUNK_SIZE = 50_000
+
+# Rows per chunk yielded by iter_rows, bounding memory while exporting
+EXPORT_CHUNK_ROWS = 50_000
+EXPORT_COLUMNS = ['pdb', 'pdb_residual', 'mut_from', 'mut_to', 'ddg']
+
+# Applied to every read-only SQLite connection
+SQLITE_PRAGMAS = {
+    'query_only': 1,
+    'temp_store': 'MEMORY',
+    'mmap_size': int(os.environ.get("DDG_SQLITE_MMAP_SIZE", 2 ** 30)),
+    'cache_size': -int(os.environ.get("DDG_SQLITE_CACHE_KB", 64 * 1024)),
+}
+
+
+class SQLiteConnections:
+    """Hands each thread its own read-only connection to one SQLite file.
+
+    Connections are opened lazily on first use in a thread, so nothing is
+    shared across threads or inherited over a gunicorn fork. A process
+    forked after a thread connected (a background callback job) opens its
+    own connection too, rather than using the parent's.
+    """
+
+    def __init__(self, path, pragmas=SQLITE_PRAGMAS):
+        self.uri = f"file:{quote(os.path.abspath(path))}?mode=ro"
+        self.pragmas = pragmas
+        self._local = threading.local()
+        # Connections inherited over a fork are kept open but unused: closing them is not fork-safe either
+        self._inherited = []
+
+    def get(self):
+        con = getattr(self._local, 'con', None)
+        if con is not None and self._local.pid != os.getpid():
+            self._inherited.append(con)
+            con = None
+        if con is None:
+            con = sqlite3.connect(self.uri, uri=True)
+            for name, value in self.pragmas.items():
+                con.execute(f"PRAGMA {name} = {value}")
+            self._local.con = con
+            self._local.pid = os.getpid()
+        return con
+
+
+def scan_genes(gene_pdbs, columns, order_by=(), distinct=False, path=SQLITE_PATH):
+    """Yield (gene, rows) for every gene of `gene_pdbs`, reading keogh.db read-only.
+
+    For the build scripts: rows holds `columns` of the ddg_info rows of the
+    gene's structures (distinct if asked, sorted by `order_by`), so only one
+    gene is in memory at a time. A missing keogh.db is an error, not a new
+    empty database.
+    """
+    con = SQLiteConnections(path).get()
+    select = f"SELECT {'DISTINCT ' if distinct else ''}{', '.join(columns)} FROM ddg_info"
+    order = f" ORDER BY {', '.join(order_by)}" if order_by else ""
+    for gene, group in gene_pdbs.groupby('name_of_gene'):
+        pdb_values = group['pdb'].unique().tolist()
+        placeholders = ','.join('?' * len(pdb_values))
+        yield gene, pd.read_sql_query(f"{select} WHERE pdb IN ({placeholders}){order}", con, params=pdb_values)
+
+
+class SQLiteBackend:
+    name = "sqlite"
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self.connections = SQLiteConnections(path)
+        self._residue_ranges = {}
+        self._residue_ranges_version = None
+
+    @property
+    def con(self):
+        return self.connections.get()
+
+    def _fetch_ddg(self, query, params):
+        cursor = self.con.cursor()
+        with metrics.timer("fetch", self.name):
+            cursor.execute(query, params)
+            results = cursor.fetchall()
+        with metrics.timer("convert", self.name):
+            return np.array([row[0] for row in results], dtype=np.float64)
+
+    def variant_ddg(self, gene, pdb_values, residual, mut_from, mut_to):
+        placeholders = ','.join('?' * len(pdb_values))
+        query = f"""
+            SELECT ddg
+            FROM ddg_info
+            WHERE pdb IN ({placeholders})
+            AND pdb_residual = ?
+            AND mut_from = ?
+            AND mut_to = ?
+        """
+        return self._fetch_ddg(query, (*pdb_values, residual, mut_from, mut_to))
+
+    def gene_ddg(self, gene, pdb_values):
+        placeholders = ','.join('?' * len(pdb_values))
+        query = f"""
+            SELECT ddg
+            FROM ddg_info
+            WHERE pdb IN ({placeholders})
+        """
+        return self._fetch_ddg(query, pdb_values)
+
+    def iter_rows(self, gene, pdb_values, residual=None, mut_from=None, mut_to=None, chunk_size=EXPORT_CHUNK_ROWS):
+        """Yield the gene's ddg_info rows (or one variant's) as DataFrames of at most `chunk_size` rows."""
+        placeholders = ','.join('?' * len(pdb_values))
+        query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM ddg_info WHERE pdb IN ({placeholders})"
+        params = list(pdb_values)
+        if residual is not None:
+            query += " AND pdb_residual = ? AND mut_from = ? AND mut_to = ?"
+            params += [int(residual), mut_from, mut_to]
+        cursor = self.con.cursor()
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield pd.DataFrame(rows, columns=EXPORT_COLUMNS)
+        finally:
+            cursor.close()
+
+    def residue_ranges(self, pdb_values):
+        """(first, last) pdb_residual of each structure, found with index seeks and kept until the file changes."""
+        version = os.stat(self.path).st_mtime_ns
+        if version != self._residue_ranges_version:
+            self._residue_ranges = {}
+            self._residue_ranges_version = version
+        for pdb in set(pdb_values) - self._residue_ranges.keys():
+            self._residue_ranges[pdb] = (
+                self.con.execute("SELECT MIN(pdb_residual) FROM ddg_info WHERE pdb = ?", (pdb,)).fetchone()[0],
+                self.con.execute("SELECT MAX(pdb_residual) FROM ddg_info WHERE pdb = ?", (pdb,)).fetchone()[0],
+            )
+        return self._residue_ranges
+
+    def batch_variant_ddg(self, variants, gene_pdbs):
+        """Resolve many variants at once.
+
+        `variants` has gene, residue, mut_from and mut_to columns and
+        `gene_pdbs` has gene and pdb columns. Returns (index label in
+        `variants`, ddg) arrays for every matching ddg_info row.
+        """
+        # Most structures only cover part of their gene, so skip probes outside them
+        gene_pdbs = gene_pdbs[gene_pdbs['gene'].isin(variants['gene'].unique())]
+        ranges = self.residue_ranges(gene_pdbs['pdb'])
+        gene_pdbs = gene_pdbs.assign(
+            first=[ranges[pdb][0] for pdb in gene_pdbs['pdb']],
+            last=[ranges[pdb][1] for pdb in gene_pdbs['pdb']],
+        )
+        probes = variants.rename_axis('row').reset_index().merge(gene_pdbs, on='gene')
+        probes = probes[(probes['residue'] >= probes['first']) & (probes['residue'] <= probes['last'])]
+        probes = probes[['row', 'pdb', 'residue', 'mut_from', 'mut_to']]
+
+        # Each chunk is one statement: the probes are passed as a single JSON
+        # parameter and joined against the composite index
+        query = """
+            SELECT json_extract(probe.value, '$[0]'), ddg_info.ddg
+            FROM json_each(?) AS probe
+            CROSS JOIN ddg_info
+            WHERE ddg_info.pdb = json_extract(probe.value, '$[1]')
+            AND ddg_info.pdb_residual = json_extract(probe.value, '$[2]')
+            AND ddg_info.mut_from = json_extract(probe.value, '$[3]')
+            AND ddg_info.mut_to = json_extract(probe.value, '$[4]')
+        """
+        cursor = self.con.cursor()
+        results = []
+        for start in range(0, len(probes), BATCH_CHUNK_SIZE):
+            payload = probes.iloc[start:start + BATCH_CHUNK_SIZE].to_json(orient='values')
+            cursor.execute(query, (payload,))
+            results.extend(cursor.fetchall())
+        rows = np.array(results, dtype=np.float64).reshape(-1, 2)
+        return rows[:, 0].astype(np.int64), rows[:, 1]
+
+    def disk_size(self):
+        return os.path.getsize(self.path)
+
+
+class NormalizedSQLiteBackend(SQLiteBackend):
+    """Reads the integer-encoded SQLite database written by build_normalized_db.py.
+
+    Its ddg_info has the same columns and index as keogh.db, but pdb,
+    mut_from and mut_to hold codes into the pdbs and amino_acids tables.
+    Names are encoded before each query and rows decoded on the way out,
+    so callers see the same interface as SQLiteBackend.
+    """
+    name = "normalized"
+
+    def __init__(self, path=NORMALIZED_SQLITE_PATH):
+        super().__init__(path)
+        # Holds the codebooks, dropped along with the connections when the store's fingerprint changes
+        self._codebooks = cache.ResultCache(watch_paths=[path], maxsize=2, ttl=float('inf'), directory=None)
+        self._connections_version = self._codebooks.version
+
+    @property
+    def con(self):
+        version = self._codebooks.version
+        if version != self._connections_version:
+            # Rebuilt under a running server: new connections open the new file, whose codes are read afresh
+            self.connections = SQLiteConnections(self.path)
+            self._connections_version = version
+        return self.connections.get()
+
+    # Read on first use, so constructing the backend (at import) does not connect
+    @property
+    def pdbs(self):
+        return self._codebook("pdbs", encoding.CODE_DTYPES['pdb'])
+
+    @property
+    def amino_acids(self):
+        return self._codebook("amino_acids", encoding.CODE_DTYPES['amino_acid'])
+
+    def _codebook(self, table, dtype):
+        found, codebook = self._codebooks.get((table,), shared=False)
+        if not found:
+            codebook = encoding.Codebook(self._names(table), dtype)
+            self._codebooks.set((table,), codebook, shared=False)
+        return codebook
+
+    def _names(self, table):
+        return [row[0] for row in self.con.execute(f"SELECT name FROM {table} ORDER BY id")]
+
+    def _pdb_codes(self, pdb_values):
+        # Unknown structures encode to -1, which matches no rows
+        return self.pdbs.encode(pdb_values).tolist()
+
+    def variant_ddg(self, gene, pdb_values, residual, mut_from, mut_to):
+        return super().variant_ddg(
+            gene, self._pdb_codes(pdb_values), residual, self.amino_acids.code(mut_from), self.amino_acids.code(mut_to),
+        )
+
+    def gene_ddg(self, gene, pdb_values):
+        return super().gene_ddg(gene, self._pdb_codes(pdb_values))
+
+    def iter_rows(self, gene, pdb_values, residual=None, mut_from=None, mut_to=None, chunk_size=EXPORT_CHUNK_ROWS):
+        if residual is not None:
+            mut_from, mut_to = self.amino_acids.code(mut_from), self.amino_acids.code(mut_to)
+        for chunk in super().iter_rows(gene, self._pdb_codes(pdb_values), residual, mut_from, mut_to, chunk_size):
+            yield encoding.decode_rows(chunk, self.pdbs, self.amino_acids)
+
+    def batch_variant_ddg(self, variants, gene_pdbs):
+        variants = variants.assign(
+            mut_from=self.amino_acids.encode(variants['mut_from']),
+            mut_to=self.amino_acids.encode(variants['mut_to']),
+        )
+        gene_pdbs = gene_pdbs.assign(pdb=self.pdbs.encode(gene_pdbs['pdb']))
+        return super().batch_variant_ddg(variants, gene_pdbs[gene_pdbs['pdb'] >= 0])
+
+
+def _batch_probes(variants, gene_pdbs):
+    """One (row, pdb, residue, mut_from, mut_to) probe per variant and structure of its gene."""
+    probes = variants.rename_axis('row').reset_index().merge(gene_pdbs, on='gene')
+    probes['residue'] = probes['residue'].astype(np.int64)
+    return probes[['row', 'pdb', 'residue', 'mut_from', 'mut_to']]
+
+
+class DuckDBBackend(SQLiteBackend):
+    """Reads the DuckDB database written by `ingest.py --target duckdb`."""
+    name = "duckdb"
+
+    def __init__(self, path=DUCKDB_PATH):
+        import duckdb
+
+        self.duckdb = duckdb
+        self.path = path
+        self._con = None
+        self._pid = None
+
+    @property
+    def con(self):
+        # Connect on first use in each process, so forked workers and jobs never share a connection
+        if self._pid != os.getpid():
+            self._con = self.duckdb.connect(self.path, read_only=True)
+            self._pid = os.getpid()
+        return self._con
+
+    def _fetch_ddg(self, query, params):
+        # DuckDB connections are not thread-safe, cursors are
+        cursor = self.con.cursor()
+        try:
+            result = cursor.execute(query, list(params)).fetchnumpy()
+        finally:
+            cursor.close()
+        return np.asarray(result['ddg'], dtype=np.float64)
+
+    def batch_variant_ddg(self, variants, gene_pdbs):
+        cursor = self.con.cursor()
+        try:
+            cursor.register('batch_probes', _batch_probes(variants, gene_pdbs))
+            result = cursor.execute("""
+                SELECT batch_probes.row, ddg_info.ddg
+                FROM batch_probes
+                JOIN ddg_info
+                ON ddg_info.pdb = batch_probes.pdb
+                AND ddg_info.pdb_residual = batch_probes.residue
+                AND ddg_info.mut_from = batch_probes.mut_from
+                AND ddg_info.mut_to = batch_probes.mut_to
+            """).fetchnumpy()
+        finally:
+            cursor.close()
+        return np.asarray(result['row'], dtype=np.int64), np.asarray(result['ddg'], dtype=np.float64)
+
+
+class ParquetBackend:
+    """Reads the gene-partitioned Parquet dataset written by build_parquet.py.
+
+    Each gene is its own partition and rows are sorted by pdb and residue,
+    so a query only opens one gene's file and skips row groups whose
+    pdb/residue statistics cannot match.
+    """
+    name = "parquet"
+
+    def __init__(self, path=PARQUET_DIR):
+        import pyarrow.dataset as ds
+
+        self.ds = ds
+        self.path = path
+        self.dataset = ds.dataset(path, format="parquet", partitioning="hive")
+
+    def _fetch_ddg(self, gene, pdb_values, condition=None):
+        field = self.ds.field
+        expression = (field('gene') == gene) & field('pdb').isin(pdb_values)
+        if condition is not None:
+            expression = expression & condition
+        table = self.dataset.to_table(columns=['ddg'], filter=expression)
+        return table.column('ddg').to_numpy().astype(np.float64)
+
+    def variant_ddg(self, gene, pdb_values, residual, mut_from, mut_to):
+        field = self.ds.field
+        condition = (
+            (field('pdb_residual') == int(residual))
+            & (field('mut_from') == mut_from)
+            & (field('mut_to') == mut_to)
+        )
+        return self._fetch_ddg(gene, pdb_values, condition)
+
+    def gene_ddg(self, gene, pdb_values):
+        return self._fetch_ddg(gene, pdb_values)
+
+    def iter_rows(self, gene, pdb_values, residual=None, mut_from=None, mut_to=None, chunk_size=EXPORT_CHUNK_ROWS):
+        field = self.ds.field
+        expression = (field('gene') == gene) & field('pdb').isin(pdb_values)
+        if residual is not None:
+            expression = expression & (
+                (field('pdb_residual') == int(residual))
+                & (field('mut_from') == mut_from)
+                & (field('mut_to') == mut_to)
+            )
+        for batch in self.dataset.to_batches(columns=EXPORT_COLUMNS, filter=expression, batch_size=chunk_size):
+            if batch.num_rows:
+                yield batch.to_pandas().astype({'pdb': str, 'mut_from': str, 'mut_to': str})
+
+    def batch_variant_ddg(self, variants, gene_pdbs):
+        # Read each gene's partition once and join its variants in pandas
+        field = self.ds.field
+        rows, ddg = [], []
+        for gene, group in variants.groupby('gene'):
+            pdb_values = gene_pdbs.loc[gene_pdbs['gene'] == gene, 'pdb'].tolist()
+            if not pdb_values:
+                continue
+            table = self.dataset.to_table(
+                columns=['pdb_residual', 'mut_from', 'mut_to', 'ddg'],
+                filter=(field('gene') == gene) & field('pdb').isin(pdb_values),
+            )
+            gene_rows = table.to_pandas().astype({'mut_from': str, 'mut_to': str})
+            matched = group.rename_axis('row').reset_index().astype({'residue': np.int64}).merge(
+                gene_rows,
+                left_on=['residue', 'mut_from', 'mut_to'],
+                right_on=['pdb_residual', 'mut_from', 'mut_to'],
+            )
+            rows.append(matched['row'].to_numpy(np.int64))
+            ddg.append(matched['ddg'].to_numpy(np.float64))
+        if not rows:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float64)
+        return np.concatenate(rows), np.concatenate(ddg)
+
+    def disk_size(self):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, files in os.walk(self.path)
+            for name in files
+        )
+
+
+# Residues take 24 bits of a variant key, offset so negative PDB numbering still sorts correctly
+RESIDUE_OFFSET = 1 << 23
+
+
+def residue_in_range(residue):
+    """Whether each residue number fits in a variant key, i.e. lies in [-2**23, 2**23)."""
+    residue = np.asarray(residue, dtype=np.int64)
+    return (residue >= -RESIDUE_OFFSET) & (residue < RESIDUE_OFFSET)
+
+
+def variant_key(gene_code, residue, mut_from, mut_to):
+    """Pack (gene, residue, mut_from, mut_to) codes into one sortable int64.
+
+    Raises ValueError for residues outside [-2**23, 2**23), which would
+    otherwise spill into the gene bits.
+    """
+    residue = np.asarray(residue, dtype=np.int64)
+    if not residue_in_range(residue).all():
+        raise ValueError(f"residue numbers must lie in [{-RESIDUE_OFFSET}, {RESIDUE_OFFSET})")
+    key = np.asarray(gene_code, dtype=np.int64) << 40
+    key = key | ((residue + RESIDUE_OFFSET) << 16)
+    key = key | (np.asarray(mut_from, dtype=np.int64) << 8)
+    return key | np.asarray(mut_to, dtype=np.int64)
+
+
+class MemmapBackend:
+    """Reads the flat arrays written by build_memmap.py through numpy memory maps.
+
+    Rows are clustered by gene and then by variant, so a gene scan is one
+    contiguous slice and a variant lookup is a binary search on
+    `variant_keys`. The arrays are opened read-only, so when the app is
+    loaded with gunicorn --preload every worker shares the same pages in
+    the OS page cache instead of holding its own copy of the data.
+    """
+    name = "memmap"
+
+    def __init__(self, path=MEMMAP_DIR):
+        self.path = path
+        # build_memmap.py swaps a symlink to each new build; resolve it once so every array comes from one build
+        self.directory = os.path.realpath(path)
+        self.gene_codes = {gene: i for i, gene in enumerate(self._load_json("genes"))}
+        self.gene_pdbs = {gene: set(pdbs) for gene, pdbs in self._load_json("gene_pdbs").items()}
+        self.pdb_codes = {pdb: i for i, pdb in enumerate(self._load_json("pdbs"))}
+        self.amino_acid_codes = {name: code for code, name in enumerate(self._load_json("amino_acids"))}
+        self.gene_offsets = np.load(os.path.join(self.directory, "gene_offsets.npy"))
+        self.variant_keys = self._load("variant_keys")
+        self.variant_offsets = self._load("variant_offsets")
+        self.ddg = self._load("ddg")
+        self.pdb = self._load("pdb")
+        self.pdb_residual = self._load("pdb_residual")
+        self.mut_from = self._load("mut_from")
+        self.mut_to = self._load("mut_to")
+
+    def _load(self, name):
+        return np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
+
+    def _load_json(self, name):
+        with open(os.path.join(self.directory, f"{name}.json")) as f:
+            return json.load(f)
+
+    def _pdb_mask(self, gene, pdb_values, start, end):
+        """Rows of [start, end) from the requested structures, or None when that is all of them."""
+        if set(pdb_values) == self.gene_pdbs[gene]:
+            return None
+        # Only a subset of the gene's structures was asked for: look each row's pdb code up in a bitmask
+        allowed = np.zeros(len(self.pdb_codes), dtype=bool)
+        allowed[[self.pdb_codes[pdb] for pdb in pdb_values if pdb in self.pdb_codes]] = True
+        return allowed[self.pdb[start:end]]
+
+    def _ddg(self, gene, pdb_values, start, end):
+        ddg = self.ddg[start:end]
+        mask = self._pdb_mask(gene, pdb_values, start, end)
+        if mask is not None:
+            ddg = ddg[mask]
+        return ddg.astype(np.float64)
+
+    def _gene_range(self, gene):
+        gene_code = self.gene_codes.get(gene)
+        if gene_code is None:
+            return 0, 0
+        return self.gene_offsets[gene_code], self.gene_offsets[gene_code + 1]
+
+    def _variant_range(self, gene, residual, mut_from, mut_to):
+        gene_code = self.gene_codes.get(gene)
+        from_code = self.amino_acid_codes.get(mut_from)
+        to_code = self.amino_acid_codes.get(mut_to)
+        residual = int(residual)
+        if None in (gene_code, from_code, to_code) or not -RESIDUE_OFFSET <= residual < RESIDUE_OFFSET:
+            return 0, 0
+        key = variant_key(gene_code, residual, from_code, to_code)
+        i = np.searchsorted(self.variant_keys, key)
+        if i == len(self.variant_keys) or self.variant_keys[i] != key:
+            return 0, 0
+        return self.variant_offsets[i], self.variant_offsets[i + 1]
+
+    def variant_ddg(self, gene, pdb_values, residual, mut_from, mut_to):
+        start, end = self._variant_range(gene, residual, mut_from, mut_to)
+        if start == end:
+            return np.array([], dtype=np.float64)
+        return self._ddg(gene, pdb_values, start, end)
+
+    def gene_ddg(self, gene, pdb_values):
+        start, end = self._gene_range(gene)
+        if start == end:
+            return np.array([], dtype=np.float64)
+        return self._ddg(gene, pdb_values, start, end)
+
+    def iter_rows(self, gene, pdb_values, residual=None, mut_from=None, mut_to=None, chunk_size=EXPORT_CHUNK_ROWS):
+        if residual is None:
+            start, end = self._gene_range(gene)
+        else:
+            start, end = self._variant_range(gene, residual, mut_from, mut_to)
+        if start == end:
+            return
+        pdbs = np.array(list(self.pdb_codes), dtype=object)
+        amino_acids = np.array(list(self.amino_acid_codes), dtype=object)
+        for chunk_start in range(start, end, chunk_size):
+            chunk_end = min(chunk_start + chunk_size, end)
+            chunk = pd.DataFrame({
+                'pdb': pdbs[self.pdb[chunk_start:chunk_end]],
+                'pdb_residual': self.pdb_residual[chunk_start:chunk_end],
+                'mut_from': amino_acids[self.mut_from[chunk_start:chunk_end]],
+                'mut_to': amino_acids[self.mut_to[chunk_start:chunk_end]],
+                'ddg': self.ddg[chunk_start:chunk_end],
+            })
+            mask = self._pdb_mask(gene, pdb_values, chunk_start, chunk_end)
+            if mask is not None:
+                chunk = chunk[mask]
+            if len(chunk):
+                yield chunk
+
+    def batch_variant_ddg(self, variants, gene_pdbs):
+        """Vectorised variant lookup: one searchsorted over all keys.
+
+        The store already holds each gene's structures from gene_pdbs, so
+        `gene_pdbs` is not needed here.
+        """
+        gene_codes = variants['gene'].map(self.gene_codes)
+        from_codes = variants['mut_from'].map(self.amino_acid_codes)
+        to_codes = variants['mut_to'].map(self.amino_acid_codes)
+        known = (gene_codes.notna() & from_codes.notna() & to_codes.notna()).to_numpy()
+        known &= residue_in_range(variants['residue'].to_numpy(np.int64))
+        rows = variants.index.to_numpy(np.int64)[known]
+        keys = variant_key(
+            gene_codes[known].to_numpy(np.int64),
+            variants['residue'][known].to_numpy(np.int64),
+            from_codes[known].to_numpy(np.int64),
+            to_codes[known].to_numpy(np.int64),
+        )
+        i = np.searchsorted(self.variant_keys, keys)
+        found = i < len(self.variant_keys)
+        found[found] = self.variant_keys[i[found]] == keys[found]
+        rows, i = rows[found], i[found]
+
+        # Gather every matched variant's contiguous run of rows in one go
+        starts = self.variant_offsets[i]
+        lengths = self.variant_offsets[i + 1] - starts
+        before = np.cumsum(lengths) - lengths
+        positions = np.arange(lengths.sum()) + np.repeat(starts - before, lengths)
+        return np.repeat(rows, lengths), self.ddg[positions].astype(np.float64)
+
+    def disk_size(self):
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory))
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (SQLiteBackend, NormalizedSQLiteBackend, DuckDBBackend, ParquetBackend, MemmapBackend)
+}
+
+
+def get_backend(name=None):
+    name = name or DDG_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown DDG_BACKEND {name!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
@@ -0,0 +1,235 @@
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from stat import S_ISREG
+
+# In-process LRU bounds, and an optional directory shared by all gunicorn workers
+CACHE_MAXSIZE = int(os.environ.get("DDG_CACHE_MAXSIZE", 1024))
+CACHE_TTL = float(os.environ.get("DDG_CACHE_TTL", 3600))
+CACHE_DIR = os.environ.get("DDG_CACHE_DIR")
+CACHE_DISK_MAXSIZE = int(os.environ.get("DDG_CACHE_DISK_MAXSIZE", 100_000))
+# Disk entries are tied to the data version, so by default they only go when the data changes
+CACHE_DISK_TTL = float(os.environ["DDG_CACHE_DISK_TTL"]) if os.environ.get("DDG_CACHE_DISK_TTL") else None
+
+# Part of every cache version; bump when the shape of cached results changes
+CACHE_FORMAT_VERSION = 1
+
+# How often (seconds) to re-stat the watched data files
+VERSION_CHECK_INTERVAL = 1.0
+
+
+# Watched files up to this size are identified by their contents rather than their stat
+CONTENT_HASH_MAX_BYTES = int(os.environ.get("DDG_CACHE_CONTENT_HASH_MAX_BYTES", 256 * 1024 * 1024))
+
+# path -> (stat key, content digest), so a file is only read again when its stat changes
+_content_digests = {}
+
+
+def _content_digest(path, stat):
+    stat_key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    cached = _content_digests.get(path)
+    if cached is not None and cached[0] == stat_key:
+        return cached[1]
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    _content_digests[path] = (stat_key, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def fingerprint(paths):
+    """Version string for a few files, one stat each while they are unchanged.
+
+    A file with an ingest manifest next to it (`<file>.manifest.json`) is
+    identified by the chunk checksums in the manifest. Other files up to
+    CONTENT_HASH_MAX_BYTES, such as gene_pdbs and the precomputed stamp
+    (which holds a token per build), are identified by a hash of their
+    contents, read again only when their stat changes. Either way the same
+    data keeps its version, and its warmed disk cache, across copies and
+    deploys. Larger files without a manifest, and directories, fall back
+    to their inode, size and mtime, which a fresh copy changes; directories
+    are not walked, so build scripts touch a stamp file
+    (gene_stats.PRECOMPUTED_STAMP) that is watched instead.
+    """
+    digest = hashlib.sha1(f"format {CACHE_FORMAT_VERSION};".encode())
+    for path in paths:
+        try:
+            with open(f"{path}.manifest.json", 'rb') as f:
+                digest.update(f"{path}:".encode() + f.read())
+            continue
+        except FileNotFoundError:
+            pass
+        try:
+            stat = os.stat(path)
+            if S_ISREG(stat.st_mode) and stat.st_size <= CONTENT_HASH_MAX_BYTES:
+                digest.update(f"{path}:{_content_digest(path, stat)};".encode())
+                continue
+        except FileNotFoundError:
+            continue
+        digest.update(f"{path}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    """Size- and TTL-bounded LRU cache for query results and loaded data files.
+
+    Entries are namespaced and keyed on the call arguments. When `directory`
+    is set, results are also pickled there so other worker processes can
+    reuse them, and warm_cache.py can fill it before traffic arrives.
+    Everything cached is tied to a fingerprint of `watch_paths`, so
+    rebuilding the database invalidates old entries automatically.
+    """
+
+    def __init__(self, watch_paths=(), maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL,
+                 directory=CACHE_DIR, disk_maxsize=CACHE_DISK_MAXSIZE, disk_ttl=CACHE_DISK_TTL):
+        self.watch_paths = list(watch_paths)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.directory = directory
+        self.disk_maxsize = disk_maxsize
+        self.disk_ttl = disk_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = fingerprint(self.watch_paths)
+        self._version_checked = time.monotonic()
+        self._disk_writes = 0
+
+    @property
+    def version(self):
+        now = time.monotonic()
+        if now - self._version_checked > VERSION_CHECK_INTERVAL:
+            self._version_checked = now
+            version = fingerprint(self.watch_paths)
+            if version != self._version:
+                with self._lock:
+                    self._entries.clear()
+                    self._version = version
+        return self._version
+
+    def watch(self, path):
+        """Also drop every entry when `path` changes."""
+        with self._lock:
+            self.watch_paths.append(path)
+            self._entries.clear()
+            self._version = fingerprint(self.watch_paths)
+
+    def _disk_path(self, key):
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, self.version, name + ".pkl")
+
+    def get(self, key, shared=True):
+        """Return (found, value)."""
+        version = self.version
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+
+        if shared and self.directory:
+            path = self._disk_path(key)
+            try:
+                if self.disk_ttl is None or time.time() - os.path.getmtime(path) <= self.disk_ttl:
+                    with open(path, 'rb') as f:
+                        value = pickle.load(f)
+                    self._remember(key, value, now, version)
+                    with self._lock:
+                        self.hits += 1
+                    return True, value
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def _remember(self, key, value, now, version):
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = (now, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def set(self, key, value, shared=True):
+        version = self.version
+        self._remember(key, value, time.monotonic(), version)
+        if shared and self.directory:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so other workers never read a partial file
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            self._disk_writes += 1
+            if self._disk_writes % 1000 == 0:
+                self._prune_disk()
+
+    def _prune_disk(self):
+        """Drop stale versions and the oldest entries beyond disk_maxsize.
+
+        Other workers may be pruning at the same time, so missing files are ignored.
+        """
+        try:
+            for name in os.listdir(self.directory):
+                if name != self._version:
+                    shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+            current = os.path.join(self.directory, self._version)
+            entries = sorted(
+                (entry.stat().st_mtime, entry.path) for entry in os.scandir(current)
+            )
+        except OSError:
+            return
+        for _, path in entries[:max(0, len(entries) - self.disk_maxsize)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self, *namespaces):
+        """Drop every entry, or only those memoized under `namespaces`."""
+        with self._lock:
+            if not namespaces:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] in namespaces]:
+                del self._entries[key]
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+            'version': self._version,
+        }
+
+    def memoize(self, namespace, shared=True):
+        """Cache a function's results under `namespace` + its positional arguments."""
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args):
+                key = (namespace, *args)
+                found, value = self.get(key, shared)
+                if not found:
+                    value = function(*args)
+                    self.set(key, value, shared)
+                return value
+            return wrapper
+        return decorator
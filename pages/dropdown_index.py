@@ -0,0 +1,58 @@
+import os
+import pickle
+
+from pages import gene_stats
+
+# gene -> residue -> mut_from -> tuple of mut_to, written by build_dropdown_index.py
+DROPDOWN_INDEX_PATH = os.path.join(gene_stats.PRECOMPUTED_DIR, "dropdown_index.pkl")
+
+
+def build_gene_entry(rows, interned):
+    """Nest sorted (residue, mut_from, mut_to) rows for one gene.
+
+    Identical mut_to tuples are shared through `interned`, which keeps the
+    index small since most residues offer the same 19 substitutions.
+    """
+    entry = {}
+    for residue, mut_from, mut_to in rows:
+        entry.setdefault(int(residue), {}).setdefault(mut_from, []).append(mut_to)
+    for mutfroms in entry.values():
+        for mut_from, mut_tos in mutfroms.items():
+            mut_tos = tuple(mut_tos)
+            mutfroms[mut_from] = interned.setdefault(mut_tos, mut_tos)
+    return entry
+
+
+def save_index(index, path=DROPDOWN_INDEX_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, 'wb') as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(partial, path)
+
+
+@gene_stats.loaded.memoize("dropdown_index", shared=False)
+def load_index(path=DROPDOWN_INDEX_PATH):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found, run build_dropdown_index.py first")
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _options(values):
+    return [{'label': str(value), 'value': value} for value in values]
+
+
+@gene_stats.loaded.memoize("residue_options", shared=False)
+def residue_options(gene):
+    return _options(load_index().get(gene, {}))
+
+
+@gene_stats.loaded.memoize("mutfrom_options", shared=False)
+def mutfrom_options(gene, residue):
+    return _options(load_index().get(gene, {}).get(int(residue), {}))
+
+
+@gene_stats.loaded.memoize("mutto_options", shared=False)
+def mutto_options(gene, residue, mut_from):
+    return _options(load_index().get(gene, {}).get(int(residue), {}).get(mut_from, ()))
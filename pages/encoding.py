@@ -0,0 +1,51 @@
+"""
+Integer codes for the repeated names in ddg_info.
+
+Genes and structures are interned into small-integer dimension tables and
+amino acids into uint8 codes, so the normalized stores only hold numbers
+per row. A Codebook translates between names and codes in both
+directions, a whole array at a time; names it does not know encode to -1.
+"""
+import numpy as np
+import pandas as pd
+
+# Narrowest dtype for each kind of code
+CODE_DTYPES = {'gene': np.int16, 'pdb': np.int32, 'amino_acid': np.uint8}
+
+
+class Codebook:
+    """The names of one dimension, where a name's code is its position."""
+
+    def __init__(self, names, dtype=np.int32):
+        self.names = np.asarray(list(names), dtype=object)
+        self.index = pd.Index(self.names)
+        if not self.index.is_unique:
+            raise ValueError("Codebook names must be unique")
+        if len(self.names) > np.iinfo(dtype).max:
+            raise ValueError(f"{len(self.names)} names do not fit in {np.dtype(dtype).name} codes")
+        self.dtype = dtype
+
+    def __len__(self):
+        return len(self.names)
+
+    def encode(self, values):
+        """Codes for an array of names, -1 for unknown names (as int64, since -1 does not fit every dtype)."""
+        return self.index.get_indexer(np.asarray(values, dtype=object).ravel())
+
+    def code(self, value):
+        """Code of one name, or None if unknown."""
+        code = self.encode([value])[0]
+        return None if code < 0 else int(code)
+
+    def decode(self, codes):
+        """Names for an array of codes."""
+        return self.names[np.asarray(codes, dtype=np.int64)]
+
+
+def decode_rows(frame, pdbs, amino_acids):
+    """Replace the pdb, mut_from and mut_to codes of a ddg_info frame with their names."""
+    return frame.assign(
+        pdb=pdbs.decode(frame['pdb'].to_numpy()),
+        mut_from=amino_acids.decode(frame['mut_from'].to_numpy()),
+        mut_to=amino_acids.decode(frame['mut_to'].to_numpy()),
+    )
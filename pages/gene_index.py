@@ -0,0 +1,169 @@
+"""
+Global index of every gene's ΔΔG distribution, for comparing genes
+without touching ddg_info.
+
+build_gene_stats.py writes one file holding a fixed-range histogram row
+and a row of summary statistics per gene. Comparing any set of genes, up
+to the whole proteome, is then a handful of reductions over those rows,
+so fifty genes cost about the same as one. Values outside the histogram
+range are counted in the summary row, so pooled quartiles and percentiles
+rank them like every other value.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from pages import gene_stats, residue_profile
+
+GENE_INDEX_PATH = os.path.join(gene_stats.GENE_STATS_DIR, "gene_index.npz")
+
+# One row per gene; sum and sum_sq let pooled means and deviations be exact, and
+# below_range/above_range count the values outside gene_stats.HIST_RANGE
+SUMMARY_COLUMNS = (
+    ('count', 'sum', 'sum_sq', 'min', 'max', 'q1', 'median', 'q3', 'below_range', 'above_range')
+    + tuple(residue_profile.THRESHOLDS)
+)
+
+
+def summarise(sorted_ddg):
+    """Summary row for one gene's sorted ddg values, in SUMMARY_COLUMNS order."""
+    sorted_ddg = np.asarray(sorted_ddg, dtype=np.float64)
+    n = len(sorted_ddg)
+    if n == 0:
+        return np.array([0, 0, 0] + [np.nan] * (len(SUMMARY_COLUMNS) - 3))
+    q1, median, q3 = np.percentile(sorted_ddg, [25, 50, 75])
+    # np.histogram puts values equal to the last edge in the last bin
+    below_range = np.searchsorted(sorted_ddg, gene_stats.HIST_RANGE[0], side='left')
+    above_range = n - np.searchsorted(sorted_ddg, gene_stats.HIST_RANGE[1], side='right')
+    above = [
+        (n - np.searchsorted(sorted_ddg, threshold, side='right')) / n
+        for threshold in residue_profile.THRESHOLDS.values()
+    ]
+    return np.array([
+        n, sorted_ddg.sum(), np.square(sorted_ddg).sum(), sorted_ddg[0], sorted_ddg[-1], q1, median, q3,
+        below_range, above_range, *above,
+    ])
+
+
+def histogram_quantiles(counts, q, below_range=0, above_range=0):
+    """Quantiles (0-1) of binned values, interpolating linearly inside each bin.
+
+    `below_range` and `above_range` values lie outside the bins; a quantile
+    that falls among them is clamped to the nearest edge of the range.
+    """
+    cumulative = below_range + np.concatenate([[0], np.cumsum(counts, dtype=np.float64)])
+    total = cumulative[-1] + above_range
+    if total == 0:
+        return np.full(np.shape(q), np.nan)
+    return np.interp(np.asarray(q) * total, cumulative, gene_stats.BIN_EDGES)
+
+
+def histogram_percentile(counts, value, below_range=0, above_range=0):
+    """Percentage of binned values below `value`, interpolating linearly inside each bin.
+
+    Values outside the bins (`below_range`, `above_range`) count as below
+    and above every value inside the range.
+    """
+    cumulative = below_range + np.concatenate([[0], np.cumsum(counts, dtype=np.float64)])
+    total = cumulative[-1] + above_range
+    if total == 0:
+        return np.nan
+    return float(np.interp(value, gene_stats.BIN_EDGES, cumulative) / total * 100)
+
+
+class GeneIndex:
+    """Histogram and summary rows of every gene, loaded from GENE_INDEX_PATH."""
+
+    def __init__(self, genes, counts, summaries):
+        self.genes = list(genes)
+        self.rows = {gene: i for i, gene in enumerate(self.genes)}
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.summaries = np.asarray(summaries, dtype=np.float64)
+
+    def known(self, genes):
+        """The given genes that are in the index, in order; all genes when None."""
+        return list(self.genes) if genes is None else [gene for gene in genes if gene in self.rows]
+
+    def histogram(self, genes):
+        """Summed histogram counts of `genes`."""
+        return self.counts[[self.rows[gene] for gene in self.known(genes)]].sum(axis=0)
+
+    def out_of_range(self, genes):
+        """Numbers of values of `genes` below and above the histogram range."""
+        rows = self.summaries[[self.rows[gene] for gene in self.known(genes)]]
+        columns = [SUMMARY_COLUMNS.index('below_range'), SUMMARY_COLUMNS.index('above_range')]
+        below_range, above_range = rows[:, columns].sum(axis=0)
+        return below_range, above_range
+
+    def density(self, genes):
+        """Normalised histogram of `genes` pooled: each bin as a probability density per kcal/mol."""
+        counts = self.histogram(genes)
+        total = counts.sum()
+        return counts / (total * gene_stats.BIN_WIDTH) if total else counts.astype(np.float64)
+
+    def summary(self, genes):
+        """Summary statistics of `genes` pooled, as a dict.
+
+        Counts, means, deviations, extremes and threshold fractions are
+        exact; pooled quartiles come from the combined histogram, with the
+        values outside its range counted at either end.
+        """
+        genes = self.known(genes)
+        rows = self.summaries[[self.rows[gene] for gene in genes]]
+        columns = dict(zip(SUMMARY_COLUMNS, rows.T))
+        n = columns['count'].sum()
+        if n == 0:
+            return {'count': 0}
+        mean = columns['sum'].sum() / n
+        if len(genes) == 1:
+            q1, median, q3 = rows[0][[SUMMARY_COLUMNS.index(name) for name in ('q1', 'median', 'q3')]]
+        else:
+            q1, median, q3 = histogram_quantiles(self.histogram(genes), [0.25, 0.5, 0.75], *self.out_of_range(genes))
+        summary = {
+            'count': int(n),
+            'mean': mean,
+            'std': np.sqrt(max(columns['sum_sq'].sum() / n - mean ** 2, 0)),
+            'min': np.nanmin(columns['min']),
+            'q1': q1,
+            'median': median,
+            'q3': q3,
+            'max': np.nanmax(columns['max']),
+        }
+        for name in residue_profile.THRESHOLDS:
+            summary[name] = np.nansum(columns[name] * columns['count']) / n
+        return summary
+
+    def percentile(self, genes, value):
+        """Percentile of `value` within `genes` pooled, from the histogram."""
+        return histogram_percentile(self.histogram(genes), value, *self.out_of_range(genes))
+
+    def save(self, path=GENE_INDEX_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        gene_stats.save_arrays(path, genes=np.array(self.genes), counts=self.counts, summaries=self.summaries)
+
+
+def summary_table(index, genes, include_all=False, value=None):
+    """One row of statistics per gene, plus one for every gene pooled when `include_all`."""
+    groups = [(gene, [gene]) for gene in index.known(genes)]
+    if include_all:
+        groups.append(("All genes", None))
+    rows = []
+    for label, members in groups:
+        row = {'gene': label, **index.summary(members)}
+        if value is not None:
+            row['percentile'] = index.percentile(members, value)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+@gene_stats.loaded.memoize("gene_index", shared=False)
+def load_gene_index(path=GENE_INDEX_PATH):
+    """The GeneIndex, or None if build_gene_stats.py has not been run."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        # An index written before a summary column was added is rebuilt, not misread
+        if data['summaries'].shape[-1] != len(SUMMARY_COLUMNS):
+            return None
+        return GeneIndex(data['genes'].tolist(), data['counts'], data['summaries'])
@@ -0,0 +1,108 @@
+"""
+Parse gene_pdbs.gene_map into residue intervals and translate residue
+numbers between gene and structure numbering.
+
+A gene_map is one {gene_start-gene_end:[model:]CHAINpdb_start-pdb_end}
+segment per aligned stretch, e.g. {1-577:1:A1-577} for an AlphaFold model
+or {283-385:A9-111}{398-425:A124-151} for a structure covering two
+stretches of the gene with its own numbering.
+"""
+import numpy as np
+import pandas as pd
+
+SEGMENT_PATTERN = (
+    r'\{(?P<gene_start>-?\d+)-(?P<gene_end>-?\d+):(?:(?P<model>\d+):)?'
+    r'(?P<chain>[A-Za-z]+)(?P<pdb_start>-?\d+)-(?P<pdb_end>-?\d+)\}'
+)
+INTERVAL_COLUMNS = ['gene', 'pdb', 'chain', 'gene_start', 'gene_end', 'pdb_start']
+
+
+def parse_gene_maps(gene_pdbs):
+    """One row per aligned segment of every structure: gene, pdb, chain, gene_start, gene_end, pdb_start.
+
+    All maps are parsed in a single vectorised regex pass. Structures
+    without a gene_map contribute no rows.
+    """
+    segments = gene_pdbs['gene_map'].str.extractall(SEGMENT_PATTERN)
+    if segments.empty:
+        return pd.DataFrame({column: pd.Series(dtype=object if column in ('gene', 'pdb', 'chain') else np.int32)
+                             for column in INTERVAL_COLUMNS})
+    rows = segments.index.get_level_values(0)
+    intervals = pd.DataFrame({
+        'gene': gene_pdbs['name_of_gene'].to_numpy()[gene_pdbs.index.get_indexer(rows)],
+        'pdb': gene_pdbs['pdb'].to_numpy()[gene_pdbs.index.get_indexer(rows)],
+        'chain': segments['chain'].to_numpy(),
+        'gene_start': segments['gene_start'].to_numpy(np.int32),
+        'gene_end': segments['gene_end'].to_numpy(np.int32),
+        'pdb_start': segments['pdb_start'].to_numpy(np.int32),
+    })
+    return intervals
+
+
+class ResidueMapper:
+    """Vectorised translation between gene and structure residue numbering for one gene.
+
+    Intervals are sorted by (structure, start) and combined into one key
+    per structure and residue, so any mix of structures and residues is
+    mapped with a single searchsorted. Unmapped residues come back as NaN.
+    Where segments of one structure overlap (repeated domains in a
+    construct), the segment starting last wins.
+    """
+
+    # Spacing between structures in the combined keys; larger than any residue number
+    _STRIDE = 1 << 24
+
+    def __init__(self, intervals):
+        self.pdbs = pd.Index(sorted(intervals['pdb'].unique()))
+        codes = self.pdbs.get_indexer(intervals['pdb']).astype(np.int64)
+        gene_start = intervals['gene_start'].to_numpy(np.int64)
+        pdb_start = intervals['pdb_start'].to_numpy(np.int64)
+        length = intervals['gene_end'].to_numpy(np.int64) - gene_start
+        self._gene = self._direction(codes, gene_start, pdb_start, length)
+        self._pdb = self._direction(codes, pdb_start, gene_start, length)
+
+    def _direction(self, codes, start, target, length):
+        keys = codes * self._STRIDE + start
+        order = np.argsort(keys)
+        return keys[order], codes[order], start[order], target[order], length[order]
+
+    def _map(self, direction, pdbs, residues):
+        keys, codes, start, target, length = direction
+        pdb_codes = self.pdbs.get_indexer(np.asarray(pdbs, dtype=object).ravel())
+        residues = np.asarray(residues, dtype=np.float64).ravel()
+        pdb_codes = np.broadcast_to(pdb_codes, residues.shape) if pdb_codes.size == 1 else pdb_codes
+        mapped = np.full(residues.shape, np.nan)
+        valid = (pdb_codes >= 0) & ~np.isnan(residues)
+        if not len(keys) or not valid.any():
+            return mapped
+        query = pdb_codes[valid] * self._STRIDE + residues[valid].astype(np.int64)
+        i = np.searchsorted(keys, query, side='right') - 1
+        found = i >= 0
+        i = np.where(found, i, 0)
+        offset = residues[valid] - start[i]
+        found &= (codes[i] == pdb_codes[valid]) & (offset <= length[i])
+        mapped[np.flatnonzero(valid)[found]] = target[i[found]] + offset[found]
+        return mapped
+
+    def to_pdb(self, pdbs, residues):
+        """Structure residue numbers for gene residue numbers; `pdbs` is one pdb or one per residue."""
+        return self._map(self._gene, pdbs, residues)
+
+    def to_gene(self, pdbs, residues):
+        """Gene residue numbers for structure residue numbers; `pdbs` is one pdb or one per residue."""
+        return self._map(self._pdb, pdbs, residues)
+
+    def covered(self, pdbs=None):
+        """Sorted gene residues covered by any (or the given) structures."""
+        keys, codes, start, target, length = self._pdb
+        if pdbs is not None:
+            keep = np.isin(codes, self.pdbs.get_indexer(list(pdbs)))
+            target, length = target[keep], length[keep]
+        if not len(target):
+            return np.array([], dtype=np.int64)
+        return np.unique(np.concatenate([np.arange(t, t + n + 1) for t, n in zip(target, length)]))
+
+
+def mappers(intervals):
+    """A ResidueMapper per gene."""
+    return {gene: ResidueMapper(group) for gene, group in intervals.groupby('gene')}
@@ -0,0 +1,125 @@
+import os
+import time
+
+import numpy as np
+
+from pages import cache
+
+# Precomputed artefacts live next to keogh.db unless told otherwise
+PRECOMPUTED_DIR = os.environ.get("PRECOMPUTED_DIR", "precomputed")
+GENE_STATS_DIR = os.path.join(PRECOMPUTED_DIR, "gene_stats")
+
+# Rewritten by every build script when it finishes, so one stat tells whether any artefact changed
+PRECOMPUTED_STAMP = os.path.join(PRECOMPUTED_DIR, "VERSION")
+
+# Arrays and tables loaded from the precomputed artefacts, dropped together once those are rebuilt
+LOADED_MAXSIZE = int(os.environ.get("DDG_LOADED_MAXSIZE", 65536))
+loaded = cache.ResultCache(watch_paths=[PRECOMPUTED_STAMP], maxsize=LOADED_MAXSIZE, ttl=float('inf'), directory=None)
+
+
+def mark_updated(path=PRECOMPUTED_STAMP):
+    """Record that precomputed artefacts were rewritten, so running workers reload them.
+
+    The stamp is replaced rather than rewritten, so it gets a new inode even
+    when the filesystem's mtime resolution is too coarse to tell two builds apart.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_replace(path, lambda f: f.write(f"{time.time()}\n".encode()))
+
+# Fixed binning for the gene histogram, matching the plotted x range
+HIST_RANGE = (-10, 100)
+HIST_BINS = 1000
+BIN_EDGES = np.linspace(HIST_RANGE[0], HIST_RANGE[1], HIST_BINS + 1)
+BIN_CENTERS = (BIN_EDGES[:-1] + BIN_EDGES[1:]) / 2
+BIN_WIDTH = BIN_EDGES[1] - BIN_EDGES[0]
+
+
+def compute_gene_stats(ddg_values):
+    """Return the fixed-range histogram counts and the sorted ddg array."""
+    sorted_ddg = np.sort(np.asarray(ddg_values, dtype=np.float64))
+    counts, _ = np.histogram(sorted_ddg, bins=BIN_EDGES)
+    return counts, sorted_ddg
+
+
+def _write_replace(path, write):
+    # Rebuilt files get a new inode, so readers that memory-mapped the old one keep valid pages
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, 'wb') as f:
+        write(f)
+    os.replace(partial, path)
+
+
+def save_array(path, array):
+    """np.save `array` to `path` atomically."""
+    _write_replace(path, lambda f: np.save(f, array))
+
+
+def save_arrays(path, **arrays):
+    """np.savez `arrays` to `path` atomically."""
+    _write_replace(path, lambda f: np.savez(f, **arrays))
+
+
+def _stats_paths(gene, directory):
+    return (
+        os.path.join(directory, f"{gene}.hist.npy"),
+        os.path.join(directory, f"{gene}.ddg.npy"),
+    )
+
+
+def save_gene_stats(gene, counts, sorted_ddg, directory=GENE_STATS_DIR):
+    os.makedirs(directory, exist_ok=True)
+    hist_path, ddg_path = _stats_paths(gene, directory)
+    save_array(hist_path, np.asarray(counts, dtype=np.int64))
+    save_array(ddg_path, np.asarray(sorted_ddg, dtype=np.float64))
+
+
+@loaded.memoize("gene_stats", shared=False)
+def load_gene_stats(gene, directory=GENE_STATS_DIR):
+    """Load precomputed stats for a gene, or None if the build step has not been run.
+
+    The sorted array is memory-mapped so a percentile lookup only touches
+    the handful of pages visited by the binary search.
+    """
+    hist_path, ddg_path = _stats_paths(gene, directory)
+    if not (os.path.exists(hist_path) and os.path.exists(ddg_path)):
+        return None
+    return np.load(hist_path), np.load(ddg_path, mmap_mode="r")
+
+
+def percentile_below(sorted_ddg, value):
+    """Percentage of values strictly below `value`, as in np.sum(values < value) / len(values)."""
+    if len(sorted_ddg) == 0:
+        return 0
+    return np.searchsorted(sorted_ddg, value, side="left") / len(sorted_ddg) * 100
+
+
+# Per-structure histograms, summed to give the gene histogram for any subset of its structures
+PDB_HISTOGRAMS_PATH = os.path.join(GENE_STATS_DIR, "pdb_histograms.npz")
+
+
+def save_pdb_histograms(histograms, path=PDB_HISTOGRAMS_PATH):
+    """Write {pdb: counts} as one names array and one (structures x bins) int32 matrix."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    names = sorted(histograms)
+    counts = np.array([histograms[name] for name in names], dtype=np.int32).reshape(len(names), HIST_BINS)
+    save_arrays(path, names=np.array(names), counts=counts)
+
+
+@loaded.memoize("pdb_histograms", shared=False)
+def load_pdb_histograms(path=PDB_HISTOGRAMS_PATH):
+    """({pdb: row}, counts matrix), or None if the build step has not been run."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        names = data['names'].tolist()
+        return {name: i for i, name in enumerate(names)}, data['counts']
+
+
+def pdb_histogram(pdb_values, path=PDB_HISTOGRAMS_PATH):
+    """Histogram counts of the given structures combined, or None without precomputed histograms."""
+    histograms = load_pdb_histograms(path)
+    if histograms is None:
+        return None
+    index, counts = histograms
+    rows = [index[pdb] for pdb in pdb_values if pdb in index]
+    return counts[rows].sum(axis=0, dtype=np.int64)
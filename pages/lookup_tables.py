@@ -0,0 +1,52 @@
+"""
+Lazily loaded lookup tables.
+
+Nothing is read at import time. The first call parses gene_pdbs and
+writes a pickled snapshot next to the other precomputed artefacts, so
+later worker boots load the binary snapshot instead of parsing the CSV.
+The snapshot is ignored once gene_pdbs is newer than it.
+"""
+import os
+
+import pandas as pd
+
+from pages import gene_stats
+
+GENE_PDBS_PATH = "gene_pdbs"
+SNAPSHOT_DIR = os.path.join(gene_stats.PRECOMPUTED_DIR, "lookup")
+
+# The tables are reloaded along with the precomputed artefacts, and when gene_pdbs itself changes
+gene_stats.loaded.watch(GENE_PDBS_PATH)
+
+
+def snapshot_path(name, directory=SNAPSHOT_DIR):
+    return os.path.join(directory, f"{name}.pkl")
+
+
+def load_table(path, directory=SNAPSHOT_DIR):
+    """Read the CSV at `path` through its snapshot, refreshing the snapshot when stale."""
+    snapshot = snapshot_path(os.path.basename(path), directory)
+    if os.path.exists(snapshot) and os.path.getmtime(snapshot) >= os.path.getmtime(path):
+        return pd.read_pickle(snapshot)
+    table = pd.read_csv(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # Write then rename, so a concurrently booting worker never reads half a file
+        partial = f"{snapshot}.{os.getpid()}"
+        table.to_pickle(partial)
+        os.replace(partial, snapshot)
+    except OSError:
+        pass
+    return table
+
+
+@gene_stats.loaded.memoize("gene_pdbs", shared=False)
+def gene_pdbs():
+    """The gene -> structure table, loaded on first use."""
+    return load_table(GENE_PDBS_PATH)
+
+
+@gene_stats.loaded.memoize("gene_names", shared=False)
+def gene_names():
+    """Genes in gene_pdbs order, for the gene dropdowns."""
+    return tuple(gene_pdbs()['name_of_gene'].unique())
@@ -0,0 +1,178 @@
+"""
+Opt-in hot-path instrumentation for the dashboard (DDG_METRICS=1).
+
+Spans (query, conversion, figure build) are timed with `timer`, callback
+latency and response sizes are taken from the Flask request hooks, and
+everything is served at /metrics in Prometheus text format. Requests slower
+than DDG_SLOW_CALLBACK_MS are logged as one JSON line with their spans.
+
+Metrics are kept per process and every series is labelled with the
+worker's pid, so with several gunicorn workers the series each scrape
+returns never collide across workers and can be summed with
+`sum without (pid) (...)`.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+METRICS_ENABLED = os.environ.get("DDG_METRICS", "0") == "1"
+SLOW_CALLBACK_MS = float(os.environ.get("DDG_SLOW_CALLBACK_MS", 1000))
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7)
+
+logger = logging.getLogger("dashboard.metrics")
+
+
+def _labels(key, **extra):
+    # Read at render time, so workers forked after import report their own pid
+    pairs = [('pid', os.getpid())] + list(key) + list(extra.items())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (buckets, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, buckets):
+                    lines.append(f"{self.name}_bucket{_labels(key, le=bound)} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_labels(key, le='+Inf')} {count}")
+                lines.append(f"{self.name}_sum{_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_labels(key)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._series.items()):
+                lines.append(f"{self.name}{_labels(key)} {value}")
+        return lines
+
+
+callback_seconds = Histogram("dashboard_callback_seconds", "Dash callback latency", SECONDS_BUCKETS)
+response_bytes = Histogram("dashboard_response_bytes", "Serialised Dash callback payload size", BYTES_BUCKETS)
+span_seconds = Histogram("dashboard_span_seconds", "Time spent in instrumented query and figure steps", SECONDS_BUCKETS)
+rows_read = Counter("dashboard_rows_read_total", "Rows read from the ddg backend")
+_gauges = {}
+
+# Spans recorded while handling the current request
+_request = threading.local()
+
+
+def timer(span, name):
+    """Time a block as `span` (query, convert, figure, ...) for `name`; no-op unless enabled."""
+    if not METRICS_ENABLED:
+        return nullcontext()
+    return _timer(span, name)
+
+
+@contextmanager
+def _timer(span, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        span_seconds.observe(elapsed, span=span, name=name)
+        spans = getattr(_request, 'spans', None)
+        if spans is not None:
+            spans.append({'span': span, 'name': name, 'ms': round(elapsed * 1000, 3)})
+
+
+def count_rows(name, rows):
+    if METRICS_ENABLED:
+        rows_read.inc(rows, name=name)
+        spans = getattr(_request, 'spans', None)
+        if spans is not None:
+            spans.append({'rows': rows, 'name': name})
+
+
+def register_gauge(name, description, function):
+    """Expose the value returned by `function()` at scrape time."""
+    _gauges[name] = (description, function)
+
+
+def render():
+    lines = []
+    for metric in (callback_seconds, response_bytes, span_seconds, rows_read):
+        lines.extend(metric.render())
+    for name, (description, function) in _gauges.items():
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge", f"{name}{_labels(())} {function()}"]
+    return "\n".join(lines) + "\n"
+
+
+def init_app(server):
+    """Attach the timing hooks and the /metrics route to the Flask server."""
+    if not METRICS_ENABLED:
+        return
+    import flask
+
+    @server.before_request
+    def start_request():
+        _request.start = time.perf_counter()
+        _request.spans = []
+
+    @server.after_request
+    def finish_request(response):
+        start = getattr(_request, 'start', None)
+        if start is None or not flask.request.path.endswith("_dash-update-component"):
+            return response
+        elapsed = time.perf_counter() - start
+        body = flask.request.get_json(silent=True) or {}
+        callback = body.get('output', 'unknown')
+        size = response.calculate_content_length() or 0
+        callback_seconds.observe(elapsed, callback=callback)
+        response_bytes.observe(size, callback=callback)
+        if elapsed * 1000 > SLOW_CALLBACK_MS:
+            logger.warning(json.dumps({
+                'event': 'slow_callback',
+                'pid': os.getpid(),
+                'callback': callback,
+                'inputs': {item.get('id'): item.get('value') for item in body.get('inputs', []) if isinstance(item, dict)},
+                'ms': round(elapsed * 1000, 1),
+                'bytes': size,
+                'spans': _request.spans,
+            }))
+        _request.start = None
+        _request.spans = None
+        return response
+
+    @server.route("/metrics")
+    def metrics_endpoint():
+        return flask.Response(render(), mimetype="text/plain; version=0.0.4")
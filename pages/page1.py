@@ -1,279 +1,794 @@
 import dash_bootstrap_components as dbc
 from dash import html, dcc
-import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
 
-import sqlite3
-
-# Load static data files
-gene_pdbs = pd.read_csv("gene_pdbs")
-pdb_residual = pd.read_csv("pdb_residual")
-mutfrom_options = pd.read_csv("dropdown_pdb_mut_from.csv", dtype=str)
-mutto_options = pd.read_csv("dropdown_pdb_mut_from_to.csv", dtype=str)
-
-# Load ddg info stored in DB
-sqlite_con = sqlite3.connect('keogh.db', check_same_thread=False)
-
-# Layout
-layout = dbc.Container([
-    html.Br(),
-    html.H1('Folding Energies', className='text-center'),
-    html.Div(
-        'Use the dropdowns below to select the gene and describe a variant.',
-        className='text-center mb-4',
-    ),
-
-    # Dropdowns
-    dbc.Row([
-        dbc.Col([
-            html.Div("Gene: "),
-            dcc.Dropdown(
-                options=[{'label': gene, 'value': gene} for gene in gene_pdbs['name_of_gene'].unique()],
-                id="gene_selected",
-                searchable=True,
-                placeholder="Select a gene...",
-                clearable=True
-            ),
-        ], width=3, className='mb-4'),
-
-        dbc.Col([
-            html.Div("Residual: "),
-            dcc.Dropdown(
-                id="residual_selected",
-                searchable=True,
-                placeholder="Select a residual...",
-                clearable=True
-            ),
-        ], width=3, className='mb-4'),
-
-        dbc.Col([
-            html.Div("Mutation From: "),
-            dcc.Dropdown(
-                id="mutfrom_selected",
-                searchable=True,
-                placeholder="Select mutation from...",
-                clearable=True
-            ),
-        ], width=3, className='mb-4'),
-
-        dbc.Col([
-            html.Div("Mutation To: "),
-            dcc.Dropdown(
-                id="mutto_selected",
-                searchable=True,
-                placeholder="Select mutation to...",
-                clearable=True
-            ),
-        ], width=3, className='mb-4'),
-    ]),
-
-    # Graphs
-    dbc.Row([
-        dbc.Col([
-            dcc.Loading(
-                id="loading-gene-ddg",
-                type="default",
-                children=dcc.Graph(id="gene_ddg"),
-                delay_show=200,
-                delay_hide=100,
-                show_initially=False,
-            ),
-        ], width=6, className='mb-4'),
-
-        dbc.Col([
-            dcc.Loading(
-                id="loading-variant-ddg",
-                type="default",
-                children=dcc.Graph(id="variant_ddg"),
-                delay_show=200,
-                delay_hide=100,
-                show_initially=False,
-            ),
-        ], width=6, className='mb-4'),
-    ]),
-
-    # Text
-    dbc.Row([
-        dbc.Col([
-            dcc.Markdown(
-                id='gene_ddg_markdown',
-                style={
-                    'width': '100%',
-                    'white-space': 'pre-line',
-                    'padding': '10px',
-                    'box-sizing': 'border-box',
-                    },
+import importlib.util
+import json
+from functools import cached_property, lru_cache
+from typing import NamedTuple, Optional
+from urllib.parse import parse_qs, urlencode
+
+from pages import (
+    backends, cache, dropdown_index, gene_map, gene_stats, lookup_tables, metrics, residue_profile, sketches,
+    structure_filters,
+)
+
+# Load ddg info from the storage engine selected by DDG_BACKEND
+backend = backends.get_backend()
+
+# Query results shared across callbacks, dropped when the database, gene_pdbs or any precomputed artefact changes
+result_cache = cache.ResultCache(
+    watch_paths=[backend.path, lookup_tables.GENE_PDBS_PATH, gene_stats.PRECOMPUTED_STAMP],
+)
+
+# The Parquet download needs pyarrow; without it only the CSV.gz button is shown
+PARQUET_EXPORT = importlib.util.find_spec("pyarrow") is not None
+
+# Rolling windows offered for the positional profile, in residues
+PROFILE_WINDOWS = (1, 5, 11, 21, 51)
+
+# Titles of the placeholder histograms shown until a full variant is selected
+EMPTY_GENE_TITLE = 'Histogram of ΔΔG values for selected gene'
+EMPTY_VARIANT_TITLE = 'Histogram of ΔΔG values for selected variant'
+
+
+class Selection(NamedTuple):
+    """What page1 shows, as encoded in its URL, e.g. /page1?gene=TP53&res=175&from=ARG&to=HIS."""
+    gene: Optional[str] = None
+    residue: Optional[int] = None
+    mut_from: Optional[str] = None
+    mut_to: Optional[str] = None
+    structure_filter: structure_filters.StructureFilter = structure_filters.ALL
+
+
+def parse_selection(search):
+    """Read a Selection from a page1 query string.
+
+    Each step of the gene -> residue -> mut_from -> mut_to cascade is kept
+    only if it is one of the options offered by the step before, so a bad
+    or outdated link falls back to the longest valid prefix.
+    """
+    params = {name: values[0] for name, values in parse_qs((search or '').lstrip('?')).items()}
+    try:
+        structure_filter = structure_filters.from_values(
+            params.get('method'), params.get('min_coverage'), params.get('max_resolution'),
+        )
+    except ValueError:
+        structure_filter = structure_filters.ALL
+    gene = params.get('gene')
+    if gene not in lookup_tables.gene_names():
+        return Selection(structure_filter=structure_filter)
+    try:
+        residue = int(params.get('res'))
+    except (TypeError, ValueError):
+        return Selection(gene, structure_filter=structure_filter)
+    if residue not in {option['value'] for option in set_dropdown_options_page1_2a(gene)}:
+        return Selection(gene, structure_filter=structure_filter)
+    mut_from = params.get('from')
+    if mut_from not in {option['value'] for option in set_dropdown_options_page1_2b(gene, residue)}:
+        return Selection(gene, residue, structure_filter=structure_filter)
+    mut_to = params.get('to')
+    if mut_to not in {option['value'] for option in set_dropdown_options_page1_2c(gene, residue, mut_from)}:
+        return Selection(gene, residue, mut_from, structure_filter=structure_filter)
+    return Selection(gene, residue, mut_from, mut_to, structure_filter)
+
+
+def selection_search(gene_selected, residual_selected, mutfrom_selected, mutto_selected,
+                     structure_filter=structure_filters.ALL):
+    """The query string parse_selection reads back, or "" when nothing is selected."""
+    params = {}
+    for name, value in zip(('gene', 'res', 'from', 'to'),
+                           (gene_selected, residual_selected, mutfrom_selected, mutto_selected)):
+        if value is None:
+            break
+        params[name] = value
+    params.update(structure_filters.query_params(structure_filter))
+    return "?" + urlencode(params) if params else ""
+
+
+def get_layout(search=None):
+    """The page1 layout, with any selection in the query string already resolved.
+
+    Dropdown options, figures, text and download links for a linked
+    selection are all computed in this one server pass, instead of by the
+    chain of dropdown callbacks, so a deep link renders in one round trip.
+    """
+    selection = parse_selection(search)
+    if selection == Selection():
+        return default_layout()
+    return build_layout(selection)
+
+
+# Built on first request rather than at import
+@lru_cache(maxsize=1)
+def default_layout():
+    return build_layout(Selection())
+
+
+def build_layout(selection):
+    gene, residue, mut_from, mut_to, structure_filter = selection
+    variant_figure, markdown = variant_results(gene, residue, mut_from, mut_to, structure_filter)
+    csv_href = export_href(gene, residue, mut_from, mut_to, "csv.gz", structure_filter)
+    parquet_href = export_href(gene, residue, mut_from, mut_to, "parquet", structure_filter)
+    return dbc.Container([
+        html.Br(),
+        html.H1('Folding Energies', className='text-center'),
+        html.Div(
+            'Use the dropdowns below to select the gene and describe a variant.',
+            className='text-center mb-4',
+        ),
+
+        # Dropdowns
+        dbc.Row([
+            dbc.Col([
+                html.Div("Gene: "),
+                dcc.Dropdown(
+                    options=[{'label': gene, 'value': gene} for gene in lookup_tables.gene_names()],
+                    value=gene,
+                    id="gene_selected",
+                    searchable=True,
+                    placeholder="Select a gene...",
+                    clearable=True
+                ),
+            ], width=3, className='mb-4'),
+
+            dbc.Col([
+                html.Div("Residual: "),
+                dcc.Dropdown(
+                    options=set_dropdown_options_page1_2a(gene),
+                    value=residue,
+                    id="residual_selected",
+                    searchable=True,
+                    placeholder="Select a residual...",
+                    clearable=True
                 ),
-        ], width=12, className='mb-4'),
-    ]),
-], fluid=True)
+            ], width=3, className='mb-4'),
+
+            dbc.Col([
+                html.Div("Mutation From: "),
+                dcc.Dropdown(
+                    options=set_dropdown_options_page1_2b(gene, residue),
+                    value=mut_from,
+                    id="mutfrom_selected",
+                    searchable=True,
+                    placeholder="Select mutation from...",
+                    clearable=True
+                ),
+            ], width=3, className='mb-4'),
+
+            dbc.Col([
+                html.Div("Mutation To: "),
+                dcc.Dropdown(
+                    options=set_dropdown_options_page1_2c(gene, residue, mut_from),
+                    value=mut_to,
+                    id="mutto_selected",
+                    searchable=True,
+                    placeholder="Select mutation to...",
+                    clearable=True
+                ),
+            ], width=3, className='mb-4'),
+        ]),
+
+        # Which structures the gene-level and variant ΔΔG values are taken from
+        dbc.Row([
+            dbc.Col([
+                html.Div("Structures: "),
+                dcc.Dropdown(
+                    options=[
+                        {'label': label, 'value': method}
+                        for method, (label, _) in structure_filters.STRUCTURE_METHODS.items()
+                    ],
+                    value=structure_filter.method,
+                    id="structure_method",
+                    clearable=False
+                ),
+            ], width=3, className='mb-4'),
+
+            dbc.Col([
+                html.Div("Minimum coverage: "),
+                dcc.Slider(
+                    min=0,
+                    max=1,
+                    step=0.05,
+                    value=structure_filter.min_coverage,
+                    marks={value: f'{value:g}' for value in (0, 0.25, 0.5, 0.75, 1)},
+                    id="min_coverage",
+                ),
+            ], width=6, className='mb-4'),
+
+            dbc.Col([
+                html.Div("Maximum resolution (Å): "),
+                dcc.Input(
+                    type="number",
+                    min=0,
+                    step=0.1,
+                    placeholder="Any",
+                    debounce=True,
+                    value=structure_filter.max_resolution,
+                    id="max_resolution",
+                ),
+            ], width=3, className='mb-4'),
+        ]),
+
+        # Graphs
+        dbc.Row([
+            dbc.Col([
+                dcc.Loading(
+                    id="loading-gene-ddg",
+                    type="default",
+                    children=dcc.Graph(
+                        id="gene_ddg",
+                        figure=gene_result(gene, residue, mut_from, mut_to, structure_filter),
+                    ),
+                    delay_show=200,
+                    delay_hide=100,
+                    show_initially=False,
+                ),
+                # Selection handed to the background callback when the histogram needs a scan
+                dcc.Store(id="gene_ddg_job"),
+            ], width=6, className='mb-4'),
+
+            dbc.Col([
+                dcc.Loading(
+                    id="loading-variant-ddg",
+                    type="default",
+                    children=dcc.Graph(id="variant_ddg", figure=variant_figure),
+                    delay_show=200,
+                    delay_hide=100,
+                    show_initially=False,
+                ),
+            ], width=6, className='mb-4'),
+        ]),
+
+        # Positional profile along the gene
+        dbc.Row([
+            dbc.Col([
+                html.Div("Profile smoothing window (residues): "),
+                dcc.Slider(
+                    min=0,
+                    max=len(PROFILE_WINDOWS) - 1,
+                    step=None,
+                    value=0,
+                    marks={i: str(window) for i, window in enumerate(PROFILE_WINDOWS)},
+                    id="profile_window",
+                ),
+            ], width=6, className='mb-2'),
+        ]),
+        dbc.Row([
+            dbc.Col([
+                dcc.Loading(
+                    id="loading-residue-profile",
+                    type="default",
+                    children=dcc.Graph(id="residue_profile", figure=residue_profile_plot(gene, residue, 0)),
+                    delay_show=200,
+                    delay_hide=100,
+                    show_initially=False,
+                ),
+            ], width=12, className='mb-4'),
+        ]),
+
+        # Text
+        dbc.Row([
+            dbc.Col([
+                dcc.Markdown(
+                    markdown,
+                    id='gene_ddg_markdown',
+                    style={
+                        'width': '100%',
+                        'white-space': 'pre-line',
+                        'padding': '10px',
+                        'box-sizing': 'border-box',
+                        },
+                    ),
+            ], width=12, className='mb-4'),
+        ]),
+
+        # Downloads of the rows behind the plots, streamed from /api/export
+        dbc.Row([
+            dbc.Col([
+                dbc.Button(
+                    "Download ΔΔG rows (CSV.gz)",
+                    id="export_csv",
+                    href=csv_href,
+                    external_link=True,
+                    disabled=csv_href is None,
+                    color="secondary",
+                    className="me-2",
+                ),
+                dbc.Button(
+                    "Download ΔΔG rows (Parquet)",
+                    id="export_parquet",
+                    href=parquet_href,
+                    external_link=True,
+                    disabled=parquet_href is None,
+                    color="secondary",
+                    style=None if PARQUET_EXPORT else {'display': 'none'},
+                ),
+            ], width=12, className='mb-4'),
+        ]),
+    ], fluid=True)
+
+
+@result_cache.memoize("residue_options")
+def residue_options(gene_selected):
+    """The gene's residue dropdown options, shared through the disk cache so warm_cache.py can fill them."""
+    return dropdown_index.residue_options(gene_selected)
 
 
 def set_dropdown_options_page1_2a(gene_selected):
     if gene_selected:
-        pdb_residual_values = pdb_residual[gene_selected].dropna().astype(int).tolist()
-        return [{'label': str(residual), 'value': residual} for residual in pdb_residual_values]
+        return residue_options(gene_selected)
     return []
 
 
 def set_dropdown_options_page1_2b(gene_selected,residual_selected):
     if gene_selected and residual_selected:
-        column = f"{gene_selected}-{residual_selected}"
-        mutfrom_values = mutfrom_options[column].dropna().tolist()
-        return [{'label': str(mutfrom), 'value': mutfrom} for mutfrom in mutfrom_values]
+        return dropdown_index.mutfrom_options(gene_selected, residual_selected)
     return []
         
 
 def set_dropdown_options_page1_2c(gene_selected, residual_selected, mutfrom_selected):
     if gene_selected and residual_selected and mutfrom_selected:
-        column = f"{gene_selected}-{residual_selected}-{mutfrom_selected}"
-        mutto_values = mutto_options[column].dropna().tolist()
-        return [{'label': str(mutto), 'value': mutto} for mutto in mutto_values]
+        return dropdown_index.mutto_options(gene_selected, residual_selected, mutfrom_selected)
     return []
 
 
-def get_pdb_values(gene_pdbs, gene_selected):
+def get_pdb_values(gene_pdbs, gene_selected, structure_filter=structure_filters.ALL):
     filtered_gene_pdbs = gene_pdbs[gene_pdbs['name_of_gene'] == gene_selected]
+    if structure_filter != structure_filters.ALL:
+        filtered_gene_pdbs = filtered_gene_pdbs[structure_filters.structure_mask(filtered_gene_pdbs, structure_filter)]
     pdb_values = filtered_gene_pdbs['pdb'].unique().tolist()
     return pdb_values
 
-# Calculate median of the variant histogram
-def calculate_median(pdb_values, residual_selected, mutfrom_selected, mutto_selected):
-    if mutfrom_selected is None or mutto_selected is None:
-        return None
-    placeholders = ','.join('?' * len(pdb_values))
-    query = f"""
-        SELECT ddg
-        FROM ddg_info
-        WHERE pdb IN ({placeholders})
-        AND pdb_residual = ?
-        AND mut_from = ?
-        AND mut_to = ?
+
+@gene_stats.loaded.memoize("filtered_pdb_values", shared=False)
+def filtered_pdb_values(gene_selected, structure_filter=structure_filters.ALL):
+    """The gene's structures passing `structure_filter`, the ID set pushed into every ddg query."""
+    return tuple(get_pdb_values(lookup_tables.gene_pdbs(), gene_selected, structure_filter))
+
+
+@gene_stats.loaded.memoize("residue_mappers", shared=False)
+def residue_mappers():
+    """A gene_map.ResidueMapper per gene, parsed from gene_pdbs.gene_map on first use."""
+    return gene_map.mappers(gene_map.parse_gene_maps(lookup_tables.gene_pdbs()))
+
+
+def to_gene_residues(gene_selected, pdbs, residues):
+    """Gene numbering for structure residue numbers, NaN where a structure does not map them."""
+    mapper = residue_mappers().get(gene_selected)
+    if mapper is None:
+        return np.full(len(residues), np.nan)
+    return mapper.to_gene(pdbs, residues)
+
+
+@result_cache.memoize("variant_ddg")
+def fetch_variant_ddg(gene_selected, residual_selected, mutfrom_selected, mutto_selected,
+                      structure_filter=structure_filters.ALL):
+    pdb_values = filtered_pdb_values(gene_selected, structure_filter)
+    if not pdb_values:
+        return np.array([], dtype=np.float64)
+    with metrics.timer("query", "variant_ddg"):
+        values = backend.variant_ddg(gene_selected, pdb_values, residual_selected, mutfrom_selected, mutto_selected)
+    metrics.count_rows("variant_ddg", len(values))
+    return values
+
+
+# Precomputed stats are memory-mapped already, so keep these out of the shared disk cache
+@result_cache.memoize("gene_stats", shared=False)
+def fetch_gene_stats(gene_selected, structure_filter=structure_filters.ALL):
+    """Histogram counts and sorted ddg values for the gene's (selected) structures."""
+    if structure_filter == structure_filters.ALL:
+        precomputed = gene_stats.load_gene_stats(gene_selected)
+        if precomputed is not None:
+            return precomputed
+    # Fall back to scanning the structures of the gene
+    pdb_values = filtered_pdb_values(gene_selected, structure_filter)
+    if not pdb_values:
+        return gene_stats.compute_gene_stats([])
+    with metrics.timer("query", "gene_ddg"):
+        values = backend.gene_ddg(gene_selected, pdb_values)
+    metrics.count_rows("gene_ddg", len(values))
+    return gene_stats.compute_gene_stats(values)
+
+
+def gene_histogram_precomputed(gene_selected, structure_filter=structure_filters.ALL):
+    """Whether the gene histogram can be drawn from precomputed counts, without scanning the gene's rows."""
+    if structure_filter == structure_filters.ALL:
+        return gene_stats.load_gene_stats(gene_selected) is not None
+    return gene_stats.load_pdb_histograms() is not None
+
+
+def fetch_gene_histogram(gene_selected, structure_filter=structure_filters.ALL):
+    """Gene histogram counts, summed from per-structure histograms when filtered."""
+    if structure_filter != structure_filters.ALL:
+        counts = gene_stats.pdb_histogram(filtered_pdb_values(gene_selected, structure_filter))
+        if counts is not None:
+            return counts
+    counts, _ = fetch_gene_stats(gene_selected, structure_filter)
+    return counts
+
+
+def gene_percentile_precomputed(gene_selected, structure_filter=structure_filters.ALL):
+    """Whether gene_percentile can answer from precomputed stats or sketches, without scanning the gene's rows."""
+    if structure_filter == structure_filters.ALL:
+        return gene_stats.load_gene_stats(gene_selected) is not None
+    return sketches.load_sketches('pdb') is not None
+
+
+def gene_percentile(gene_selected, structure_filter, value):
+    """Percentile of `value` in the gene's (selected) structures.
+
+    Filtered views merge the per-structure sketches (within
+    100 * sketches.ERROR_BOUND points) rather than scanning the rows.
     """
-    cursor = sqlite_con.cursor()
-    cursor.execute(query, (*pdb_values, residual_selected, mutfrom_selected, mutto_selected))
-    results = cursor.fetchall()
-    if results:
-        ddg_values = [row[0] for row in results]
-        median_ddg = pd.Series(ddg_values).median()
-        return median_ddg
-    return None
+    if structure_filter != structure_filters.ALL:
+        table = sketches.load_sketches('pdb')
+        if table is not None:
+            return float(table.percentile(value, filtered_pdb_values(gene_selected, structure_filter)))
+    _, sorted_ddg = fetch_gene_stats(gene_selected, structure_filter)
+    return gene_stats.percentile_below(sorted_ddg, value)
+
+
+class VariantContext:
+    """The data behind one selected variant, fetched at most once per request.
 
-def ddg_for_gene_plot(gene_selected, pdb_values, median_ddg):
-    placeholders = ','.join('?' * len(pdb_values))
-    query = f"""
-        SELECT *
-        FROM ddg_info
-        WHERE pdb IN ({placeholders})
+    The variant's ddg values and the gene-level distribution are each loaded
+    on first use and then shared by the median, percentile and both figures.
     """
-    cursor = sqlite_con.cursor()
-    cursor.execute(query, pdb_values)
-    columns = [description[0] for description in cursor.description]
-    results = cursor.fetchall()
-    filtered_ddg_info = pd.DataFrame(results, columns=columns)
-
-    figure = px.histogram(
-        filtered_ddg_info,
-        x='ddg',
-        range_x=[-10, 100],
-        nbins=1000, 
-        title=f'Histogram of ΔΔG values for {gene_selected}', 
-        labels={'ddg': 'ΔΔG (kcal/mol)'},
-        template="plotly_white",
-    )
-    figure.update_yaxes(showticklabels=False, title="Frequency")
 
-    if median_ddg is not None:
-        figure.add_shape(
-            go.layout.Shape(
-                type="line",
-                x0=median_ddg,
-                x1=median_ddg,
-                y0=0,
-                y1=1,
-                xref="x",
-                yref="paper",
-                line=dict(
-                    color="Red",
-                    width=2
-                )
-            )
+    def __init__(self, gene_selected, residual_selected, mutfrom_selected, mutto_selected,
+                 structure_filter=structure_filters.ALL):
+        self.gene_selected = gene_selected
+        self.residual_selected = residual_selected
+        self.mutfrom_selected = mutfrom_selected
+        self.mutto_selected = mutto_selected
+        self.structure_filter = structure_filter
+
+    @cached_property
+    def variant_ddg(self):
+        if self.mutfrom_selected is None or self.mutto_selected is None:
+            return np.array([], dtype=np.float64)
+        return fetch_variant_ddg(
+            self.gene_selected,
+            self.residual_selected,
+            self.mutfrom_selected,
+            self.mutto_selected,
+            self.structure_filter,
         )
-        figure.add_annotation(
-            go.layout.Annotation(
-                x=median_ddg,
-                y=1,
-                xref="x", 
-                yref="paper",
-                text=f'Variant median: {median_ddg:.2f} kcal/mol',
-                showarrow=True,
-                arrowhead=2
+
+    @cached_property
+    def median(self):
+        if len(self.variant_ddg) == 0:
+            return None
+        return np.nanmedian(self.variant_ddg)
+
+    @cached_property
+    def percentile(self):
+        if self.median is None:
+            return 0
+        return gene_percentile(self.gene_selected, self.structure_filter, self.median)
+
+
+# Calculate median of the variant histogram
+def calculate_median(context):
+    return context.median
+
+
+@result_cache.memoize("gene_figure")
+def gene_figure_json(gene_selected, structure_filter=structure_filters.ALL):
+    """Serialised gene histogram, without the variant overlay.
+
+    Bins are counted server-side and empty bins are left out, so the
+    payload is a few KB however many structures the gene has.
+    """
+    counts = fetch_gene_histogram(gene_selected, structure_filter)
+    title = f'Histogram of ΔΔG values for {gene_selected}'
+    if structure_filter != structure_filters.ALL:
+        title += f' ({structure_filters.describe(structure_filter)})'
+    with metrics.timer("figure", "gene_ddg"):
+        filled = np.flatnonzero(counts)
+        figure = go.Figure(
+            go.Bar(
+                x=np.round(gene_stats.BIN_CENTERS[filled], 4),
+                y=counts[filled],
+                width=gene_stats.BIN_WIDTH,
+                marker_line_width=0,
             )
         )
+        figure.update_layout(
+            title=title,
+            template="plotly_white",
+            bargap=0,
+        )
+        figure.update_xaxes(range=list(gene_stats.HIST_RANGE), title="ΔΔG (kcal/mol)")
+        figure.update_yaxes(showticklabels=False, title="Frequency")
+        return json.loads(figure.to_json())
 
-    return figure
 
-def ddg_for_variant_plot(pdb_values, residual_selected, mutfrom_selected, mutto_selected):
-    placeholders = ','.join('?' * len(pdb_values))
-    query = f"""
-        SELECT *
-        FROM ddg_info
-        WHERE pdb IN ({placeholders})
-        AND pdb_residual = ?
-        AND mut_from = ?
-        AND mut_to = ?
+@lru_cache(maxsize=None)
+def empty_histogram(title):
+    """Serialised placeholder histogram, shown until a full variant is selected.
+
+    Built once per title and returned as JSON, so callbacks never rebuild it.
     """
-    cursor = sqlite_con.cursor()
-    cursor.execute(query, (*pdb_values, residual_selected, mutfrom_selected, mutto_selected))
-    columns = [description[0] for description in cursor.description]
-    results = cursor.fetchall()
-    filtered_ddg_info_var3 = pd.DataFrame(results, columns=columns)
-
-    # Create the histogram
-    figure = px.histogram(
-        filtered_ddg_info_var3, x='ddg',
-        range_x=[-10, 100],
-        nbins=20,
-        title='Histogram of ΔΔG values for selected variant',
-        labels={'ddg': 'ΔΔG (kcal/mol)'},
-        template="plotly_white",
-    )
+    figure = go.Figure()
+    figure.update_layout(title=title, template="plotly_white")
+    figure.update_xaxes(range=list(gene_stats.HIST_RANGE), showgrid=False, title="ΔΔG (kcal/mol)")
     figure.update_yaxes(showticklabels=False, title="Frequency")
+    return json.loads(figure.to_json())
+
+
+def ddg_for_gene_plot(context):
+    figure = gene_figure_json(context.gene_selected, context.structure_filter)
+
+    median_ddg = context.median
+    if median_ddg is not None:
+        # Overlay the variant median on a copy, leaving the cached figure untouched
+        median_ddg = float(median_ddg)
+        layout = dict(figure['layout'])
+        layout['shapes'] = [{
+            'type': "line",
+            'x0': median_ddg,
+            'x1': median_ddg,
+            'y0': 0,
+            'y1': 1,
+            'xref': "x",
+            'yref': "paper",
+            'line': {'color': "Red", 'width': 2},
+        }]
+        layout['annotations'] = [{
+            'x': median_ddg,
+            'y': 1,
+            'xref': "x",
+            'yref': "paper",
+            'text': f'Variant median: {median_ddg:.2f} kcal/mol',
+            'showarrow': True,
+            'arrowhead': 2,
+        }]
+        figure = {'data': figure['data'], 'layout': layout}
+
     return figure
 
+def variant_results(gene_selected, residual_selected, mutfrom_selected, mutto_selected,
+                    structure_filter=structure_filters.ALL, include_percentile=True):
+    """(variant histogram, markdown text) for a selection, as shown under the dropdowns.
+
+    With include_percentile=False the text leaves out the gene percentile,
+    so nothing reads the gene's distribution.
+    """
+    if None in {mutto_selected, gene_selected, residual_selected, mutfrom_selected}:
+        return empty_histogram(EMPTY_VARIANT_TITLE), ""
+
+    context = VariantContext(gene_selected, residual_selected, mutfrom_selected, mutto_selected, structure_filter)
+    median_ddg = calculate_median(context)
+    percentile = calculate_percentile(context) if include_percentile else None
+    return ddg_for_variant_plot(context), gene_ddg_markdown_text(median_ddg, percentile)
+
+
+def gene_result(gene_selected, residual_selected, mutfrom_selected, mutto_selected,
+                structure_filter=structure_filters.ALL):
+    """Gene histogram for a selection, with the variant median marked."""
+    if None in {mutto_selected, gene_selected, residual_selected, mutfrom_selected}:
+        return empty_histogram(EMPTY_GENE_TITLE)
+
+    context = VariantContext(gene_selected, residual_selected, mutfrom_selected, mutto_selected, structure_filter)
+    return ddg_for_gene_plot(context)
+
+
+def ddg_for_variant_plot(context):
+    variant_ddg = context.variant_ddg
+    # plotly.express is slow to import and only needed once a variant is chosen
+    import plotly.express as px
+
+    with metrics.timer("figure", "variant_ddg"):
+        # Create the histogram
+        figure = px.histogram(
+            x=variant_ddg,
+            range_x=[-10, 100],
+            nbins=20,
+            title='Histogram of ΔΔG values for selected variant',
+            labels={'x': 'ΔΔG (kcal/mol)'},
+            template="plotly_white",
+        )
+        figure.update_yaxes(showticklabels=False, title="Frequency")
+    return figure
+
+
+@result_cache.memoize("residue_profile", shared=False)
+def fetch_residue_profile(gene_selected):
+    precomputed = residue_profile.load_residue_profile(gene_selected)
+    if precomputed is not None:
+        return precomputed
+    # Fall back to aggregating the gene's rows, one chunk at a time, in gene numbering
+    residues, ddg = [], []
+    with metrics.timer("query", "residue_profile"):
+        for chunk in export_rows(gene_selected):
+            chunk = chunk.dropna(subset=['gene_residue'])
+            residues.append(chunk['gene_residue'].to_numpy(np.int32))
+            ddg.append(chunk['ddg'].to_numpy())
+    if not ddg:
+        return residue_profile.compute_residue_profile([], [])
+    return residue_profile.compute_residue_profile(np.concatenate(residues), np.concatenate(ddg))
+
+
+@result_cache.memoize("residue_profile_figure")
+def residue_profile_figure_json(gene_selected, window):
+    """Serialised per-residue median ΔΔG with its IQR band and the fractions above the cut-offs."""
+    profile = fetch_residue_profile(gene_selected)
+    with metrics.timer("figure", "residue_profile"):
+        residues = np.asarray(profile['residues'])
+        smoothed = {name: residue_profile.smooth(profile, name, window) for name in residue_profile.PROFILES[:-1]}
+        figure = go.Figure([
+            go.Scatter(x=residues, y=smoothed['q3'], mode='lines', line={'width': 0}, hoverinfo='skip',
+                       showlegend=False),
+            go.Scatter(x=residues, y=smoothed['q1'], mode='lines', line={'width': 0}, fill='tonexty',
+                       fillcolor='rgba(31, 119, 180, 0.2)', name='Interquartile range', hoverinfo='skip'),
+            go.Scatter(x=residues, y=smoothed['median'], mode='lines', line={'color': 'rgb(31, 119, 180)'},
+                       name='Median ΔΔG'),
+            go.Scatter(x=residues, y=smoothed['above_0_5'], mode='lines', yaxis='y2',
+                       line={'color': 'orange', 'dash': 'dot'}, name='Fraction > 0.5 kcal/mol'),
+            go.Scatter(x=residues, y=smoothed['above_2_5'], mode='lines', yaxis='y2',
+                       line={'color': 'red', 'dash': 'dot'}, name='Fraction > 2.5 kcal/mol'),
+        ])
+        title = f'ΔΔG along {gene_selected}'
+        if window > 1:
+            title += f' ({window}-residue rolling mean)'
+        figure.update_layout(
+            title=title,
+            template="plotly_white",
+            hovermode='x unified',
+            yaxis={'title': 'ΔΔG (kcal/mol)'},
+            yaxis2={'title': 'Fraction of substitutions', 'overlaying': 'y', 'side': 'right', 'range': [0, 1],
+                    'showgrid': False},
+            legend={'orientation': 'h', 'y': -0.2},
+        )
+        figure.update_xaxes(title="Residue (gene numbering)")
+        return json.loads(figure.to_json())
+
+
+def selected_gene_residues(gene_selected, residual_selected):
+    """Gene numbering of the selected structure residue, across the gene's structures that map it."""
+    pdb_values = filtered_pdb_values(gene_selected)
+    residues = np.full(len(pdb_values), residual_selected)
+    mapped = to_gene_residues(gene_selected, np.array(pdb_values, dtype=object), residues)
+    return np.unique(mapped[~np.isnan(mapped)]).astype(int).tolist()
+
+
+def residue_profile_plot(gene_selected, residual_selected, window_index):
+    if not gene_selected:
+        figure = go.Figure()
+        figure.update_layout(title='ΔΔG along the selected gene', template="plotly_white")
+        return figure
+    window = PROFILE_WINDOWS[window_index or 0]
+    figure = residue_profile_figure_json(gene_selected, window)
+    if residual_selected is None:
+        return figure
+
+    # Highlight the selected residue on a copy, leaving the cached figure untouched
+    layout = dict(figure['layout'])
+    layout['shapes'] = [{
+        'type': "line",
+        'x0': residue,
+        'x1': residue,
+        'y0': 0,
+        'y1': 1,
+        'xref': "x",
+        'yref': "paper",
+        'line': {'color': "Red", 'width': 2},
+    } for residue in selected_gene_residues(gene_selected, residual_selected)]
+    return {'data': figure['data'], 'layout': layout}
+
 
 ##Callback for markdown text
-def calculate_percentile(pdb_values, residual_selected, mutfrom_selected, mutto_selected):
-    placeholders = ','.join('?' * len(pdb_values))
-    query_all = f"""
-        SELECT ddg
-        FROM ddg_info
-        WHERE pdb IN ({placeholders})
+def calculate_percentile(context):
+    return context.percentile
+
+
+def calculate_gene_set_percentile(median_ddg, genes=None, exact=False):
+    """Percentile of `median_ddg` in the combined ΔΔG values of `genes` (all genes when None).
+
+    Returns (percentile, exact). Merged gene sketches answer to within
+    100 * sketches.ERROR_BOUND percentile points; with `exact`, or before
+    build_sketches.py has been run, the genes' sorted values are counted.
+    The percentile is None when the genes have no ΔΔG values at all.
+    """
+    known = set(lookup_tables.gene_names())
+    genes = sorted(known) if genes is None else [gene for gene in genes if gene in known]
+    table = None if exact else sketches.load_sketches('gene')
+    if table is not None:
+        if not table.count(genes):
+            return None, False
+        return float(table.percentile(median_ddg, genes)), False
+    below = total = 0
+    for gene in genes:
+        _, sorted_ddg = fetch_gene_stats(gene)
+        below += np.searchsorted(sorted_ddg, median_ddg, side="left")
+        total += len(sorted_ddg)
+    return (below / total * 100 if total else None), True
+
+
+BATCH_COLUMNS = ['gene', 'residue', 'mut_from', 'mut_to']
+
+
+def calculate_batch(variants):
+    """Median ΔΔG and gene percentile for many variants at once.
+
+    `variants` is a list of (gene, residue, mut_from, mut_to) tuples or a
+    DataFrame with those columns. Every variant is resolved in one backend
+    join, and percentiles are taken per gene against the precomputed
+    distributions. Returns one row per variant, in order; median_ddg and
+    percentile are NaN where the variant has no ΔΔG values.
     """
-    # Execute the query and fetch the results
-    cursor = sqlite_con.cursor()
-    cursor.execute(query_all, pdb_values)
-    all_results = cursor.fetchall()
-    values = np.array([row[0] for row in all_results])
-
-    query_variant = f"""
-        SELECT ddg
-        FROM ddg_info
-        WHERE pdb IN ({placeholders})
-        AND pdb_residual = ?
-        AND mut_from = ?
-        AND mut_to = ?
+    if isinstance(variants, pd.DataFrame):
+        variants = variants[BATCH_COLUMNS].reset_index(drop=True)
+    else:
+        variants = pd.DataFrame(list(variants), columns=BATCH_COLUMNS)
+    # Residues that are not integers, or beyond what a variant key holds, can't match any row
+    residue = pd.to_numeric(variants['residue'], errors='coerce')
+    in_range = residue.mod(1).eq(0) & residue.ge(-backends.RESIDUE_OFFSET) & residue.lt(backends.RESIDUE_OFFSET)
+    variants['residue'] = residue.where(in_range).astype('Int64')
+    # Look each distinct variant up once
+    lookup = variants[variants['residue'].notna()].drop_duplicates().astype({'residue': np.int64})
+
+    structures = lookup_tables.gene_pdbs()[['name_of_gene', 'pdb']].drop_duplicates()
+    structures = structures.rename(columns={'name_of_gene': 'gene'})
+    with metrics.timer("query", "batch_variant_ddg"):
+        rows, ddg = backend.batch_variant_ddg(lookup, structures)
+    metrics.count_rows("batch_variant_ddg", len(ddg))
+
+    # Sort by variant then value, so each median is read straight off its group
+    keep = ~np.isnan(ddg)
+    rows, ddg = rows[keep], ddg[keep]
+    order = np.lexsort((ddg, rows))
+    rows, ddg = rows[order], ddg[order]
+    groups, starts, counts = np.unique(rows, return_index=True, return_counts=True)
+    found = lookup.loc[groups].assign(
+        structures=counts,
+        median_ddg=(ddg[starts + (counts - 1) // 2] + ddg[starts + counts // 2]) / 2,
+        percentile=np.nan,
+    )
+    for gene, group in found.groupby('gene'):
+        _, sorted_ddg = fetch_gene_stats(gene)
+        found.loc[group.index, 'percentile'] = gene_stats.percentile_below(sorted_ddg, group['median_ddg'].to_numpy())
+
+    result = variants.merge(found.astype({'residue': 'Int64'}), on=BATCH_COLUMNS, how='left')
+    result['structures'] = result['structures'].fillna(0).astype(np.int64)
+    return result
+
+EXPORT_COLUMNS = backends.EXPORT_COLUMNS + ['gene_residue']
+
+
+def export_rows(gene_selected, residual_selected=None, mutfrom_selected=None, mutto_selected=None,
+                structure_filter=structure_filters.ALL):
+    """Chunks of the ddg_info rows behind the variant plot, or the gene plot without a full variant.
+
+    Each row also gets its residue in gene numbering, mapped through gene_map.
     """
-    cursor.execute(query_variant, (*pdb_values, residual_selected, mutfrom_selected, mutto_selected))
-    variant_results = cursor.fetchall()
-    if variant_results:
-        ddg_values = [row[0] for row in variant_results]
-        median_ddg = pd.Series(ddg_values).median()
-        percentile = np.sum(values < median_ddg) / len(values) * 100
-        return percentile
-    return 0
+    pdb_values = filtered_pdb_values(gene_selected, structure_filter)
+    if not pdb_values:
+        return
+    if None in (residual_selected, mutfrom_selected, mutto_selected):
+        residual_selected = mutfrom_selected = mutto_selected = None
+    for chunk in backend.iter_rows(gene_selected, pdb_values, residual_selected, mutfrom_selected, mutto_selected):
+        metrics.count_rows("export", len(chunk))
+        gene_residue = to_gene_residues(gene_selected, chunk['pdb'].to_numpy(), chunk['pdb_residual'].to_numpy())
+        yield chunk.assign(gene_residue=pd.array(gene_residue, dtype="Int32"))
+
+
+def export_href(gene_selected, residual_selected, mutfrom_selected, mutto_selected, output,
+                structure_filter=structure_filters.ALL):
+    """Download link for the current selection, or None until a gene is chosen."""
+    if not gene_selected:
+        return None
+    params = {'gene': gene_selected}
+    if None not in (residual_selected, mutfrom_selected, mutto_selected):
+        params.update(residue=residual_selected, mut_from=mutfrom_selected, mut_to=mutto_selected)
+    params.update(structure_filters.query_params(structure_filter))
+    params['format'] = output
+    return "/api/export?" + urlencode(params)
+
 
 def gene_ddg_markdown_text(median_ddg, percentile):
     
@@ -281,19 +796,21 @@ def gene_ddg_markdown_text(median_ddg, percentile):
     Hall = "[Hall, Shorthouse, Alcraft et al. 2023](https://www.nature.com/articles/s42003-023-05136-y)"
     
     if median_ddg is not None:
+        # Left out while the percentile is still being computed in the background
+        percentile_text = f' and in the {percentile:.0f}th percentile' if percentile is not None else ''
         if median_ddg > 2.5:
             return (f'A ΔΔG value greater than the {Serrano} value of +2.5 kcal/mol is commonly used as a cut-off for significantly destabilising mutations. '
                     f'Other studies, such as {Hall}, suggest a deleterious value of +0.5 kcal/mol is a threshold for destabilising mutations. '
-                    f'The median ΔΔG for the selected variant is {median_ddg:.2f} kcal/mol and in the {percentile:.0f}th percentile. '
+                    f'The median ΔΔG for the selected variant is {median_ddg:.2f} kcal/mol{percentile_text}. '
                     f'It is greater than the Serrano value of +2.5 kcal/mol and significantly destabilising.')
         elif median_ddg > 0.5:
             return (f'A ΔΔG value greater than the {Serrano} value of +2.5 kcal/mol is commonly used as a cut-off for significantly destabilising mutations. '
                     f'Other studies, such as {Hall}, suggest a deleterious value of +0.5 kcal/mol is a threshold for destabilising mutations. '
-                    f'The median ΔΔG for the selected variant is {median_ddg:.2f} kcal/mol and in the {percentile:.0f}th percentile. '
+                    f'The median ΔΔG for the selected variant is {median_ddg:.2f} kcal/mol{percentile_text}. '
                     f'It is greater than the deleterious value of +0.5 kcal/mol and destabilising.')
         else:
             return (f'A ΔΔG value greater than the {Serrano} value of +2.5 kcal/mol is commonly used as a cut-off for significantly destabilising mutations. '
                     f'Other studies, such as {Hall}, suggest a deleterious value of +0.5 kcal/mol is a threshold for destabilising mutations. '
-                    f'The median ΔΔG for the selected variant is {median_ddg:.2f} kcal/mol and in the {percentile:.0f}th percentile. '
+                    f'The median ΔΔG for the selected variant is {median_ddg:.2f} kcal/mol{percentile_text}. '
                     f'It is not destabilising.')
     return None
@@ -0,0 +1,133 @@
+import dash_bootstrap_components as dbc
+from dash import html, dcc
+import plotly.graph_objects as go
+import numpy as np
+
+import json
+from functools import lru_cache
+
+from pages import cache, gene_stats, lookup_tables, metrics, page1, residue_matrix
+
+# Longer proteins are merged into windows of consecutive residues for display
+MAX_HEATMAP_ROWS = 400
+
+# Colour range for the ΔΔG matrices, wide enough to show both the +0.5 and +2.5 kcal/mol cut-offs
+DDG_COLOR_RANGE = (-1, 5)
+
+METRIC_LABELS = {
+    'median': 'Median ΔΔG (kcal/mol)',
+    'mean': 'Mean ΔΔG (kcal/mol)',
+    'count': 'Number of values',
+}
+
+# Figures are dropped when the database, gene_pdbs or the precomputed artefacts change
+result_cache = cache.ResultCache(
+    watch_paths=[page1.backend.path, lookup_tables.GENE_PDBS_PATH, gene_stats.PRECOMPUTED_STAMP],
+)
+
+# Layout, built on first request rather than at import
+@lru_cache(maxsize=1)
+def get_layout():
+    return dbc.Container([
+        html.Br(),
+        html.H1('Residue ΔΔG Heatmap', className='text-center'),
+        html.Div(
+            'Select a gene to see the ΔΔG of every substitution at every residue.',
+            className='text-center mb-4',
+        ),
+
+        dbc.Row([
+            dbc.Col([
+                html.Div("Gene: "),
+                dcc.Dropdown(
+                    options=[{'label': gene, 'value': gene} for gene in lookup_tables.gene_names()],
+                    id="heatmap_gene_selected",
+                    searchable=True,
+                    placeholder="Select a gene...",
+                    clearable=True
+                ),
+            ], width=3, className='mb-4'),
+
+            dbc.Col([
+                html.Div("Show: "),
+                dbc.RadioItems(
+                    options=[{'label': label, 'value': metric} for metric, label in METRIC_LABELS.items()],
+                    value='median',
+                    id="heatmap_metric",
+                    inline=True,
+                ),
+            ], width=9, className='mb-4'),
+        ]),
+
+        dbc.Row([
+            dbc.Col([
+                dcc.Loading(
+                    id="loading-residue-heatmap",
+                    type="default",
+                    children=dcc.Graph(id="residue_heatmap"),
+                    delay_show=200,
+                    delay_hide=100,
+                    show_initially=False,
+                ),
+            ], width=12, className='mb-4'),
+        ]),
+    ], fluid=True)
+
+
+@result_cache.memoize("residue_matrix", shared=False)
+def fetch_residue_matrix(gene_selected):
+    precomputed = residue_matrix.load_residue_matrix(gene_selected)
+    if precomputed is not None:
+        return precomputed
+    # Fall back to aggregating the gene's rows, one chunk at a time, in gene numbering
+    residues, mut_to, ddg = [], [], []
+    with metrics.timer("query", "residue_matrix"):
+        for chunk in page1.export_rows(gene_selected):
+            chunk = chunk.dropna(subset=['gene_residue'])
+            residues.append(chunk['gene_residue'].to_numpy(np.int32))
+            mut_to.append(chunk['mut_to'].to_numpy())
+            ddg.append(chunk['ddg'].to_numpy())
+    if not ddg:
+        return residue_matrix.compute_residue_matrix([], [], [])
+    return residue_matrix.compute_residue_matrix(np.concatenate(residues), np.concatenate(mut_to), np.concatenate(ddg))
+
+
+@result_cache.memoize("residue_heatmap")
+def residue_heatmap_figure(gene_selected, metric):
+    """Serialised heatmap of one matrix, downsampled to MAX_HEATMAP_ROWS residues."""
+    matrix = fetch_residue_matrix(gene_selected)
+    with metrics.timer("figure", "residue_heatmap"):
+        first, last, values = residue_matrix.downsample(matrix, metric, MAX_HEATMAP_ROWS)
+        windows = [str(a) if a == b else f"{a}-{b}" for a, b in zip(first, last)]
+        color = {'colorscale': 'Viridis'} if metric == 'count' else {
+            'colorscale': 'RdBu_r',
+            'zmin': DDG_COLOR_RANGE[0],
+            'zmax': DDG_COLOR_RANGE[1],
+            'zmid': 0,
+        }
+        figure = go.Figure(
+            go.Heatmap(
+                z=values.T,
+                x=first,
+                y=residue_matrix.AMINO_ACIDS,
+                customdata=np.tile(windows, (len(residue_matrix.AMINO_ACIDS), 1)),
+                hovertemplate="Residue %{customdata}<br>To %{y}<br>%{z:.2f}<extra></extra>",
+                colorbar={'title': METRIC_LABELS[metric]},
+                **color,
+            )
+        )
+        title = f'{METRIC_LABELS[metric]} by residue and substitution for {gene_selected}'
+        if len(first) < len(matrix['residues']):
+            title += f" ({last[0] - first[0] + 1} residues per column)"
+        figure.update_layout(title=title, template="plotly_white", height=600)
+        figure.update_xaxes(title="Residue (gene numbering)")
+        figure.update_yaxes(title="Mutated to")
+        return json.loads(figure.to_json())
+
+
+def residue_heatmap_plot(gene_selected, metric):
+    if not gene_selected:
+        figure = go.Figure()
+        figure.update_layout(title='Residue ΔΔG heatmap for selected gene', template="plotly_white", height=600)
+        return figure
+    return residue_heatmap_figure(gene_selected, metric)
@@ -0,0 +1,155 @@
+import dash_bootstrap_components as dbc
+from dash import html, dcc
+import plotly.graph_objects as go
+import numpy as np
+
+from functools import lru_cache
+
+from pages import gene_index, gene_stats, lookup_tables, metrics
+
+# Shown in the stats table, with their headers and number formats
+TABLE_COLUMNS = {
+    'gene': ('Gene', '{}'),
+    'count': ('Values', '{:,}'),
+    'mean': ('Mean', '{:.2f}'),
+    'std': ('SD', '{:.2f}'),
+    'min': ('Min', '{:.2f}'),
+    'q1': ('Q1', '{:.2f}'),
+    'median': ('Median', '{:.2f}'),
+    'q3': ('Q3', '{:.2f}'),
+    'max': ('Max', '{:.2f}'),
+    'above_0_5': ('> 0.5 kcal/mol', '{:.1%}'),
+    'above_2_5': ('> 2.5 kcal/mol', '{:.1%}'),
+    'percentile': ('Percentile of ΔΔG', '{:.0f}'),
+}
+
+# The x axis spans this central share of the compared values
+DISPLAY_QUANTILES = (0.001, 0.999)
+
+
+# Layout, built on first request rather than at import
+@lru_cache(maxsize=1)
+def get_layout():
+    return dbc.Container([
+        html.Br(),
+        html.H1('Compare Genes', className='text-center'),
+        html.Div(
+            'Select genes to compare their ΔΔG distributions, optionally against every gene and a variant ΔΔG.',
+            className='text-center mb-4',
+        ),
+
+        dbc.Row([
+            dbc.Col([
+                html.Div("Genes: "),
+                dcc.Dropdown(
+                    options=[{'label': gene, 'value': gene} for gene in lookup_tables.gene_names()],
+                    id="compare_genes",
+                    multi=True,
+                    searchable=True,
+                    placeholder="Select genes...",
+                ),
+            ], width=6, className='mb-4'),
+
+            dbc.Col([
+                html.Div("Variant ΔΔG (kcal/mol): "),
+                dcc.Input(
+                    type="number",
+                    step=0.01,
+                    placeholder="None",
+                    debounce=True,
+                    id="compare_ddg",
+                ),
+            ], width=3, className='mb-4'),
+
+            dbc.Col([
+                html.Div("Reference: "),
+                dbc.Checklist(
+                    options=[{'label': 'All genes', 'value': 'all'}],
+                    value=[],
+                    id="compare_all",
+                    switch=True,
+                ),
+            ], width=3, className='mb-4'),
+        ]),
+
+        dbc.Row([
+            dbc.Col([
+                dcc.Loading(
+                    id="loading-compare-histogram",
+                    type="default",
+                    children=dcc.Graph(id="compare_histogram"),
+                    delay_show=200,
+                    delay_hide=100,
+                    show_initially=False,
+                ),
+            ], width=12, className='mb-4'),
+        ]),
+
+        dbc.Row([
+            dbc.Col([
+                html.Div(id="compare_table"),
+            ], width=12, className='mb-4'),
+        ]),
+    ], fluid=True)
+
+
+def comparison_figure(index, genes, include_all, value):
+    """Overlaid normalised histograms of each gene, and of every gene pooled when `include_all`."""
+    groups = [(gene, [gene]) for gene in index.known(genes)]
+    if include_all:
+        groups.append(("All genes", None))
+    combined = index.histogram(None if include_all else genes)
+    # Leave out the empty bins at either end, which no trace has values in
+    filled = np.flatnonzero(combined)
+    bins = slice(filled[0], filled[-1] + 1) if len(filled) else slice(0, 0)
+    with metrics.timer("figure", "compare_histogram"):
+        figure = go.Figure([
+            go.Scatter(
+                x=np.round(gene_stats.BIN_CENTERS[bins], 4),
+                y=index.density(members)[bins],
+                mode='lines',
+                line={'shape': 'hvh', 'width': 3 if members is None else 1.5},
+                name=label,
+            )
+            for label, members in groups
+        ])
+        x_range = gene_index.histogram_quantiles(combined, list(DISPLAY_QUANTILES))
+        figure.update_layout(
+            title='Normalised ΔΔG distributions',
+            template="plotly_white",
+            hovermode='x unified',
+        )
+        figure.update_xaxes(title="ΔΔG (kcal/mol)")
+        if len(filled):
+            figure.update_xaxes(range=list(x_range))
+        figure.update_yaxes(title="Density")
+        if value is not None:
+            figure.add_vline(x=value, line_color="Red", line_width=2,
+                             annotation_text=f'Variant ΔΔG: {value:.2f} kcal/mol')
+    return figure
+
+
+def comparison_table(index, genes, include_all, value):
+    table = gene_index.summary_table(index, genes, include_all, value)
+    columns = [column for column in TABLE_COLUMNS if column in table.columns]
+    header = html.Thead(html.Tr([html.Th(TABLE_COLUMNS[column][0]) for column in columns]))
+    body = html.Tbody([
+        html.Tr([
+            html.Td('' if row[column] != row[column] else TABLE_COLUMNS[column][1].format(row[column]))
+            for column in columns
+        ])
+        for _, row in table.iterrows()
+    ])
+    return dbc.Table([header, body], striped=True, bordered=True, hover=True, size="sm")
+
+
+def comparison(genes, include_all, value):
+    """(figure, stats table) for the selected genes, read from the global gene index."""
+    index = gene_index.load_gene_index()
+    if index is None:
+        return go.Figure(), "Run build_gene_stats.py to build the gene index."
+    if not genes and not include_all:
+        figure = go.Figure()
+        figure.update_layout(title='Normalised ΔΔG distributions of the selected genes', template="plotly_white")
+        return figure, ""
+    return comparison_figure(index, genes, include_all, value), comparison_table(index, genes, include_all, value)
@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+
+from pages import gene_stats
+
+# Per-gene residue x mut_to matrices, written by build_residue_matrix.py
+RESIDUE_MATRIX_DIR = os.path.join(gene_stats.PRECOMPUTED_DIR, "residue_matrix")
+
+# Columns of every matrix, in order
+AMINO_ACIDS = [
+    'ALA', 'ARG', 'ASN', 'ASP', 'CYS', 'GLN', 'GLU', 'GLY', 'HIS', 'ILE',
+    'LEU', 'LYS', 'MET', 'PHE', 'PRO', 'SER', 'THR', 'TRP', 'TYR', 'VAL',
+]
+AMINO_ACID_CODES = {name: code for code, name in enumerate(AMINO_ACIDS)}
+
+MATRICES = ('median', 'mean', 'count')
+
+
+def compute_residue_matrix(residues, mut_to, ddg):
+    """Aggregate one gene's rows into dense residue x mut_to matrices.
+
+    Returns {'residues': int32 row labels covering first..last residue,
+    'median'/'mean': float32 with NaN for empty cells, 'count': int32}.
+    """
+    residues = np.asarray(residues, dtype=np.int64)
+    columns = np.array([AMINO_ACID_CODES.get(name, -1) for name in mut_to], dtype=np.int64)
+    ddg = np.asarray(ddg, dtype=np.float64)
+    keep = (columns >= 0) & ~np.isnan(ddg)
+    residues, columns, ddg = residues[keep], columns[keep], ddg[keep]
+
+    first = residues.min() if len(residues) else 0
+    n_rows = residues.max() - first + 1 if len(residues) else 0
+    shape = (n_rows, len(AMINO_ACIDS))
+    cells = (residues - first) * len(AMINO_ACIDS) + columns
+
+    count = np.bincount(cells, minlength=n_rows * len(AMINO_ACIDS))
+    total = np.bincount(cells, weights=ddg, minlength=n_rows * len(AMINO_ACIDS))
+    filled = count > 0
+    mean = np.full(count.shape, np.nan)
+    mean[filled] = total[filled] / count[filled]
+
+    # Sort by cell then value, so each median is read straight off its run
+    order = np.lexsort((ddg, cells))
+    cells, ddg = cells[order], ddg[order]
+    groups, starts, sizes = np.unique(cells, return_index=True, return_counts=True)
+    median = np.full(count.shape, np.nan)
+    median[groups] = (ddg[starts + (sizes - 1) // 2] + ddg[starts + sizes // 2]) / 2
+
+    return {
+        'residues': np.arange(first, first + n_rows, dtype=np.int32),
+        'median': median.reshape(shape).astype(np.float32),
+        'mean': mean.reshape(shape).astype(np.float32),
+        'count': count.reshape(shape).astype(np.int32),
+    }
+
+
+def _matrix_path(gene, name, directory):
+    return os.path.join(directory, f"{gene}.{name}.npy")
+
+
+def save_residue_matrix(gene, matrix, directory=RESIDUE_MATRIX_DIR):
+    os.makedirs(directory, exist_ok=True)
+    for name in ('residues',) + MATRICES:
+        gene_stats.save_array(_matrix_path(gene, name, directory), matrix[name])
+
+
+@gene_stats.loaded.memoize("residue_matrix", shared=False)
+def load_residue_matrix(gene, directory=RESIDUE_MATRIX_DIR):
+    """Memory-mapped matrices for a gene, or None if the build step has not been run."""
+    paths = {name: _matrix_path(gene, name, directory) for name in ('residues',) + MATRICES}
+    if not all(os.path.exists(path) for path in paths.values()):
+        return None
+    return {name: np.load(path, mmap_mode="r") for name, path in paths.items()}
+
+
+def downsample(matrix, name, max_rows):
+    """Merge consecutive residues into at most `max_rows` windows for display.
+
+    Counts are summed; medians and means become count-weighted averages of
+    the cells in each window. Returns (first residue, last residue, values)
+    per window.
+    """
+    residues = np.asarray(matrix['residues'])
+    values = np.asarray(matrix[name], dtype=np.float64)
+    if len(residues) <= max_rows:
+        return residues, residues, values.astype(np.float32)
+
+    window = -(-len(residues) // max_rows)
+    starts = np.arange(0, len(residues), window)
+    ends = np.minimum(starts + window, len(residues)) - 1
+    count = np.asarray(matrix['count'], dtype=np.float64)
+    summed_count = np.add.reduceat(count, starts, axis=0)
+    if name == 'count':
+        merged = summed_count
+    else:
+        weighted = np.add.reduceat(np.where(count > 0, values * count, 0), starts, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            merged = np.where(summed_count > 0, weighted / summed_count, np.nan)
+    return residues[starts], residues[ends], merged.astype(np.float32)
@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+
+from pages import gene_stats
+
+# Per-gene positional profiles (gene numbering), written by build_residue_matrix.py
+RESIDUE_PROFILE_DIR = os.path.join(gene_stats.PRECOMPUTED_DIR, "residue_profile")
+
+# Destabilisation cut-offs (kcal/mol): Hall et al. 2023 and Serrano
+THRESHOLDS = {'above_0_5': 0.5, 'above_2_5': 2.5}
+
+PROFILES = ('median', 'q1', 'q3') + tuple(THRESHOLDS) + ('count',)
+
+
+def compute_residue_profile(residues, ddg):
+    """Summarise the ΔΔG of every substitution at each residue of one gene.
+
+    Returns {'residues': int32 covering first..last residue, 'median',
+    'q1', 'q3' and the fraction of values above each of THRESHOLDS as
+    float32 with NaN for residues without values, 'count': int32}.
+    """
+    residues = np.asarray(residues, dtype=np.int64)
+    ddg = np.asarray(ddg, dtype=np.float64)
+    keep = ~np.isnan(ddg)
+    residues, ddg = residues[keep], ddg[keep]
+
+    first = residues.min() if len(residues) else 0
+    n_rows = residues.max() - first + 1 if len(residues) else 0
+    rows = residues - first
+    count = np.bincount(rows, minlength=n_rows)
+    filled = count > 0
+    profile = {
+        'residues': np.arange(first, first + n_rows, dtype=np.int32),
+        'count': count.astype(np.int32),
+    }
+
+    # Sort by residue then value, so quantiles are read straight off each run
+    order = np.lexsort((ddg, rows))
+    rows, ddg = rows[order], ddg[order]
+    groups, starts, sizes = np.unique(rows, return_index=True, return_counts=True)
+    for name, q in (('q1', 0.25), ('median', 0.5), ('q3', 0.75)):
+        # Linear interpolation between closest ranks, as np.percentile does
+        position = starts + q * (sizes - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, starts + sizes - 1)
+        values = np.full(n_rows, np.nan)
+        values[groups] = ddg[lower] + (position - lower) * (ddg[upper] - ddg[lower])
+        profile[name] = values.astype(np.float32)
+    for name, threshold in THRESHOLDS.items():
+        above = np.bincount(rows, weights=ddg > threshold, minlength=n_rows)
+        values = np.full(n_rows, np.nan)
+        values[filled] = above[filled] / count[filled]
+        profile[name] = values.astype(np.float32)
+    return profile
+
+
+def _profile_path(gene, name, directory):
+    return os.path.join(directory, f"{gene}.{name}.npy")
+
+
+def save_residue_profile(gene, profile, directory=RESIDUE_PROFILE_DIR):
+    os.makedirs(directory, exist_ok=True)
+    for name in ('residues',) + PROFILES:
+        gene_stats.save_array(_profile_path(gene, name, directory), profile[name])
+
+
+@gene_stats.loaded.memoize("residue_profile", shared=False)
+def load_residue_profile(gene, directory=RESIDUE_PROFILE_DIR):
+    """Memory-mapped profile arrays for a gene, or None if the build step has not been run."""
+    paths = {name: _profile_path(gene, name, directory) for name in ('residues',) + PROFILES}
+    if not all(os.path.exists(path) for path in paths.values()):
+        return None
+    return {name: np.load(path, mmap_mode="r") for name, path in paths.items()}
+
+
+def smooth(profile, name, window):
+    """Centred rolling mean of one profile over `window` residues.
+
+    Residues are weighted by their number of values, so residues without
+    values are skipped and the fractions stay fractions of the pooled
+    values. Windows without any values are NaN.
+    """
+    values = np.asarray(profile[name], dtype=np.float64)
+    if window <= 1:
+        return values.astype(np.float32)
+    count = np.asarray(profile['count'], dtype=np.float64)
+    weighted = np.concatenate([[0], np.cumsum(np.where(count > 0, values * count, 0))])
+    counted = np.concatenate([[0], np.cumsum(count)])
+    index = np.arange(len(values))
+    lower = np.clip(index - window // 2, 0, len(values))
+    upper = np.clip(index + window - window // 2, 0, len(values))
+    total = counted[upper] - counted[lower]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        smoothed = np.where(total > 0, (weighted[upper] - weighted[lower]) / total, np.nan)
+    return smoothed.astype(np.float32)
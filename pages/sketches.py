@@ -0,0 +1,109 @@
+"""
+Mergeable quantile sketches for percentiles over arbitrary sets of genes
+or structures.
+
+A sketch of n values keeps SKETCH_SIZE + 1 of them, q_i = sorted[r_i] with
+r_i = floor(i * (n - 1) / SKETCH_SIZE), plus n. For any x the number of
+values below x lies between r_{k-1} + 1 and r_k, where q_{k-1} < x <= q_k,
+so interpolating in that interval misses the true count by at most
+(n - 1) / SKETCH_SIZE. Adding up the estimated counts of several sketches
+therefore gives the fraction of the combined values below x to within
+1 / SKETCH_SIZE, however many sketches are merged.
+
+build_sketches.py writes one sketch per structure and one per gene.
+"""
+import os
+
+import numpy as np
+
+from pages import gene_stats
+
+SKETCH_DIR = os.path.join(gene_stats.PRECOMPUTED_DIR, "sketches")
+
+# Quantiles per sketch; percentiles are within 100 / SKETCH_SIZE points of exact
+SKETCH_SIZE = 512
+ERROR_BOUND = 1 / SKETCH_SIZE
+
+
+def sketch(values, size=SKETCH_SIZE):
+    """Return (n, quantiles) for an array of ddg values."""
+    sorted_ddg = np.sort(np.asarray(values, dtype=np.float64))
+    sorted_ddg = sorted_ddg[~np.isnan(sorted_ddg)]
+    n = len(sorted_ddg)
+    if n == 0:
+        return 0, np.full(size + 1, np.nan)
+    return n, sorted_ddg[_ranks(n, size)]
+
+
+def _ranks(n, size):
+    return np.arange(size + 1) * (n - 1) // size
+
+
+def count_below(n, quantiles, x):
+    """Estimated number of the sketched values strictly below each x."""
+    x = np.asarray(x, dtype=np.float64)
+    if n == 0:
+        return np.zeros(x.shape)
+    ranks = _ranks(n, len(quantiles) - 1)
+    k = np.searchsorted(quantiles, x, side='left')
+    below = np.where(k == 0, 0.0, float(n))
+    inside = (k > 0) & (k < len(quantiles))
+    if inside.any():
+        lower, upper = k[inside] - 1, k[inside]
+        low_count = ranks[lower] + 1
+        high_count = ranks[upper]
+        # q_{k-1} < x <= q_k, so the two quantiles always differ
+        position = (x[inside] - quantiles[lower]) / (quantiles[upper] - quantiles[lower])
+        below[inside] = low_count + position * (high_count - low_count)
+    return below
+
+
+def merged_percentile(counts, quantiles, x):
+    """Percentage of the values of all sketches (one per row) below each x, within 100 * ERROR_BOUND."""
+    total = np.sum(counts)
+    if total == 0:
+        return np.zeros(np.shape(x))
+    below = sum(count_below(n, row, x) for n, row in zip(counts, quantiles) if n)
+    return below / total * 100
+
+
+class SketchTable:
+    """The sketches of one kind (pdb or gene), loaded from `{kind}_sketches.npz`."""
+
+    def __init__(self, names, counts, quantiles):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.quantiles = np.asarray(quantiles, dtype=np.float64)
+
+    def rows(self, names=None):
+        if names is None:
+            return np.arange(len(self.names))
+        return np.array([self.index[name] for name in names if name in self.index], dtype=np.int64)
+
+    def count(self, names=None):
+        """Number of values summarised by the sketches of `names` (all when None)."""
+        return int(self.counts[self.rows(names)].sum())
+
+    def percentile(self, x, names=None):
+        """Percentile of x within the union of `names` (all when None); unknown names are skipped."""
+        rows = self.rows(names)
+        return merged_percentile(self.counts[rows], self.quantiles[rows], x)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        gene_stats.save_arrays(path, names=np.array(self.names), counts=self.counts, quantiles=self.quantiles)
+
+
+def sketch_path(kind, directory=SKETCH_DIR):
+    return os.path.join(directory, f"{kind}_sketches.npz")
+
+
+@gene_stats.loaded.memoize("sketches", shared=False)
+def load_sketches(kind, directory=SKETCH_DIR):
+    """The 'pdb' or 'gene' SketchTable, or None if build_sketches.py has not been run."""
+    path = sketch_path(kind, directory)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return SketchTable(data['names'].tolist(), data['counts'], data['quantiles'])
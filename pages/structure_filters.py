@@ -0,0 +1,78 @@
+import math
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+# Which structures of a gene to include, by gene_pdbs.exp_method
+STRUCTURE_METHODS = {
+    'all': ('All structures', None),
+    'alphafold': ('AlphaFold only', {'AF'}),
+    'experimental': ('Experimental only', None),
+    'xray': ('X-ray only', {'X-RAY DIFFRACTION'}),
+    'em': ('Cryo-EM only', {'ELECTRON MICROSCOPY'}),
+    'nmr': ('NMR only', {'SOLUTION NMR', 'SOLID-STATE NMR', 'SOLUTION NMR; EPR'}),
+}
+
+
+class StructureFilter(NamedTuple):
+    """Hashable structure selection, so it can be part of cache keys.
+
+    max_resolution (Å) is read from gene_pdbs.exp_detail; structures
+    without a resolution (AlphaFold, NMR) are left out when it is set.
+    """
+    method: str = 'all'
+    min_coverage: float = 0.0
+    max_resolution: Optional[float] = None
+
+
+ALL = StructureFilter()
+
+
+def _finite(value, default):
+    # nan and inf parse as floats but are no threshold; treat them like an empty value
+    if not value:
+        return default
+    value = float(value)
+    return value if math.isfinite(value) else default
+
+
+def from_values(method=None, min_coverage=None, max_resolution=None):
+    """Build a filter from raw control/query values, ignoring empty and non-finite ones."""
+    method = method if method in STRUCTURE_METHODS else 'all'
+    return StructureFilter(method, _finite(min_coverage, 0.0), _finite(max_resolution, None))
+
+
+def structure_mask(gene_pdbs, structure_filter):
+    """Boolean mask over gene_pdbs rows selected by `structure_filter`."""
+    mask = np.ones(len(gene_pdbs), dtype=bool)
+    method = structure_filter.method
+    if method == 'experimental':
+        mask &= (gene_pdbs['exp_method'] != 'AF').to_numpy()
+    elif STRUCTURE_METHODS[method][1] is not None:
+        mask &= gene_pdbs['exp_method'].isin(STRUCTURE_METHODS[method][1]).to_numpy()
+    if structure_filter.min_coverage:
+        mask &= (gene_pdbs['coverage'] >= structure_filter.min_coverage).to_numpy()
+    if structure_filter.max_resolution is not None:
+        resolution = pd.to_numeric(gene_pdbs['exp_detail'], errors='coerce')
+        mask &= (resolution <= structure_filter.max_resolution).to_numpy()
+    return mask
+
+
+def describe(structure_filter):
+    """Short human-readable summary, e.g. for figure titles."""
+    parts = [STRUCTURE_METHODS[structure_filter.method][0]]
+    if structure_filter.min_coverage:
+        parts.append(f"coverage ≥ {structure_filter.min_coverage:g}")
+    if structure_filter.max_resolution is not None:
+        parts.append(f"resolution ≤ {structure_filter.max_resolution:g} Å")
+    return ", ".join(parts)
+
+
+def query_params(structure_filter):
+    """The non-default fields, as URL query parameters read back by from_values."""
+    return {
+        name: value
+        for name, value in structure_filter._asdict().items()
+        if value != ALL._asdict()[name]
+    }
@@ -0,0 +1,66 @@
+"""
+Shared fixtures: a small synthetic dataset (benchmark.build_dataset) with
+every precomputed artefact and store built by the repo's own scripts.
+
+The pages modules resolve keogh.db, gene_pdbs and precomputed/ relative
+to the working directory, so the whole session runs inside the dataset
+directory. page1 opens its backend when imported, so tests get it from
+the `page1` fixture rather than importing it themselves.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import benchmark  # noqa: E402
+
+BUILD_STEPS = [
+    'build_gene_stats.py', 'build_dropdown_index.py', 'build_sketches.py', 'build_residue_matrix.py',
+    'build_memmap.py', 'build_normalized_db.py',
+]
+
+
+def run_script(script, *args, cwd):
+    subprocess.run(
+        [sys.executable, os.path.join(REPO_DIR, script), *args],
+        cwd=cwd, env={**os.environ, 'PYTHONPATH': REPO_DIR}, check=True, stdout=subprocess.DEVNULL,
+    )
+
+
+@pytest.fixture(scope='session')
+def dataset(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('dataset'))
+    benchmark.build_dataset(directory, genes=3, pdbs_per_gene=3, residues=60, seed=0)
+    for step in BUILD_STEPS:
+        run_script(step, cwd=directory)
+    previous = os.getcwd()
+    os.chdir(directory)
+    yield directory
+    os.chdir(previous)
+
+
+@pytest.fixture(scope='session')
+def page1(dataset):
+    from pages import page1
+
+    return page1
+
+
+@pytest.fixture(scope='session')
+def duckdb_store(dataset):
+    """Build ddg_info/ddg_info.db with `ingest.py --target duckdb`, from CSV chunks of keogh.db."""
+    pytest.importorskip('duckdb')
+    chunks = benchmark.write_chunks(dataset, 2)
+    run_script('ingest.py', '--target', 'duckdb', '--workers', '2', *chunks, cwd=dataset)
+    return os.path.join(dataset, 'ddg_info', 'ddg_info.db')
+
+
+@pytest.fixture(scope='session')
+def parquet_store(dataset):
+    pytest.importorskip('pyarrow')
+    run_script('build_parquet.py', cwd=dataset)
+    return os.path.join(dataset, 'precomputed', 'parquet')
@@ -0,0 +1,112 @@
+import gzip
+import io
+
+import flask
+import pandas as pd
+import pytest
+
+from pages import backends
+
+
+@pytest.fixture
+def client(page1):
+    from pages import api
+
+    server = flask.Flask(__name__)
+    api.init_app(server)
+    return server.test_client()
+
+
+def test_percentile(client, page1):
+    gene = page1.lookup_tables.gene_names()[0]
+    for exact in ('0', '1'):
+        response = client.get(f"/api/percentile?ddg=1.0&genes={gene}&exact={exact}")
+        assert response.status_code == 200
+        assert 0 < response.get_json()['percentile'] < 100
+
+
+def test_percentile_unknown_gene(client, page1):
+    gene = page1.lookup_tables.gene_names()[0]
+    response = client.get(f"/api/percentile?ddg=1.0&genes={gene},NOGENE")
+    assert response.status_code == 404
+    assert 'NOGENE' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('ddg', ['nan', 'inf', '-inf', 'abc'])
+def test_percentile_needs_a_finite_ddg(client, ddg):
+    response = client.get(f"/api/percentile?ddg={ddg}")
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+@pytest.fixture
+def gene_rows(page1):
+    gene = page1.lookup_tables.gene_names()[0]
+    pdb_values = page1.filtered_pdb_values(gene, page1.structure_filters.ALL)
+    chunks = page1.backend.iter_rows(gene, pdb_values)
+    return gene, pd.concat(list(chunks), ignore_index=True)
+
+
+@pytest.fixture
+def small_chunks(page1, monkeypatch):
+    iter_rows = page1.backend.iter_rows
+    monkeypatch.setattr(page1.backend, 'iter_rows', lambda *args: iter_rows(*args, chunk_size=100))
+    return 100
+
+
+def sorted_rows(frame):
+    columns = backends.EXPORT_COLUMNS
+    return frame[columns].sort_values(columns[:4]).reset_index(drop=True)
+
+
+def test_export_csv_gzip(client, gene_rows, small_chunks):
+    gene, rows = gene_rows
+    response = client.get(f"/api/export?gene={gene}&format=csv.gz")
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == f'attachment; filename="{gene}_ddg.csv.gz"'
+    exported = pd.read_csv(io.BytesIO(gzip.decompress(response.get_data())))
+    assert list(exported.columns) == backends.EXPORT_COLUMNS + ['gene_residue']
+    pd.testing.assert_frame_equal(sorted_rows(exported), sorted_rows(rows), check_dtype=False)
+
+
+def test_export_parquet_streams_bounded_row_groups(client, gene_rows, small_chunks):
+    pq = pytest.importorskip('pyarrow.parquet')
+    gene, rows = gene_rows
+    response = client.get(f"/api/export?gene={gene}&format=parquet")
+    assert response.status_code == 200
+    parquet = pq.ParquetFile(io.BytesIO(response.get_data()))
+    # One row group per backend chunk, none larger than the chunk size
+    assert parquet.metadata.num_row_groups == -(-len(rows) // small_chunks)
+    assert max(parquet.metadata.row_group(i).num_rows for i in range(parquet.metadata.num_row_groups)) <= small_chunks
+    pd.testing.assert_frame_equal(sorted_rows(parquet.read().to_pandas()), sorted_rows(rows), check_dtype=False)
+
+
+def test_export_variant(client, gene_rows):
+    gene, rows = gene_rows
+    residue, mut_from, mut_to = rows.iloc[0][['pdb_residual', 'mut_from', 'mut_to']]
+    response = client.get(f"/api/export?gene={gene}&residue={residue}&mut_from={mut_from}&mut_to={mut_to}")
+    assert response.status_code == 200
+    exported = pd.read_csv(io.BytesIO(gzip.decompress(response.get_data())))
+    expected = rows[(rows['pdb_residual'] == residue) & (rows['mut_from'] == mut_from) & (rows['mut_to'] == mut_to)]
+    assert len(exported) == len(expected) > 0
+
+
+@pytest.mark.parametrize('query', [
+    "format=csv.gz",
+    "gene={gene}&residue=10",
+    "gene={gene}&residue=10&mut_from=A",
+    "gene={gene}&residue=ten&mut_from=A&mut_to=G",
+    "gene={gene}&format=xlsx",
+])
+def test_export_rejects_bad_requests(client, gene_rows, query):
+    gene, _ = gene_rows
+    response = client.get("/api/export?" + query.format(gene=gene))
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_export_filename_is_sanitised(client, gene_rows):
+    gene, _ = gene_rows
+    response = client.get(f"/api/export?gene={gene}&residue=1&mut_from=A&mut_to=%22%3B%0D%0Ax")
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == f'attachment; filename="{gene}_1_A_____x_ddg.csv.gz"'
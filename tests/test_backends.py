@@ -0,0 +1,114 @@
+import os
+import shutil
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages import backends, cache, lookup_tables
+
+BACKEND_NAMES = ['sqlite', 'normalized', 'memmap', 'parquet', 'duckdb']
+
+
+@pytest.fixture(params=BACKEND_NAMES)
+def backend(request, dataset):
+    if request.param == 'duckdb':
+        return backends.DuckDBBackend(request.getfixturevalue('duckdb_store'))
+    if request.param == 'parquet':
+        return backends.ParquetBackend(request.getfixturevalue('parquet_store'))
+    return backends.get_backend(request.param)
+
+
+@pytest.fixture
+def reference(dataset):
+    return backends.SQLiteBackend()
+
+
+@pytest.fixture
+def structures(dataset):
+    gene_pdbs = lookup_tables.gene_pdbs()
+    return {gene: group['pdb'].unique().tolist() for gene, group in gene_pdbs.groupby('name_of_gene')}
+
+
+@pytest.fixture
+def variants(reference, structures):
+    """A few real variants of every gene, plus ones that match nothing."""
+    rows = []
+    for gene, pdb_values in structures.items():
+        frame = pd.concat(reference.iter_rows(gene, pdb_values))
+        sample = frame.drop_duplicates(['pdb_residual', 'mut_from', 'mut_to']).iloc[::97]
+        rows += [(gene, int(r.pdb_residual), r.mut_from, r.mut_to) for r in sample.itertuples()]
+    gene = next(iter(structures))
+    rows += [(gene, 100_000, 'ALA', 'GLY'), (gene, 1, 'XXX', 'GLY'), ('NOGENE', 1, 'ALA', 'GLY')]
+    return pd.DataFrame(rows, columns=['gene', 'residue', 'mut_from', 'mut_to'])
+
+
+def sorted_rows(chunks):
+    frames = list(chunks)
+    if not frames:
+        return pd.DataFrame(columns=backends.EXPORT_COLUMNS)
+    frame = pd.concat(frames)[backends.EXPORT_COLUMNS].astype({'pdb_residual': np.int64, 'ddg': np.float64})
+    return frame.sort_values(backends.EXPORT_COLUMNS).reset_index(drop=True)
+
+
+def test_gene_ddg(backend, reference, structures):
+    for gene, pdb_values in structures.items():
+        expected = np.sort(reference.gene_ddg(gene, pdb_values))
+        np.testing.assert_allclose(np.sort(backend.gene_ddg(gene, pdb_values)), expected, rtol=1e-6)
+        # A subset of the gene's structures
+        expected = np.sort(reference.gene_ddg(gene, pdb_values[1:]))
+        np.testing.assert_allclose(np.sort(backend.gene_ddg(gene, pdb_values[1:])), expected, rtol=1e-6)
+
+
+def test_variant_ddg(backend, reference, structures, variants):
+    for gene, residue, mut_from, mut_to in variants.itertuples(index=False):
+        # page1 never queries without structures
+        if gene not in structures:
+            continue
+        pdb_values = structures[gene]
+        expected = np.sort(reference.variant_ddg(gene, pdb_values, residue, mut_from, mut_to))
+        actual = np.sort(backend.variant_ddg(gene, pdb_values, residue, mut_from, mut_to))
+        np.testing.assert_allclose(actual, expected, rtol=1e-6)
+
+
+def test_iter_rows(backend, reference, structures):
+    gene, pdb_values = next(iter(structures.items()))
+    expected = sorted_rows(reference.iter_rows(gene, pdb_values))
+    actual = sorted_rows(backend.iter_rows(gene, pdb_values, chunk_size=500))
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=1e-6)
+
+
+def test_batch_variant_ddg(backend, reference, variants):
+    gene_pdbs = lookup_tables.gene_pdbs()[['name_of_gene', 'pdb']].drop_duplicates()
+    gene_pdbs = gene_pdbs.rename(columns={'name_of_gene': 'gene'})
+
+    def by_row(rows, ddg):
+        return pd.DataFrame({'row': rows, 'ddg': ddg}).sort_values(['row', 'ddg']).reset_index(drop=True)
+
+    expected = by_row(*reference.batch_variant_ddg(variants, gene_pdbs))
+    assert len(expected)
+    pd.testing.assert_frame_equal(by_row(*backend.batch_variant_ddg(variants, gene_pdbs)), expected, rtol=1e-6)
+
+
+def test_normalized_codebooks_follow_a_rebuilt_store(dataset, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'VERSION_CHECK_INTERVAL', 0)
+    path = str(tmp_path / 'normalized.db')
+    shutil.copy(backends.NORMALIZED_SQLITE_PATH, path)
+    backend = backends.NormalizedSQLiteBackend(path)
+    names = backend.pdbs.names.tolist()
+
+    # Rebuild beside it with the structure codes renamed, and swap it in
+    rebuilt = str(tmp_path / 'rebuilt.db')
+    shutil.copy(path, rebuilt)
+    conn = sqlite3.connect(rebuilt)
+    conn.execute("UPDATE pdbs SET name = 'renamed_' || name")
+    conn.commit()
+    conn.close()
+    os.replace(rebuilt, path)
+
+    assert backend.pdbs.names.tolist() == [f"renamed_{name}" for name in names]
+    gene, pdb_values = next(iter(lookup_tables.gene_pdbs().groupby('name_of_gene')['pdb']))
+    pdb_values = [f"renamed_{pdb}" for pdb in pdb_values.unique()]
+    rows = pd.concat(backend.iter_rows(gene, pdb_values))
+    assert len(rows) and rows['pdb'].isin(pdb_values).all()
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def variants(page1):
+    """A spread of real variants from the dropdown index, in a deterministic order."""
+    rows = []
+    for gene in page1.lookup_tables.gene_names():
+        for option in page1.residue_options(gene)[::7]:
+            residue = option['value']
+            mut_from = page1.dropdown_index.mutfrom_options(gene, residue)[0]['value']
+            for mut_to in page1.dropdown_index.mutto_options(gene, residue, mut_from)[::6]:
+                rows.append((gene, residue, mut_from, mut_to['value']))
+    return rows
+
+
+def test_batch_matches_single_variant(page1, variants):
+    result = page1.calculate_batch(variants)
+    assert len(result) == len(variants)
+    assert result[['gene', 'residue', 'mut_from', 'mut_to']].astype(object).values.tolist() == [
+        list(variant) for variant in variants
+    ]
+    for variant, row in zip(variants, result.itertuples()):
+        context = page1.VariantContext(*variant)
+        assert row.structures == len(context.variant_ddg)
+        assert row.median_ddg == pytest.approx(context.median)
+        assert row.percentile == pytest.approx(context.percentile)
+
+
+def test_batch_keeps_duplicates_and_order(page1, variants):
+    sample = [variants[2], variants[0], variants[2]]
+    result = page1.calculate_batch(pd.DataFrame(sample, columns=page1.BATCH_COLUMNS))
+    assert result['median_ddg'].iloc[0] == result['median_ddg'].iloc[2]
+    assert result['median_ddg'].iloc[1] == pytest.approx(page1.VariantContext(*variants[0]).median)
+
+
+@pytest.mark.parametrize('residue', [27.5, 1e30, -1e30, float('inf'), 'abc', None, 2 ** 23, -2 ** 23 - 1])
+def test_batch_unmatched_residues(page1, variants, residue):
+    gene, _, mut_from, mut_to = variants[0]
+    result = page1.calculate_batch([variants[0], (gene, residue, mut_from, mut_to)])
+    assert result['structures'].tolist()[1] == 0
+    assert np.isnan(result['median_ddg'].iloc[1]) and np.isnan(result['percentile'].iloc[1])
+    assert result['median_ddg'].iloc[0] == pytest.approx(page1.VariantContext(*variants[0]).median)
+
+
+def test_batch_unknown_gene_and_substitution(page1, variants):
+    gene, residue, mut_from, _ = variants[0]
+    result = page1.calculate_batch([('NOGENE', residue, mut_from, 'GLY'), (gene, residue, mut_from, 'XXX')])
+    assert result['structures'].tolist() == [0, 0]
+    assert result['median_ddg'].isna().all()
@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pytest
+
+from pages import cache, gene_stats
+
+
+@pytest.fixture(autouse=True)
+def check_every_call(monkeypatch):
+    monkeypatch.setattr(cache, 'VERSION_CHECK_INTERVAL', 0)
+
+
+def test_result_cache_dropped_when_watched_file_changes(tmp_path):
+    watched = tmp_path / 'keogh.db'
+    watched.write_bytes(b'one')
+    result_cache = cache.ResultCache(watch_paths=[str(watched)], directory=None)
+    calls = []
+
+    @result_cache.memoize("double")
+    def double(x):
+        calls.append(x)
+        return 2 * x
+
+    assert double(2) == 4 and double(2) == 4
+    assert calls == [2]
+    watched.write_bytes(b'three')
+    assert double(2) == 4
+    assert calls == [2, 2]
+
+
+def test_manifest_identifies_the_data(tmp_path):
+    watched = tmp_path / 'keogh.db'
+    watched.write_bytes(b'rows')
+    manifest = tmp_path / 'keogh.db.manifest.json'
+    manifest.write_text('{"chunk1.csv": {"sha256": "a"}}')
+    version = cache.fingerprint([str(watched)])
+    # Same manifest, touched database: same version, so the disk cache survives a redeploy
+    watched.write_bytes(b'rows, copied')
+    assert cache.fingerprint([str(watched)]) == version
+    manifest.write_text('{"chunk1.csv": {"sha256": "b"}}')
+    assert cache.fingerprint([str(watched)]) != version
+
+
+def test_disk_cache_versioned(tmp_path):
+    watched = tmp_path / 'gene_pdbs'
+    watched.write_text('v1')
+    first = cache.ResultCache(watch_paths=[str(watched)], directory=str(tmp_path / 'cache'))
+    first.set(('key',), 'old')
+    second = cache.ResultCache(watch_paths=[str(watched)], directory=str(tmp_path / 'cache'))
+    assert second.get(('key',)) == (True, 'old')
+    watched.write_text('v2, rebuilt')
+    assert second.get(('key',)) == (False, None)
+
+
+def test_loaded_arrays_reload_after_rebuild(dataset, tmp_path):
+    directory = str(tmp_path / 'gene_stats')
+    gene_stats.save_gene_stats('GENE', *gene_stats.compute_gene_stats([1.0, 2.0, 3.0]), directory)
+    counts, sorted_ddg = gene_stats.load_gene_stats('GENE', directory)
+    np.testing.assert_array_equal(sorted_ddg, [1.0, 2.0, 3.0])
+    assert gene_stats.load_gene_stats('GENE', directory)[1] is sorted_ddg
+
+    gene_stats.save_gene_stats('GENE', *gene_stats.compute_gene_stats([5.0, 6.0]), directory)
+    # Still the old mapping, which stays readable until the build is marked done
+    np.testing.assert_array_equal(gene_stats.load_gene_stats('GENE', directory)[1], [1.0, 2.0, 3.0])
+    gene_stats.mark_updated()
+    np.testing.assert_array_equal(gene_stats.load_gene_stats('GENE', directory)[1], [5.0, 6.0])
+    np.testing.assert_array_equal(sorted_ddg, [1.0, 2.0, 3.0])
+
+
+def test_content_identifies_small_files(tmp_path):
+    watched = tmp_path / 'VERSION'
+    watched.write_text('build 1')
+    version = cache.fingerprint([str(watched)])
+    # The same contents copied into place (a new inode and mtime, as in a fresh container)
+    copy = tmp_path / 'VERSION.copy'
+    copy.write_text('build 1')
+    os.replace(copy, watched)
+    assert cache.fingerprint([str(watched)]) == version
+    watched.write_text('build 2')
+    assert cache.fingerprint([str(watched)]) != version
+
+
+def test_page_cache_dropped_when_data_changes(page1, dataset, monkeypatch):
+    # Files too large to hash, so keogh.db (without an ingest manifest here) is versioned by its mtime
+    monkeypatch.setattr(cache, 'CONTENT_HASH_MAX_BYTES', 0)
+    gene = page1.lookup_tables.gene_names()[0]
+    figure = page1.gene_figure_json(gene)
+    assert page1.gene_figure_json(gene) is figure
+    # A rebuilt database
+    stat = os.stat(page1.backend.path)
+    os.utime(page1.backend.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    rebuilt = page1.gene_figure_json(gene)
+    assert rebuilt is not figure and rebuilt == figure
+    # Rebuilt precomputed artefacts change the stamp every page cache watches
+    gene_stats.mark_updated()
+    assert page1.gene_figure_json(gene) is not rebuilt
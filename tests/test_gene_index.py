@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from pages import gene_index, gene_stats
+
+
+def make_index(values_by_gene):
+    genes, counts, summaries = [], [], []
+    for gene, values in values_by_gene.items():
+        gene_counts, sorted_ddg = gene_stats.compute_gene_stats(values)
+        genes.append(gene)
+        counts.append(gene_counts)
+        summaries.append(gene_index.summarise(sorted_ddg))
+    return gene_index.GeneIndex(genes, counts, summaries)
+
+
+@pytest.fixture
+def values_by_gene():
+    rng = np.random.default_rng(0)
+    # Half of A lies beyond the histogram range, B sits inside it
+    return {
+        'A': np.concatenate([rng.uniform(-30, -11, 500), rng.uniform(101, 200, 500), rng.uniform(0, 5, 1000)]),
+        'B': rng.uniform(0, 10, 2000),
+    }
+
+
+def test_pooled_quartiles_count_out_of_range_values(values_by_gene):
+    index = make_index(values_by_gene)
+    pooled = np.concatenate(list(values_by_gene.values()))
+    summary = index.summary(['A', 'B'])
+    assert summary['count'] == len(pooled)
+    for name, q in (('q1', 25), ('median', 50), ('q3', 75)):
+        assert summary[name] == pytest.approx(np.percentile(pooled, q), abs=2 * gene_stats.BIN_WIDTH)
+
+
+def test_pooled_percentile_counts_out_of_range_values(values_by_gene):
+    index = make_index(values_by_gene)
+    pooled = np.concatenate(list(values_by_gene.values()))
+    for value in (-5.0, 2.5, 7.5, 50.0):
+        expected = np.mean(pooled < value) * 100
+        assert index.percentile(['A', 'B'], value) == pytest.approx(expected, abs=0.5)
+        assert index.percentile(['A'], value) == pytest.approx(np.mean(values_by_gene['A'] < value) * 100, abs=0.5)
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from pages import gene_map
+
+
+def make_gene_pdbs(maps):
+    return pd.DataFrame({
+        'name_of_gene': [gene for gene, _, _ in maps],
+        'pdb': [pdb for _, pdb, _ in maps],
+        'gene_map': [gene_map_text for _, _, gene_map_text in maps],
+    })
+
+
+GENE_PDBS = make_gene_pdbs([
+    ('TP53', 'AF-P04637', '{1-393:1:A1-393}'),
+    ('TP53', '1TSR', '{94-289:B94-289}'),
+    ('TP53', '2XYZ', '{283-385:A9-111}{398-425:A124-151}'),
+    ('BRCA1', '1JM7', '{-5-10:A1-16}'),
+    ('BRCA1', 'NOMAP', None),
+])
+
+
+def test_parse_gene_maps():
+    intervals = gene_map.parse_gene_maps(GENE_PDBS)
+    assert list(intervals.columns) == gene_map.INTERVAL_COLUMNS
+    assert len(intervals) == 5
+    segments = intervals[intervals['pdb'] == '2XYZ']
+    assert segments[['gene_start', 'gene_end', 'pdb_start']].values.tolist() == [[283, 385, 9], [398, 425, 124]]
+    assert segments['chain'].tolist() == ['A', 'A']
+    assert intervals.loc[intervals['pdb'] == '1JM7', ['gene_start', 'gene_end', 'pdb_start']].values.tolist() == [
+        [-5, 10, 1],
+    ]
+    assert 'NOMAP' not in set(intervals['pdb'])
+
+
+def test_parse_gene_maps_without_maps():
+    intervals = gene_map.parse_gene_maps(make_gene_pdbs([('TP53', 'NOMAP', None)]))
+    assert intervals.empty
+    assert list(intervals.columns) == gene_map.INTERVAL_COLUMNS
+
+
+def test_segment_boundaries():
+    mapper = gene_map.mappers(gene_map.parse_gene_maps(GENE_PDBS))['TP53']
+    # Both ends of each segment map, the residues just outside do not
+    pdb_residues = [8, 9, 111, 112, 123, 124, 151, 152]
+    np.testing.assert_array_equal(
+        mapper.to_gene('2XYZ', pdb_residues),
+        [np.nan, 283, 385, np.nan, np.nan, 398, 425, np.nan],
+    )
+    np.testing.assert_array_equal(
+        mapper.to_pdb('2XYZ', [282, 283, 385, 386, 397, 398, 425, 426]),
+        [np.nan, 9, 111, np.nan, np.nan, 124, 151, np.nan],
+    )
+
+
+def test_negative_gene_numbering():
+    mapper = gene_map.mappers(gene_map.parse_gene_maps(GENE_PDBS))['BRCA1']
+    np.testing.assert_array_equal(mapper.to_gene('1JM7', [0, 1, 16, 17]), [np.nan, -5, 10, np.nan])
+    np.testing.assert_array_equal(mapper.to_pdb('1JM7', [-6, -5, 0, 10, 11]), [np.nan, 1, 6, 16, np.nan])
+
+
+def test_mixed_structures_and_unknowns():
+    mapper = gene_map.mappers(gene_map.parse_gene_maps(GENE_PDBS))['TP53']
+    pdbs = ['AF-P04637', '1TSR', '2XYZ', 'UNKNOWN', '1TSR']
+    residues = [393, 94, 9, 10, np.nan]
+    np.testing.assert_array_equal(mapper.to_gene(pdbs, residues), [393, 94, 283, np.nan, np.nan])
+
+
+def test_round_trip():
+    mapper = gene_map.mappers(gene_map.parse_gene_maps(GENE_PDBS))['TP53']
+    gene_residues = np.arange(283, 426)
+    pdb_residues = mapper.to_pdb('2XYZ', gene_residues)
+    mapped = ~np.isnan(pdb_residues)
+    np.testing.assert_array_equal(mapper.to_gene('2XYZ', pdb_residues[mapped]), gene_residues[mapped])
+    # The gap between the two segments is not covered
+    assert not mapped[(gene_residues > 385) & (gene_residues < 398)].any()
+
+
+def test_covered():
+    mapper = gene_map.mappers(gene_map.parse_gene_maps(GENE_PDBS))['TP53']
+    covered = mapper.covered(['2XYZ'])
+    assert covered[0] == 283 and covered[-1] == 425
+    assert len(covered) == (385 - 283 + 1) + (425 - 398 + 1)
+    np.testing.assert_array_equal(mapper.covered(), np.concatenate([np.arange(1, 394), np.arange(398, 426)]))
@@ -0,0 +1,119 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+import ingest as ingest_script
+from benchmark import write_chunks
+from conftest import REPO_DIR
+
+
+def ingest(directory, *args, check=True):
+    return subprocess.run(
+        [sys.executable, os.path.join(REPO_DIR, 'ingest.py'), '--workers', '2', *args],
+        cwd=directory, env={**os.environ, 'PYTHONPATH': REPO_DIR}, check=check, capture_output=True, text=True,
+    )
+
+
+def read_rows(path):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    rows = pd.read_sql_query("SELECT pdb, pdb_residual, mut_from, mut_to, ddg FROM ddg_info", conn)
+    conn.close()
+    return rows.sort_values(list(rows.columns)).reset_index(drop=True)
+
+
+def manifest_chunks(path):
+    with open(f"{path}.manifest.json") as f:
+        return sorted(json.load(f))
+
+
+@pytest.fixture
+def workdir(dataset, tmp_path):
+    chunks = write_chunks(str(tmp_path), 3, os.path.join(dataset, 'keogh.db'))
+    return str(tmp_path), chunks
+
+
+def test_delta_matches_full_rebuild(workdir):
+    directory, chunks = workdir
+    ingest(directory, '--db', 'delta.db', *chunks[:2])
+    ingest(directory, '--db', 'delta.db', chunks[2])
+    ingest(directory, '--db', 'full.db', '--full', *chunks)
+    delta, full = os.path.join(directory, 'delta.db'), os.path.join(directory, 'full.db')
+    pd.testing.assert_frame_equal(read_rows(delta), read_rows(full))
+    assert manifest_chunks(delta) == manifest_chunks(full) == chunks
+    assert 'up to date' in ingest(directory, '--db', 'delta.db', *chunks).stdout
+
+
+def test_unlisted_chunks_are_kept(workdir):
+    directory, chunks = workdir
+    ingest(directory, '--db', 'keep.db', *chunks)
+    before = read_rows(os.path.join(directory, 'keep.db'))
+    ingest(directory, '--db', 'keep.db', chunks[0])
+    pd.testing.assert_frame_equal(read_rows(os.path.join(directory, 'keep.db')), before)
+    assert manifest_chunks(os.path.join(directory, 'keep.db')) == chunks
+
+
+def test_changed_chunk_rebuilds_with_the_others(workdir):
+    directory, chunks = workdir
+    ingest(directory, '--db', 'changed.db', *chunks)
+    path = os.path.join(directory, chunks[1])
+    frame = pd.read_csv(path)
+    frame.iloc[:-5].to_csv(path, index=False)
+    ingest(directory, '--db', 'changed.db', chunks[1])
+    ingest(directory, '--db', 'expected.db', '--full', *chunks)
+    pd.testing.assert_frame_equal(
+        read_rows(os.path.join(directory, 'changed.db')), read_rows(os.path.join(directory, 'expected.db')),
+    )
+
+
+def test_prune_drops_unlisted_chunks(workdir):
+    directory, chunks = workdir
+    ingest(directory, '--db', 'pruned.db', *chunks)
+    ingest(directory, '--db', 'pruned.db', '--prune', chunks[0])
+    ingest(directory, '--db', 'expected.db', chunks[0])
+    pd.testing.assert_frame_equal(
+        read_rows(os.path.join(directory, 'pruned.db')), read_rows(os.path.join(directory, 'expected.db')),
+    )
+    assert manifest_chunks(os.path.join(directory, 'pruned.db')) == chunks[:1]
+
+
+def test_store_without_manifest_needs_full(workdir):
+    directory, chunks = workdir
+    ingest(directory, '--db', 'bare.db', *chunks)
+    os.remove(os.path.join(directory, 'bare.db.manifest.json'))
+    before = read_rows(os.path.join(directory, 'bare.db'))
+    assert ingest(directory, '--db', 'bare.db', chunks[0], check=False).returncode != 0
+    pd.testing.assert_frame_equal(read_rows(os.path.join(directory, 'bare.db')), before)
+
+
+def test_interrupted_chunk_is_rebuilt(workdir):
+    directory, chunks = workdir
+    ingest(directory, '--db', 'killed.db', *chunks[:2])
+    # A run killed after marking chunks[1] pending, with its rows already committed
+    path = os.path.join(directory, 'killed.db.manifest.json')
+    with open(path) as f:
+        manifest = json.load(f)
+    manifest[chunks[1]]['rows'] = None
+    with open(path, 'w') as f:
+        json.dump(manifest, f)
+    assert 'rebuilding' in ingest(directory, '--db', 'killed.db', *chunks).stdout
+    ingest(directory, '--db', 'expected.db', *chunks)
+    pd.testing.assert_frame_equal(
+        read_rows(os.path.join(directory, 'killed.db')), read_rows(os.path.join(directory, 'expected.db')),
+    )
+    with open(path) as f:
+        assert all(entry['rows'] for entry in json.load(f).values())
+
+
+def test_blocks_cover_every_row_once(workdir):
+    directory, chunks = workdir
+    path = os.path.join(directory, chunks[0])
+    blocks = ingest_script.blocks(path, size=1000)
+    assert len(blocks) > 1
+    assert all(end > start for _, start, end in blocks)
+    frame = pd.concat([ingest_script.read_block(*block) for block in blocks], ignore_index=True)
+    pd.testing.assert_frame_equal(frame, pd.read_csv(path, dtype=frame.dtypes.to_dict()))
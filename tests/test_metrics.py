@@ -0,0 +1,67 @@
+import os
+import re
+
+import pytest
+
+from pages import metrics
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_ENABLED', True)
+    for metric in (metrics.callback_seconds, metrics.response_bytes, metrics.span_seconds, metrics.rows_read):
+        monkeypatch.setattr(metric, '_series', {})
+
+
+def test_timer_is_a_no_op_when_disabled(monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_ENABLED', False)
+    monkeypatch.setattr(metrics.span_seconds, '_series', {})
+    with metrics.timer("query", "gene_ddg"):
+        pass
+    assert metrics.span_seconds._series == {}
+
+
+def test_timer_observes_span(enabled):
+    with metrics.timer("query", "gene_ddg"):
+        pass
+    (key, (buckets, total, count)), = metrics.span_seconds._series.items()
+    assert dict(key) == {'span': 'query', 'name': 'gene_ddg'}
+    assert count == 1 and total >= 0
+    # Cumulative buckets: a fast span lands in every bucket
+    assert buckets == [1] * len(metrics.SECONDS_BUCKETS)
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("test_seconds", "Test", (0.1, 1, 10))
+    for value in (0.05, 0.5, 5, 50):
+        histogram.observe(value, name="x")
+    lines = histogram.render()
+    buckets = [line for line in lines if line.startswith("test_seconds_bucket")]
+    assert [int(line.rsplit(' ', 1)[1]) for line in buckets] == [1, 2, 3, 4]
+    assert buckets[-1].startswith(f'test_seconds_bucket{{pid="{os.getpid()}",name="x",le="+Inf"}}')
+    assert f'test_seconds_sum{{pid="{os.getpid()}",name="x"}} 55.55' in lines
+    assert f'test_seconds_count{{pid="{os.getpid()}",name="x"}} 4' in lines
+
+
+def test_render_is_prometheus_text(enabled):
+    metrics.count_rows("gene_ddg", 12)
+    metrics.count_rows("gene_ddg", 3)
+    metrics.register_gauge("test_gauge", "A test gauge", lambda: 7)
+    text = metrics.render()
+    assert text.endswith("\n")
+    sample = re.compile(r'^[a-z_]+\{(?:[a-z_]+="[^"]*",?)+\} [0-9.e+-]+$')
+    for line in text.splitlines():
+        assert line.startswith(("# HELP ", "# TYPE ")) or sample.match(line), line
+    assert f'dashboard_rows_read_total{{pid="{os.getpid()}",name="gene_ddg"}} 15' in text
+    assert f'test_gauge{{pid="{os.getpid()}"}} 7' in text
+    assert "# TYPE dashboard_callback_seconds histogram" in text
+
+
+def test_metrics_endpoint(enabled):
+    flask = pytest.importorskip('flask')
+    server = flask.Flask(__name__)
+    metrics.init_app(server)
+    response = server.test_client().get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert "# TYPE dashboard_rows_read_total counter" in response.get_data(as_text=True)
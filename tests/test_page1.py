@@ -0,0 +1,57 @@
+import pytest
+
+
+@pytest.fixture
+def selection(page1):
+    gene = page1.lookup_tables.gene_names()[0]
+    residue = page1.residue_options(gene)[0]['value']
+    mut_from = page1.dropdown_index.mutfrom_options(gene, residue)[0]['value']
+    mut_to = page1.dropdown_index.mutto_options(gene, residue, mut_from)[0]['value']
+    return gene, residue, mut_from, mut_to
+
+
+def test_markdown_without_percentile_does_not_read_the_gene(page1, selection, monkeypatch):
+    def scan(*args):
+        raise AssertionError("the gene's distribution was read")
+
+    monkeypatch.setattr(page1, 'gene_percentile', scan)
+    _, text = page1.variant_results(*selection, include_percentile=False)
+    assert 'kcal/mol' in text and 'percentile' not in text.split('median ΔΔG')[-1]
+
+
+def test_markdown_with_percentile(page1, selection):
+    _, text = page1.variant_results(*selection)
+    context = page1.VariantContext(*selection)
+    assert f"in the {context.percentile:.0f}th percentile" in text
+    assert page1.gene_percentile_precomputed(selection[0])
+
+
+def test_selection_round_trips_through_the_url(page1, selection):
+    structure_filter = page1.structure_filters.StructureFilter('xray', 0.5, 2.0)
+    search = page1.selection_search(*selection, structure_filter)
+    assert page1.parse_selection(search) == page1.Selection(*selection, structure_filter)
+    for length in range(4):
+        partial = selection[:length] + (None,) * (4 - length)
+        assert page1.parse_selection(page1.selection_search(*partial)) == page1.Selection(*partial)
+
+
+def test_selection_search_stops_at_the_first_gap(page1, selection):
+    gene, residue, _, mut_to = selection
+    assert page1.selection_search(gene, residue, None, mut_to) == f"?gene={gene}&res={residue}"
+    assert page1.selection_search(None, None, None, None) == ""
+
+
+@pytest.mark.parametrize('bad_step', range(4))
+def test_parse_selection_keeps_the_longest_valid_prefix(page1, selection, bad_step):
+    params = dict(zip(('gene', 'res', 'from', 'to'), selection))
+    params[('gene', 'res', 'from', 'to')[bad_step]] = 'XXX'
+    search = '?' + '&'.join(f"{name}={value}" for name, value in params.items())
+    # Steps after the bad one are dropped even though they were valid
+    assert page1.parse_selection(search) == page1.Selection(*selection[:bad_step])
+
+
+def test_parse_selection_rejects_a_residue_the_gene_lacks(page1, selection):
+    gene, residue, mut_from, mut_to = selection
+    missing = max(option['value'] for option in page1.residue_options(gene)) + 1
+    search = f"?gene={gene}&res={missing}&from={mut_from}&to={mut_to}"
+    assert page1.parse_selection(search) == page1.Selection(gene)
@@ -0,0 +1,50 @@
+import numpy as np
+
+from pages import residue_matrix
+
+
+def test_compute_residue_matrix():
+    matrix = residue_matrix.compute_residue_matrix(
+        [10, 10, 10, 12, 12, 11],
+        ['ALA', 'ALA', 'ALA', 'VAL', 'XAA', 'GLY'],
+        [1.0, 2.0, 6.0, -1.0, 5.0, np.nan],
+    )
+    assert matrix['residues'].tolist() == [10, 11, 12]
+    ala, val = residue_matrix.AMINO_ACID_CODES['ALA'], residue_matrix.AMINO_ACID_CODES['VAL']
+    assert matrix['count'][0, ala] == 3 and matrix['median'][0, ala] == 2.0 and matrix['mean'][0, ala] == 3.0
+    assert matrix['count'][2, val] == 1 and matrix['median'][2, val] == -1.0
+    # Unknown amino acids and NaN ΔΔG are dropped, leaving residue 11 empty
+    assert matrix['count'].sum() == 4
+    assert np.isnan(matrix['median'][1]).all()
+
+
+def test_downsample_weights_by_count():
+    matrix = {
+        'residues': np.arange(1, 6),
+        'count': np.array([[3], [1], [0], [2], [2]]),
+        'median': np.array([[1.0], [5.0], [np.nan], [2.0], [5.0]]),
+    }
+    first, last, count = residue_matrix.downsample(matrix, 'count', max_rows=2)
+    assert first.tolist() == [1, 4] and last.tolist() == [3, 5]
+    assert count[:, 0].tolist() == [4, 4]
+
+    _, _, median = residue_matrix.downsample(matrix, 'median', max_rows=2)
+    # (3 * 1 + 1 * 5 + 0) / 4 and (2 * 2 + 2 * 5) / 4; the empty cell adds nothing
+    assert median[:, 0].tolist() == [2.0, 3.5]
+
+
+def test_downsample_keeps_empty_windows_empty():
+    matrix = {
+        'residues': np.arange(4),
+        'count': np.array([[1], [1], [0], [0]]),
+        'mean': np.array([[1.0], [3.0], [np.nan], [np.nan]]),
+    }
+    _, _, mean = residue_matrix.downsample(matrix, 'mean', max_rows=2)
+    assert mean[0, 0] == 2.0 and np.isnan(mean[1, 0])
+
+
+def test_downsample_small_matrix_is_unchanged():
+    matrix = residue_matrix.compute_residue_matrix([1, 2, 3], ['ALA'] * 3, [1.0, 2.0, 3.0])
+    first, last, median = residue_matrix.downsample(matrix, 'median', max_rows=10)
+    assert first.tolist() == last.tolist() == [1, 2, 3]
+    np.testing.assert_array_equal(median, matrix['median'])
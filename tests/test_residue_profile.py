@@ -0,0 +1,45 @@
+import numpy as np
+
+from pages import residue_profile
+
+
+def test_compute_residue_profile_matches_numpy():
+    rng = np.random.default_rng(0)
+    residues = rng.integers(5, 15, size=400)
+    ddg = rng.normal(1, 2, size=400)
+    ddg[::50] = np.nan
+    profile = residue_profile.compute_residue_profile(residues, ddg)
+
+    assert profile['residues'].tolist() == list(range(5, 15))
+    for row, residue in enumerate(profile['residues']):
+        values = ddg[(residues == residue) & ~np.isnan(ddg)]
+        assert profile['count'][row] == len(values)
+        q1, median, q3 = np.percentile(values, [25, 50, 75])
+        np.testing.assert_allclose(
+            [profile['q1'][row], profile['median'][row], profile['q3'][row]], [q1, median, q3], rtol=1e-6,
+        )
+        for name, threshold in residue_profile.THRESHOLDS.items():
+            assert np.isclose(profile[name][row], np.mean(values > threshold))
+
+
+def test_residues_without_values_are_nan():
+    profile = residue_profile.compute_residue_profile([1, 3, 3], [0.2, 1.0, 3.0])
+    assert profile['count'].tolist() == [1, 0, 2]
+    assert np.isnan(profile['median'][1]) and np.isnan(profile['above_0_5'][1])
+    assert profile['median'][2] == 2.0 and profile['above_2_5'][2] == 0.5
+
+
+def test_smooth_weights_residues_by_count():
+    profile = {
+        'count': np.array([3, 0, 1, 0, 0]),
+        'above_0_5': np.array([1.0, np.nan, 0.0, np.nan, np.nan]),
+    }
+    smoothed = residue_profile.smooth(profile, 'above_0_5', window=3)
+    # Pooled fractions: residues 0-1 -> 3/3, 0-2 -> 3/4, 1-3 -> 0/1, 2-4 -> 0/1, 3-4 -> none
+    np.testing.assert_allclose(smoothed[:4], [1.0, 0.75, 0.0, 0.0])
+    assert np.isnan(smoothed[4])
+
+
+def test_smooth_window_of_one_is_unchanged():
+    profile = residue_profile.compute_residue_profile([1, 2, 2], [0.5, 1.0, 2.0])
+    np.testing.assert_array_equal(residue_profile.smooth(profile, 'median', 1), profile['median'])
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from pages import sketches
+
+
+def exact_percentile(values, x):
+    values = np.sort(np.concatenate(values))
+    return np.searchsorted(values, x, side='left') / len(values) * 100
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_merged_percentile_within_error_bound(seed):
+    rng = np.random.default_rng(seed)
+    # Groups of very different sizes and shapes, with heavy ties
+    groups = [
+        rng.gamma(1.5, 1.2, rng.integers(1, 20_000)) - 0.5
+        for _ in range(rng.integers(2, 12))
+    ]
+    groups.append(np.round(rng.normal(0, 3, 5_000), 1))
+    groups.append(np.full(1000, 2.5))
+    table = sketches.SketchTable(
+        [f"g{i}" for i in range(len(groups))],
+        *zip(*(sketches.sketch(values) for values in groups)),
+    )
+    x = np.concatenate([np.linspace(-15, 20, 400), [2.5, -0.5, groups[0].min(), groups[0].max()]])
+    estimated = table.percentile(x)
+    np.testing.assert_array_less(np.abs(estimated - exact_percentile(groups, x)), 100 * sketches.ERROR_BOUND + 1e-9)
+
+    subset = [f"g{i}" for i in range(0, len(groups), 2)]
+    estimated = table.percentile(x, subset)
+    expected = exact_percentile(groups[::2], x)
+    np.testing.assert_array_less(np.abs(estimated - expected), 100 * sketches.ERROR_BOUND + 1e-9)
+
+
+def test_small_and_empty_sketches():
+    n, quantiles = sketches.sketch([3.0, 1.0, 2.0])
+    assert n == 3
+    np.testing.assert_allclose(sketches.count_below(n, quantiles, [0.5, 1.0, 1.5, 3.0, 4.0]), [0, 0, 1, 2, 3])
+    n, quantiles = sketches.sketch([np.nan])
+    assert n == 0
+    np.testing.assert_array_equal(sketches.count_below(n, quantiles, [1.0]), [0])
+
+
+def test_unknown_names_are_skipped():
+    table = sketches.SketchTable(['a'], *zip(sketches.sketch(np.arange(100.0))))
+    assert table.percentile(50.0, ['a', 'missing']) == pytest.approx(table.percentile(50.0, ['a']))
+    assert table.percentile(50.0, ['missing']) == 0
@@ -0,0 +1,16 @@
+import pytest
+
+from pages import structure_filters
+
+
+@pytest.mark.parametrize('value', ['nan', 'inf', '-inf', 'NaN', float('nan')])
+def test_non_finite_values_fall_back_to_defaults(value):
+    structure_filter = structure_filters.from_values('xray', value, value)
+    assert structure_filter == structure_filters.StructureFilter('xray', 0.0, None)
+
+
+def test_parse_selection_ignores_non_finite_resolution(page1):
+    gene = page1.lookup_tables.gene_names()[0]
+    selection = page1.parse_selection(f"?gene={gene}&method=xray&min_coverage=0.5&max_resolution=inf")
+    assert selection.gene == gene
+    assert selection.structure_filter == structure_filters.StructureFilter('xray', 0.5, None)
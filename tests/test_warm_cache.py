@@ -0,0 +1,46 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+from conftest import REPO_DIR, run_script
+
+# Serve every warmed gene in a fresh process and report the result cache's counters
+SERVE_WARMED_GENES = """
+import json, warm_cache
+from pages import lookup_tables, page1
+for gene in lookup_tables.gene_names():
+    warm_cache.warm_gene(gene)
+print(json.dumps(page1.result_cache.stats()))
+"""
+
+
+def serve(cwd, cache_dir):
+    output = subprocess.run(
+        [sys.executable, '-c', SERVE_WARMED_GENES],
+        cwd=cwd, env={**os.environ, 'PYTHONPATH': REPO_DIR, 'DDG_CACHE_DIR': cache_dir},
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def test_warmed_entries_are_hits_in_a_fresh_process(dataset, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    run_script('warm_cache.py', '--cache-dir', cache_dir, '--workers', '2', cwd=dataset)
+    assert len(os.listdir(cache_dir)) == 1
+
+    stats = serve(dataset, cache_dir)
+    assert stats['misses'] == 0 and stats['hits'] > 0
+
+
+def test_warmed_entries_survive_a_copy_of_the_data(dataset, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    run_script('warm_cache.py', '--cache-dir', cache_dir, '--workers', '2', cwd=dataset)
+
+    # A deploy copies the same data with new mtimes and inodes
+    deployed = str(tmp_path / 'deployed')
+    shutil.copytree(dataset, deployed, symlinks=True, copy_function=shutil.copy)
+    stats = serve(deployed, cache_dir)
+    assert stats['misses'] == 0 and stats['hits'] > 0
+    assert os.listdir(cache_dir) == [stats['version']]
@@ -0,0 +1,94 @@
+"""
+Fill the shared on-disk result cache (DDG_CACHE_DIR) before traffic
+arrives, so the first users after a deploy or worker restart get the
+same latency as steady state.
+
+For every gene it precomputes the gene histogram payload, the residue
+dropdown options and the positional profile, through the same page1
+functions the callbacks use, across a process pool. Entries land in the
+cache's version directory, which is keyed by the data's contents (the
+ingest manifest of keogh.db, and hashes of gene_pdbs and the precomputed
+build stamp), so they are picked up by any worker or container serving
+the same data and ignored once it changes. A keogh.db over
+DDG_CACHE_CONTENT_HASH_MAX_BYTES without an ingest manifest is keyed by
+its mtime instead; warm the cache inside each deployed container then.
+
+    DDG_CACHE_DIR=/var/cache/ddg python warm_cache.py            # every gene in gene_pdbs
+    python warm_cache.py --cache-dir /var/cache/ddg TP53 BRCA1
+    python warm_cache.py --cache-dir /var/cache/ddg --gene-list genes.txt
+    python warm_cache.py --cache-dir /var/cache/ddg --access-log access.log --top 50
+"""
+import argparse
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote_plus
+
+# gene=... in logged page, export and API URLs
+GENE_PARAMETER = re.compile(r'[?&]gene=([^&\s"]+)')
+
+
+def genes_from_access_logs(paths, top=None):
+    """Genes requested in access logs, most requested first."""
+    counts = Counter()
+    for path in paths:
+        with open(path, errors='replace') as f:
+            for line in f:
+                counts.update(unquote_plus(gene) for gene in GENE_PARAMETER.findall(line))
+    return [gene for gene, _ in counts.most_common(top)]
+
+
+def warm_gene(gene):
+    """Run the cached page1 entry points for one gene; return (gene, seconds)."""
+    from pages import page1, structure_filters
+
+    start = time.perf_counter()
+    page1.residue_options(gene)
+    page1.gene_figure_json(gene, structure_filters.ALL)
+    page1.residue_profile_figure_json(gene, page1.PROFILE_WINDOWS[0])
+    return gene, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('genes', nargs='*', help="genes to warm (default: every gene in gene_pdbs)")
+    parser.add_argument('--gene-list', help="file with one gene per line")
+    parser.add_argument('--access-log', nargs='+', default=[], help="access logs to take the most requested genes from")
+    parser.add_argument('--top', type=int, help="only warm the N most requested genes from --access-log")
+    parser.add_argument('--cache-dir', help="shared cache directory (default: DDG_CACHE_DIR)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    # Set before page1 is imported here or in the pool, since the cache reads it at import
+    if args.cache_dir:
+        os.environ['DDG_CACHE_DIR'] = args.cache_dir
+    if not os.environ.get('DDG_CACHE_DIR'):
+        parser.error("set DDG_CACHE_DIR or pass --cache-dir, the cache is only shared through disk")
+
+    from pages import lookup_tables, page1
+
+    known = set(lookup_tables.gene_names())
+    genes = list(args.genes)
+    if args.gene_list:
+        with open(args.gene_list) as f:
+            genes += [line.strip() for line in f if line.strip()]
+    if args.access_log:
+        genes += genes_from_access_logs(args.access_log, args.top)
+    if not genes:
+        genes = list(lookup_tables.gene_names())
+    genes = [gene for gene in dict.fromkeys(genes) if gene in known]
+
+    version = page1.result_cache.version
+    print(f"Warming {len(genes):,} genes into {os.path.join(os.environ['DDG_CACHE_DIR'], version)}/ ...")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers) as pool:
+        for gene, seconds in pool.map(warm_gene, genes):
+            print(f"[OK] {gene}: {seconds:.2f} seconds")
+
+    print(f"\nDone! Warmed {len(genes):,} genes in {time.perf_counter() - start:.1f} seconds.")
+
+
+if __name__ == '__main__':
+    main()